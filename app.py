@@ -1,24 +1,32 @@
 import streamlit as st
-import pandas as pd
 import os
-import glob
 import datetime
-import time
-import base64
 import json
 import uuid
-import requests
-import ast
+import types
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
 import re
-from PIL import Image
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import PromptTemplate
-from langchain_core.messages import HumanMessage
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from corpus import load_corpus, PartitionStore, HANDBOOK, TIMETABLE
+from catalog import load_catalog
+from scheduler import build_timetables, describe
+from timetable_render import render_timetable, compact, summarize
+from timetable_edit import term_sections, parse_edits, apply_edits
+from image_store import ingest, ref, split_chunks, chunk_ids, from_legacy
+from chat_writer import ChatWriter, OUTBOX_PATH, session_ops, next_seq
+from graduation import load_rules, admission_year, evaluate, format_report, parse_transcript, transcript_key
+from llm_cache import ResponseCache, CACHE_PATH
+from chat_memory import ConversationMemory, is_followup
+from intent_router import IntentRouter
+from rate_limiter import RateLimiter, RateLimitExceeded, is_rate_limit_error, REQUESTS_PER_MINUTE
+from tracing import Metrics, Trace, write_jsonl, write_prometheus
+from prompts import (SCHEDULER_MODEL, UNSET, DEPARTMENTS, GRADES, SEMESTERS, CACHE_FIELDS,
+                     llm_tier, table_setting, profile_fields, cache_key, data_version, content_text, load_partition, profile_partition, qa_prompt)
 
-# Firebase 라이브러리
-import firebase_admin
-from firebase_admin import credentials, firestore
+# 무거운 라이브러리(LangChain/Gemini, firebase_admin, pandas, Pillow)는 처음 쓰는 함수 안에서 import 한다
+# 첫 화면까지의 import 시간은 check_startup.py 로 측정 (예산 초과 시 실패)
 
 # -----------------------------------------------------------------------------
 # [0] 설정 및 유틸리티
@@ -83,34 +91,131 @@ def clean_html_output(text):
     
     return cleaned.replace("```html", "").replace("```", "").strip()
 
-# 재시도 로직 (429 에러 대응 - 즉시 알림)
+# secrets → 환경변수 순으로 읽는 선택 설정
+#   LLM_RPM: 분당 LLM 요청 한도, LLM_CACHE_PATH / CHAT_OUTBOX_PATH: 응답 캐시/대화 outbox 파일 (벤치마크 등에서 분리용)
+#   TRACE_LOG / METRICS_FILE / DEBUG_PANEL: 아래 [Tracing] 참고
+#   LLM_MODEL_TIERS / LLM_INTENT_TIERS: 모델 등급 설정과 의도별 등급 덮어쓰기 (prompts.MODEL_TIERS / INTENT_TIERS, 아래 [AI Tools] 참고)
+def setting(name):
+    return st.secrets.get(name) or os.environ.get(name)
+
+# 프로세스 공용 Rate Limiter (모든 세션의 LLM 호출이 같은 토큰 버킷을 공유)
+@st.cache_resource
+def load_rate_limiter():
+    return RateLimiter(int(setting("LLM_RPM") or REQUESTS_PER_MINUTE))
+
+RATE_LIMITER = load_rate_limiter()
+RATE_LIMIT_MESSAGE = "⚠️ **사용량 초과**: 현재 AI 요청량이 많아 처리가 불가능합니다. 잠시 후(약 1분 뒤) 다시 질문해 주세요."
+
+# 구간 시간/카운터 (tracing). 프로세스 누적 지표는 항상 모으고, 설정이 있을 때만 턴마다 파일로 내보낸다
+#   TRACE_LOG: 턴별 trace JSONL 경로, METRICS_FILE: Prometheus 텍스트 파일 경로, DEBUG_PANEL: 사이드바 디버그 패널 (또는 ?debug=1)
+@st.cache_resource
+def load_metrics():
+    return Metrics()
+
+METRICS = load_metrics()
+
+# 대기 순번 안내를 띄울 상태창 (메인 루프가 설정, 없으면 현재 위치에 표시)과 현재 턴의 trace (턴 밖에서는 누적 지표에만 쌓임)
+# 스크립트 실행마다 새로 만들어지므로 같은 실행의 백그라운드 의도 스레드와도 공유된다
+UI = types.SimpleNamespace(status=None, trace=Trace("run", METRICS))
+
+def count_retry(attempt):
+    UI.trace.count("llm.retry")
+
+# LangChain 응답/조각의 토큰 사용량 (Gemini 는 usage_metadata 로 줌, 스트림은 조각별 값을 더하면 전체)
+def record_usage(message):
+    usage = getattr(message, "usage_metadata", None) or {}
+    UI.trace.count("llm.input_tokens", usage.get("input_tokens", 0))
+    UI.trace.count("llm.output_tokens", usage.get("output_tokens", 0))
+
+def invoke_text(llm, prompt):
+    UI.trace.count("llm.calls")
+    res = llm.invoke(prompt)
+    record_usage(res)
+    return content_text(res)
+
+def limiter_user():
+    return st.session_state.user['localId'] if st.session_state.get("user") else st.session_state.get("session_id", "anonymous")
+
+class QueueNotice:
+    def __init__(self):
+        self.slot = None
+
+    def __call__(self, position):
+        if self.slot is None:
+            with UI.status or contextlib.nullcontext():
+                self.slot = st.empty()
+        self.slot.caption(f"⏳ 요청이 많아 대기 중입니다... (대기 순번 {position})")
+
+    def clear(self):
+        if self.slot is not None: self.slot.empty()
+        self.slot = None
+
+# 한가할 땐 즉시 실행, 붐빌 땐 사용자별 공정 대기열에서 순서를 기다림 (대기 순번은 상태창에 표시)
+# 429 는 지수 백오프 + jitter 로 재시도하고, 재시도를 모두 소진했을 때만 안내 문구 반환
 def run_with_retry(func, *args, **kwargs):
+    notice = QueueNotice()
     try:
-        return func(*args, **kwargs)
+        return RATE_LIMITER.call(lambda: func(*args, **kwargs), user=limiter_user(), on_wait=notice, on_retry=count_retry)
+    except RateLimitExceeded:
+        UI.trace.count("llm.rate_limited")
+        return RATE_LIMIT_MESSAGE
     except Exception as e:
-        if "429" in str(e) or "RESOURCE_EXHAUSTED" in str(e):
-            return "⚠️ **사용량 초과**: 현재 AI 요청량이 많아 처리가 불가능합니다. 잠시 후(약 1분 뒤) 다시 질문해 주세요."
+        if is_rate_limit_error(e):
+            UI.trace.count("llm.rate_limited")
+            return RATE_LIMIT_MESSAGE
         raise e
+    finally:
+        notice.clear()
+
+# run_with_retry 의 스트리밍 버전. 실패는 예외로 올려 보내 캐시에 남지 않게 하고, 안내 문구는 호출자가 붙인다
+def limited_stream(make_stream):
+    notice = QueueNotice()
+    def counted():
+        UI.trace.count("llm.calls")
+        return make_stream()
+    try:
+        for chunk in RATE_LIMITER.stream(counted, user=limiter_user(), on_wait=notice, on_retry=count_retry):
+            notice.clear()
+            record_usage(chunk)
+            text = content_text(chunk)
+            if text: yield text
+    finally:
+        notice.clear()
 
 # -----------------------------------------------------------------------------
 # [Firebase Manager] (Identity Toolkit 제거 -> Firestore 직접 인증)
 # -----------------------------------------------------------------------------
+HISTORY_LIMIT = 10
+MESSAGE_LIMIT = 50      # 세션을 열 때 불러오는 최근 메시지 수
+BOOKMARK_PAGE = 10
+DESCENDING = "DESCENDING"   # firestore.Query.DESCENDING (firebase_admin 을 import 하지 않고 쓰기 위해)
+
+# Firestore 클라이언트는 로그인 등 처음 필요할 때 프로세스당 한 번만 만든다 (실패는 캐시되지 않아 다음 요청 때 재시도)
+@st.cache_resource
+def load_firestore():
+    if "firebase_service_account" not in st.secrets: return None
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+    if not firebase_admin._apps:
+        cred_info = dict(st.secrets["firebase_service_account"])
+        cred = credentials.Certificate(cred_info)
+        firebase_admin.initialize_app(cred)
+    return firestore.client()
+
 class FirebaseManager:
     def __init__(self):
-        self.db = None
-        self.is_initialized = False
-        self.init_firestore()
+        self._db = None
 
-    def init_firestore(self):
-        if "firebase_service_account" in st.secrets:
-            try:
-                if not firebase_admin._apps:
-                    cred_info = dict(st.secrets["firebase_service_account"])
-                    cred = credentials.Certificate(cred_info)
-                    firebase_admin.initialize_app(cred)
-                self.db = firestore.client()
-                self.is_initialized = True
+    @property
+    def db(self):
+        if self._db is None:
+            try: self._db = load_firestore()
             except: pass
+        return self._db
+
+    @property
+    def is_initialized(self):
+        return self.db is not None
 
     # [수정됨] Firestore를 이용한 자체 간편 인증 (API 키 필요 없음)
     def auth_user(self, email, password, mode="login"):
@@ -123,16 +228,19 @@ class FirebaseManager:
 
         try:
             doc = doc_ref.get()
+            UI.trace.count("firestore.read")
             
             if mode == "signup":
                 if doc.exists:
                     return None, "이미 존재하는 이메일입니다."
+                from firebase_admin import firestore
                 # 회원가입: 비밀번호 저장 (실제 서비스에선 해싱 필요하지만 여기선 평문 저장)
                 doc_ref.set({
                     "password": password, 
                     "email": email, 
                     "created_at": firestore.SERVER_TIMESTAMP
                 })
+                UI.trace.count("firestore.write")
                 return {"localId": user_id, "email": email}, None
             
             elif mode == "login":
@@ -146,202 +254,608 @@ class FirebaseManager:
         except Exception as e:
             return None, str(e)
 
-    def save_profile(self, profile_data, imgs_b64):
-        if self.is_initialized and st.session_state.user:
+    # 프로필 문서에는 성적표 참조(grade_cards)만 두고, 이미지 본문은 grade_cards 컬렉션의 청크 문서에 저장
+    def save_profile(self, profile_data, cards):
+        if st.session_state.user and self.is_initialized:
             try:
                 uid = st.session_state.user['localId']
                 data = profile_data.copy()
-                if imgs_b64:
-                    data['grade_card_img'] = imgs_b64 
+                data['grade_cards'] = [ref(c) for c in cards]
+                self.save_grade_cards(cards)
                 self.db.collection('users').document(uid).collection('profile').document('info').set(data)
+                UI.trace.count("firestore.write")
                 return True
             except: return False
         return False
 
+    def save_grade_cards(self, cards):
+        uid = st.session_state.user['localId']
+        col = self.db.collection('users').document(uid).collection('grade_cards')
+        stored = {d.id for d in col.list_documents()}
+        UI.trace.count("firestore.read", max(len(stored), 1))
+        wanted = {cid for c in cards for cid in chunk_ids(c)}
+        # 새로 올린 이미지만 쓰고(같은 해시는 건너뜀), 더 이상 참조하지 않는 청크는 지운다
+        for c in cards:
+            ids = chunk_ids(c)
+            body = st.session_state.grade_card_img.get(c['hash'])
+            if set(ids) <= stored or body is None: continue
+            batch = self.db.batch()
+            for i, (cid, chunk) in enumerate(zip(ids, split_chunks(body))):
+                batch.set(col.document(cid), {"hash": c['hash'], "index": i, "data": chunk})
+            batch.commit()
+            UI.trace.count("firestore.write", len(ids))
+        for cid in stored - wanted:
+            col.document(cid).delete()
+            UI.trace.count("firestore.write")
+
+    def load_grade_cards(self, cards):
+        # {hash: base64} — 청크가 하나라도 없으면 그 이미지는 건너뜀
+        if not (st.session_state.user and cards and self.is_initialized): return {}
+        try:
+            uid = st.session_state.user['localId']
+            col = self.db.collection('users').document(uid).collection('grade_cards')
+            refs = [col.document(cid) for c in cards for cid in chunk_ids(c)]
+            docs = {d.id: d.to_dict() for d in self.db.get_all(refs) if d.exists}
+            UI.trace.count("firestore.read", len(refs))
+            return {c['hash']: "".join(docs[cid]["data"] for cid in chunk_ids(c))
+                    for c in cards if all(cid in docs for cid in chunk_ids(c))}
+        except: return {}
+
     def load_profile(self):
-        if self.is_initialized and st.session_state.user:
+        if st.session_state.user and self.is_initialized:
             try:
                 uid = st.session_state.user['localId']
                 doc = self.db.collection('users').document(uid).collection('profile').document('info').get()
+                UI.trace.count("firestore.read")
                 return doc.to_dict() if doc.exists else None
             except: return None
         return None
 
-    def save_chat_session(self, session_id, messages, summary):
-        if self.is_initialized and st.session_state.user:
-            try:
-                uid = st.session_state.user['localId']
-                save_data = [{"role": m["role"], "content": m["content"], "type": m.get("type", "text")} for m in messages[-20:]]
-                self.db.collection('users').document(uid).collection('chat_sessions').document(session_id).set({
-                    "messages": save_data, "summary": summary, "updated_at": firestore.SERVER_TIMESTAMP
-                }, merge=True)
-            except: pass
+    # 사용자별 읽기 캐시 (세션 상태에 보관, 쓰기 시 해당 항목만 무효화) — 사이드바 rerun 은 Firestore 를 읽지 않는다
+    def _cache(self):
+        caches = st.session_state.setdefault("fb_cache", {})
+        return caches.setdefault(st.session_state.user['localId'], {})
 
+    def invalidate(self, *names):
+        if st.session_state.user:
+            cache = self._cache()
+            for name in names: cache.pop(name, None)
+
+    # 대화는 메시지당 문서 하나로 append 만 한다. 실제 쓰기는 백그라운드 writer 가 모아서 보낸다 (응답 경로에서 대기 없음)
+    def append_chat_messages(self, session_id, messages, start_seq, summary):
+        if st.session_state.user and messages and self.is_initialized:
+            uid = st.session_state.user['localId']
+            ops = session_ops(uid, session_id, messages, start_seq, summary)
+            chat_writer().enqueue(ops)
+            UI.trace.count("firestore.write", len(ops))
+            # 캐시는 지우지 않고 바로 갱신 (flush 전에 다시 읽어 옛 목록이 캐시되는 것을 막음)
+            cache = self._cache()
+            loaded = cache.get("messages", {})
+            if session_id in loaded:
+                loaded[session_id] = loaded[session_id] + [dict(m, seq=start_seq + i) for i, m in enumerate(messages)]
+            if "history" in cache:
+                entry = {"id": session_id, "summary": summary, "updated_at": datetime.datetime.now(datetime.timezone.utc)}
+                cache["history"] = ([entry] + [h for h in cache["history"] if h["id"] != session_id])[:HISTORY_LIMIT]
+
+    # 목록에는 요약/시각만 필요하므로 messages 는 내려받지 않는다 (본문은 세션을 열 때 load_chat_messages)
     def load_chat_history_list(self):
-        if self.is_initialized and st.session_state.user:
+        if st.session_state.user and self.is_initialized:
+            cache = self._cache()
+            if "history" in cache: return cache["history"]
             try:
                 uid = st.session_state.user['localId']
                 docs = self.db.collection('users').document(uid).collection('chat_sessions')\
-                    .order_by('updated_at', direction=firestore.Query.DESCENDING).limit(10).stream()
-                return [{"id": d.id, **d.to_dict()} for d in docs]
+                    .select(['summary', 'updated_at'])\
+                    .order_by('updated_at', direction=DESCENDING).limit(HISTORY_LIMIT).stream()
+                cache["history"] = [{"id": d.id, **d.to_dict()} for d in docs]
+                UI.trace.count("firestore.read", max(len(cache["history"]), 1))
+                return cache["history"]
             except: return []
         return []
 
-    def add_bookmark(self, type, content, note=""):
-        if self.is_initialized and st.session_state.user:
+    def load_chat_messages(self, session_id):
+        if st.session_state.user and self.is_initialized:
+            loaded = self._cache().setdefault("messages", {})
+            if session_id in loaded: return loaded[session_id]
             try:
                 uid = st.session_state.user['localId']
-                self.db.collection('users').document(uid).collection('bookmarks').add({
-                    "type": type, "content": content, "note": note, "created_at": firestore.SERVER_TIMESTAMP
-                })
+                session_ref = self.db.collection('users').document(uid).collection('chat_sessions').document(session_id)
+                docs = session_ref.collection('messages')\
+                    .order_by('seq', direction=DESCENDING).limit(MESSAGE_LIMIT).stream()
+                messages = [d.to_dict() for d in docs][::-1]
+                UI.trace.count("firestore.read", max(len(messages), 1))
+                # 예전 형식(세션 문서의 messages 배열)으로 저장된 앞부분
+                if len(messages) < MESSAGE_LIMIT:
+                    doc = session_ref.get(field_paths=['messages'])
+                    UI.trace.count("firestore.read")
+                    legacy = (doc.to_dict() or {}).get("messages", []) if doc.exists else []
+                    messages = legacy[-(MESSAGE_LIMIT - len(messages)):] + messages if legacy else messages
+                loaded[session_id] = messages
+                return messages
+            except: return []
+        return []
+
+    # 시간표(data)는 HTML 대신 구조화 데이터만 저장하고 불러올 때 다시 렌더링
+    def add_bookmark(self, type, content, note="", data=None):
+        if st.session_state.user and self.is_initialized:
+            try:
+                from firebase_admin import firestore
+                uid = st.session_state.user['localId']
+                doc = {"type": type, "note": note, "created_at": firestore.SERVER_TIMESTAMP}
+                if data: doc["data"] = data
+                else: doc["content"] = content
+                self.db.collection('users').document(uid).collection('bookmarks').add(doc)
+                UI.trace.count("firestore.write")
+                self.invalidate("bookmarks")
                 return True
             except: return False
         return False
 
+    # 보관함 목록: 제목(note)/종류만 페이지 단위로 읽고, 본문(content/data)은 항목을 열 때 load_bookmark
     def load_bookmarks(self):
-        if self.is_initialized and st.session_state.user:
+        if st.session_state.user and self.is_initialized:
+            cache = self._cache()
+            if "bookmarks" not in cache:
+                cache["bookmarks"] = {"items": [], "last": None, "done": False}
+                self.load_more_bookmarks()
+            return cache["bookmarks"]
+        return {"items": [], "last": None, "done": True}
+
+    def load_more_bookmarks(self):
+        page = self._cache()["bookmarks"]
+        try:
+            uid = st.session_state.user['localId']
+            query = self.db.collection('users').document(uid).collection('bookmarks')\
+                .select(['note', 'type', 'created_at'])\
+                .order_by('created_at', direction=DESCENDING)
+            if page["last"] is not None: query = query.start_after(page["last"])
+            docs = list(query.limit(BOOKMARK_PAGE).stream())
+            UI.trace.count("firestore.read", max(len(docs), 1))
+            page["items"] += [{"id": d.id, **d.to_dict()} for d in docs]
+            if docs: page["last"] = docs[-1]
+            page["done"] = len(docs) < BOOKMARK_PAGE
+        except: page["done"] = True
+
+    def load_bookmark(self, bookmark_id):
+        if st.session_state.user and self.is_initialized:
+            bodies = self._cache().setdefault("bookmark_bodies", {})
+            if bookmark_id in bodies: return bodies[bookmark_id]
             try:
                 uid = st.session_state.user['localId']
-                docs = self.db.collection('users').document(uid).collection('bookmarks')\
-                    .order_by('created_at', direction=firestore.Query.DESCENDING).stream()
-                return [{"id": d.id, **d.to_dict()} for d in docs]
-            except: return []
-        return []
+                doc = self.db.collection('users').document(uid).collection('bookmarks').document(bookmark_id)\
+                    .get(field_paths=['type', 'content', 'data'])
+                UI.trace.count("firestore.read")
+                bodies[bookmark_id] = doc.to_dict() if doc.exists else None
+                return bodies[bookmark_id]
+            except: return None
+        return None
 
 fb_manager = FirebaseManager()
 
+# 대화 저장용 백그라운드 writer (프로세스 공용, 로컬 outbox 로 Firestore 장애/재시작에도 유실 없음)
+@st.cache_resource
+def load_chat_writer(_db):
+    from firebase_admin import firestore
+    return ChatWriter(_db, firestore.SERVER_TIMESTAMP, setting("CHAT_OUTBOX_PATH") or OUTBOX_PATH)
+
+# 첫 저장 때 만든다 (로그인 전 화면에서는 Firestore 를 초기화하지 않음)
+def chat_writer():
+    return load_chat_writer(fb_manager.db)
+
 # -----------------------------------------------------------------------------
 # [Session & Data]
 # -----------------------------------------------------------------------------
 if "user" not in st.session_state: st.session_state.user = None
 if "current_chat" not in st.session_state: st.session_state.current_chat = []
 if "session_id" not in st.session_state: st.session_state.session_id = str(uuid.uuid4())
+# current_chat 중 이미 저장(outbox 에 적재)한 개수와 다음 메시지 번호
+if "saved_count" not in st.session_state: st.session_state.saved_count = 0
+if "chat_seq" not in st.session_state: st.session_state.chat_seq = 0
 
 # 초기값을 빈 값으로 설정
 if "user_profile" not in st.session_state:
     st.session_state.user_profile = {
         "major": "선택해주세요", "grade": "선택해주세요", "semester": "선택해주세요", 
-        "credit": 19, "requirements": "", "blocked_days": []
+        "credit": 19, "requirements": "", "blocked_days": [], "admission_year": None
     }
-if "grade_card_img" not in st.session_state: st.session_state.grade_card_img = []
+# 성적표: 참조(grade_cards)는 항상 세션에, 이미지 본문(grade_card_img: hash → base64)은 필요할 때만 로드
+if "grade_cards" not in st.session_state: st.session_state.grade_cards = []
+if "grade_card_img" not in st.session_state: st.session_state.grade_card_img = {}
+# 마지막 시간표 (timetable_render.compact 형식, 수정 요청의 기준)
 if "timetable_data" not in st.session_state: st.session_state.timetable_data = ""
 if "graduation_data" not in st.session_state: st.session_state.graduation_data = ""
 
+def grade_card_images(cards):
+    cache = st.session_state.grade_card_img
+    missing = [c for c in cards if c["hash"] not in cache]
+    if missing: cache.update(fb_manager.load_grade_cards(missing))
+    return [cache[c["hash"]] for c in cards if c["hash"] in cache]
+
+# 코퍼스(mmap, manifest 만 읽음)와 강의시간표 강좌 테이블을 백그라운드 스레드에서 로드
+# 강좌 테이블을 다시 만들어야 하면 코퍼스가 이미 읽은 강의시간표 페이지를 쓴다 (PDF 를 두 번 파싱하지 않음)
+# 첫 실행은 로딩을 시작만 하고 바로 화면을 그린다 (사이드바는 그동안 조작 가능). 도구가 처음 쓸 때 result() 로 기다린다
+
 @st.cache_resource
-def load_knowledge_base():
-    if not os.path.exists("data"): return ""
-    pdf_files = glob.glob("data/*.pdf")
-    if not pdf_files: return ""
-    all_content = ""
-    for pdf_file in pdf_files:
-        try:
-            loader = PyPDFLoader(pdf_file)
-            pages = loader.load_and_split()
-            for page in pages: all_content += page.page_content
-        except: continue
-    return all_content
+def start_data_load():
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="data-load")
+    corpus = pool.submit(lambda: load_corpus() if os.path.exists("data") else None)
+    catalog = pool.submit(lambda: load_catalog(corpus=corpus.result()))
+    return types.SimpleNamespace(
+        corpus=corpus, catalog=catalog,
+        partitions=pool.submit(lambda: PartitionStore(corpus.result(), load_partition) if corpus.result() else None),
+        version=pool.submit(lambda: data_version(corpus.result(), catalog.result())),
+    )
+
+DATA = start_data_load()
 
-PRE_LEARNED_DATA = load_knowledge_base()
+def data_ready():
+    return all(f.done() for f in vars(DATA).values())
+
+# 코퍼스는 (종류, 학기) 파티션 단위로 꺼내 쓴다. 학생의 학기(미선택 시 날짜)에 맞는 파티션만 메모리에 올리고
+# 최근에 쓴 몇 개만 유지하므로, 보관한 학기가 늘어나도 프롬프트와 메모리는 한 학기 분량이다
+def partition(kind, profile):
+    return profile_partition(DATA.partitions.result(), kind, profile)
+
+def partition_text(kind, profile):
+    part = partition(kind, profile)
+    return part.text if part else ""
+
+def course_catalog():
+    return DATA.catalog.result()
+
+# 학과·입학년도별 졸업요건 (자료집에서 옮겨 적은 data/graduation_rules.json, 작아서 바로 로드)
+@st.cache_resource
+def load_graduation_rules():
+    return load_rules()
+
+GRADUATION_RULES = load_graduation_rules()
 
 # -----------------------------------------------------------------------------
-# [AI Tools] 에이전트 도구 (Throttling 적용)
+# [AI Tools] 에이전트 도구 (Rate Limiter 적용)
 # -----------------------------------------------------------------------------
-def get_llm(model_name="gemini-2.5-flash-preview-09-2025"):
+# 의도별 모델 등급 (prompts.INTENT_TIERS). 예: secrets.toml 의 [LLM_INTENT_TIERS] QA = "FULL", [LLM_MODEL_TIERS.LIGHT] model = "..."
+def tier(intent):
+    return llm_tier(intent, table_setting(setting("LLM_MODEL_TIERS")), table_setting(setting("LLM_INTENT_TIERS")))
+
+# 클라이언트는 (모델, 출력 상한, 타임아웃, 재시도) 조합마다 하나를 만들어 모든 세션/재실행이 같이 쓴다
+@st.cache_resource
+def load_llm(model, max_output_tokens, timeout, max_retries):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model=model, temperature=0, google_api_key=api_key,
+                                  max_output_tokens=max_output_tokens, timeout=timeout, max_retries=max_retries)
+
+def get_llm(intent):
     if not api_key: return None
-    return ChatGoogleGenerativeAI(model=model_name, temperature=0, google_api_key=api_key)
+    return load_llm(**tier(intent))
+
+# 세션 간 공유되는 응답 캐시 (SQLite, LRU/TTL, 동일 요청 single-flight)
+@st.cache_resource
+def load_response_cache():
+    return ResponseCache(setting("LLM_CACHE_PATH") or CACHE_PATH)
 
-# 1. QA
-def tool_qa(query, profile):
-    time.sleep(2) # [Throttling] 강제 휴식
-    llm = get_llm()
+RESPONSE_CACHE = load_response_cache()
+
+# 캐시 적중 시 즉시 반환, 미스일 때만 compute() 로 LLM 호출
+# 캐시 키에는 의도의 등급 모델이 들어간다 (등급 설정을 바꾸면 해당 의도의 캐시는 새로 채워짐)
+def cached_llm_call(intent, text, profile_fields, compute):
+    version, model = DATA.version.result(), tier(intent)["model"]
+    key = ResponseCache.make_key(intent, text, profile_fields, model, version)
+    with UI.trace.span(f"llm.{intent}", cache="hit", model=model) as span:
+        def counted():
+            span["cache"] = "miss"
+            return compute()
+        res = RESPONSE_CACHE.get_or_compute(key, counted, intent, {"corpus": version})
+        span["chars"] = len(res)
+    UI.trace.count(f"cache.{span['cache']}", intent=intent)
+    UI.trace.count("llm.output_chars", len(res) if span["cache"] == "miss" else 0)
+    return res
+
+# cached_llm_call 의 스트리밍 버전: 조각을 바로 화면에 흘려보내고, 끝난 응답만 캐시에 저장
+def cached_llm_stream(intent, text, profile_fields, make_stream):
+    version, model = DATA.version.result(), tier(intent)["model"]
+    key = ResponseCache.make_key(intent, text, profile_fields, model, version)
+    trace, span = UI.trace, {"cache": "hit", "model": model}
+    def counted():
+        span["cache"] = "miss"
+        return limited_stream(make_stream)
+    try:
+        chars = 0
+        for chunk in trace.stream(f"llm.{intent}", RESPONSE_CACHE.stream_through(key, counted, intent, {"corpus": version}), span):
+            chars += len(chunk)
+            yield chunk
+        trace.count("llm.output_chars", chars if span["cache"] == "miss" else 0)
+    except RateLimitExceeded:
+        trace.count("llm.rate_limited")
+        yield RATE_LIMIT_MESSAGE
+    except Exception as e:
+        if not is_rate_limit_error(e): raise
+        trace.count("llm.rate_limited")
+        yield RATE_LIMIT_MESSAGE
+    finally:
+        trace.count(f"cache.{span['cache']}", intent=intent)
+
+# -----------------------------------------------------------------------------
+# [Conversation Memory] 이전 대화를 의도별 토큰 예산 안에서 프롬프트에 넣는다 (chat_memory)
+# -----------------------------------------------------------------------------
+# 요약은 session_id 별로 session_state 에 두고, 턴이 끝난 뒤 백그라운드에서 창 밖으로 밀려난 메시지만 덧붙여 갱신한다.
+# 이전 대화가 들어간 응답은 캐시 키에도 이전 대화가 들어간다 (첫 질문/후속 질문이 아닌 QA 는 기존 키 그대로).
+def summarize_turns(previous, lines, user):
     prompt = f"""
-    [학생 정보] {profile['major']} {profile['grade']}
-    [문서] {PRE_LEARNED_DATA[:50000]}...
-    [질문] {query}
-    문서 내용을 바탕으로 답변해. 근거 문장은 " "로 인용해.
+    [이전 요약] {previous or "(없음)"}
+    [새 대화]
+    {chr(10).join(lines)}
+    위 학사 상담 대화를 이전 요약에 이어 5줄 이내로 요약해. 학생이 원한 것, 정해진 과목/시간표, 남은 질문 위주로.
     """
-    return run_with_retry(lambda: llm.invoke(prompt).content)
+    # 실패는 예외로 올려 보내 캐시에 남지 않게 한다 (ConversationMemory 가 간단한 요약으로 대신함)
+    compute = lambda: RATE_LIMITER.call(lambda: invoke_text(get_llm("MEMORY_SUMMARY"), prompt), user=user, on_retry=count_retry)
+    return cached_llm_call("MEMORY_SUMMARY", prompt, {}, compute)
+
+def conversation_memory():
+    memories = st.session_state.setdefault("memory", {})
+    if st.session_state.session_id not in memories:
+        memories[st.session_state.session_id] = ConversationMemory()
+    return memories[st.session_state.session_id]
+
+# 다음 실행(rerun)과 겹쳐 돌 수 있으므로 스레드 안에서는 session_state 를 쓰지 않는다
+def update_memory_in_background(memory, messages):
+    user = limiter_user()
+    summarize = lambda previous, lines: summarize_turns(previous, lines, user)
+    threading.Thread(target=memory.update, args=(messages, summarize), daemon=True).start()
+
+def with_history(text, history):
+    return f"{text}\n[이전 대화]\n{history}" if history else text
+
+# 1. QA (응답 조각을 yield)
+# "그거 말고 다른 거" 같은 후속 질문만 이전 대화를 보고, 검색도 직전 질문과 합쳐서 한다
+def tool_qa(query, profile, history=""):
+    history = history if is_followup(query) else ""
+    last = next((l.split(": ", 1)[1] for l in reversed(history.splitlines()) if l.startswith("사용자: ")), "")
+    def make_stream():
+        with UI.trace.span("retrieval", intent="QA") as span:
+            prompt = qa_prompt(query, profile, partition(HANDBOOK, profile), history, f"{last} {query}")
+            span["prompt_chars"] = len(prompt)
+        return get_llm("QA").stream(prompt)
+    return cached_llm_stream("QA", with_history(query, history), profile_fields(profile, *CACHE_FIELDS["QA"]), make_stream)
 
 # 2. 시간표 생성
+# 조합 탐색은 scheduler, HTML 표는 timetable_render 가 로컬에서 만든다.
+# LLM 은 추가 요구사항이 있을 때 후보 번호 하나만 고른다. 반환: (본문, 구조화 시간표 또는 None)
 def tool_generate_timetable(profile, extra_req=""):
-    time.sleep(2) # [Throttling] 강제 휴식
-    llm = get_llm()
-    blocked = ", ".join(profile['blocked_days']) + "요일" if profile['blocked_days'] else "없음"
+    options = cached_timetables(profile)
+    if not options:
+        return llm_generate_timetable(profile, extra_req), None
+
+    wishes = f"{profile['requirements']} {extra_req}".strip()
+    choice = pick_timetable(options, wishes, profile) if wishes and len(options) > 1 else 0
+    best = compact(options[choice])
+    return f"{render_timetable(best)}\n\n{summarize(options)}", best
+
+# 기본 프로필의 후보는 warm_cache.py 가 미리 계산해 둔다 (같은 캐시 키, 데이터 버전이 바뀌면 자동 무효)
+def cached_timetables(profile):
+    version = DATA.version.result()
+    key = cache_key("TIMETABLE_OPTIONS", "", profile, version, SCHEDULER_MODEL)
+    compute = lambda: json.dumps(build_timetables(course_catalog(), profile), ensure_ascii=False)
+    return json.loads(RESPONSE_CACHE.get_or_compute(key, compute, "TIMETABLE_OPTIONS", {"corpus": version}))
+
+# 수정 요청("공학수학1 빼줘", "금요일 공강", "회로이론 다른 분반")은 마지막 시간표에 로컬 델타로 적용
+# 바뀌는 과목만 나머지 과목과 충돌 검사하므로 나머지 배치는 그대로다. 연산을 못 찾으면 None (전체 재생성)
+@st.cache_resource
+def load_term_sections(term):
+    return term_sections(course_catalog(), term)
+
+def tool_edit_timetable(timetable, prompt, profile):
+    if not timetable or not timetable.get("term"): return None
+    sections = load_term_sections(timetable["term"])
+    ops = parse_edits(prompt, timetable, sections, profile.get("major"), profile.get("grade"))
+    if not ops: return None
+    edited, notes = apply_edits(timetable, ops, sections, profile)
+    notes.append(f"총 {edited['credits']:g}학점 (목표 {profile['credit']}학점)")
+    return f"{render_timetable(edited)}\n\n" + "\n".join(f"- {n}" for n in notes), edited
+
+def pick_timetable(options, wishes, profile):
+    candidates = "\n\n".join(f"[후보 {i + 1}]\n{describe(o)}" for i, o in enumerate(options))
+    def compute():
+        llm = get_llm("TIMETABLE_PICK")
+        prompt = f"""
+        아래는 검증이 끝난 시간표 후보야 (시간 충돌, 대상 학년, 목표 학점, 공강 요일 모두 확인됨).
+        학생 요구사항: {wishes}
+        {candidates}
+        요구사항에 가장 잘 맞는 후보 번호 하나만 숫자로 답해.
+        """
+        return run_with_retry(lambda: invoke_text(llm, prompt))
+    res = cached_llm_call("TIMETABLE_PICK", wishes, profile_fields(profile, "major", "grade", "semester", "credit", "blocked_days"), compute)
+    m = re.search(r"\d+", str(res))
+    idx = int(m.group(0)) - 1 if m else 0
+    return idx if 0 <= idx < len(options) else 0
+
+# 강좌 테이블에서 후보를 만들 수 없을 때(학과 미지원, 시간표 PDF 없음)만 쓰는 기존 방식
+def llm_generate_timetable(profile, extra_req=""):
+    def compute():
+        llm = get_llm("TIMETABLE")
+        blocked = ", ".join(profile['blocked_days']) + "요일" if profile['blocked_days'] else "없음"
     
-    instruction = """
-    [★★★ 핵심 알고리즘: 3단계 검증 (Strict Verification) ★★★]
-    1. **Step 1:** 요람에서 '{major} {grade} {semester}' 필수 과목 추출.
-    2. **Step 2 (학년 검증):** 시간표 데이터에서 해당 과목의 대상 학년이 '{grade}'와 일치하는지 확인. 불일치 시 제외.
-    3. **Step 3 (정밀 대조):** 과목명이 정확히 일치하는 시간표만 사용.
+        instruction = """
+        [★★★ 핵심 알고리즘: 3단계 검증 (Strict Verification) ★★★]
+        1. **Step 1:** 요람에서 '{major} {grade} {semester}' 필수 과목 추출.
+        2. **Step 2 (학년 검증):** 시간표 데이터에서 해당 과목의 대상 학년이 '{grade}'와 일치하는지 확인. 불일치 시 제외.
+        3. **Step 3 (정밀 대조):** 과목명이 정확히 일치하는 시간표만 사용.
     
-    [출력 형식: HTML Table]
-    - 행: 1교시(09:00~) ~ 9교시
-    - 열: 월~일 (7일)
-    - 같은 과목 같은 배경색.
-    - **온라인/시간미지정 과목은 표의 맨 아래 행에 포함** (colspan 사용).
-    """
+        [출력 형식: HTML Table]
+        - 행: 1교시(09:00~) ~ 9교시
+        - 열: 월~일 (7일)
+        - 같은 과목 같은 배경색.
+        - **온라인/시간미지정 과목은 표의 맨 아래 행에 포함** (colspan 사용).
+        """
     
-    prompt = f"""
-    전문가로서 시간표를 생성해.
-    정보: {profile['major']} {profile['grade']} {profile['semester']}, 목표 {profile['credit']}학점.
-    공강 요청: {blocked}. 추가요구: {profile['requirements']} {extra_req}.
-    {instruction}
-    [데이터] {PRE_LEARNED_DATA}
-    """
-    res = run_with_retry(lambda: llm.invoke(prompt).content)
+        prompt = f"""
+        전문가로서 시간표를 생성해.
+        정보: {profile['major']} {profile['grade']} {profile['semester']}, 목표 {profile['credit']}학점.
+        공강 요청: {blocked}. 추가요구: {profile['requirements']} {extra_req}.
+        {instruction}
+        [데이터] {partition_text(HANDBOOK, profile)}{partition_text(TIMETABLE, profile)}
+        """
+        return run_with_retry(lambda: invoke_text(llm, prompt))
+    text = f"{profile['requirements']} {extra_req}"
+    res = cached_llm_call("TIMETABLE", text, profile_fields(profile, "major", "grade", "semester", "credit", "blocked_days"), compute)
     return clean_html_output(res)
 
-# 3. 졸업 진단
-def tool_audit_graduation(profile, images_b64):
-    if not images_b64:
-        return "⚠️ 저장된 성적표 이미지가 없습니다. 사이드바에서 업로드해주세요."
+# 3. 졸업 진단 (응답 조각을 yield)
+# 성적표 → 이수 과목 리스트(업로드당 LLM 1회, 프로필에 저장) → 졸업요건 판정(로컬) → 조언(LLM, 판정 결과만 전달)
+# 학과/학번 규칙이 없거나 성적표를 읽지 못하면 해당 학기 자료집(요람)을 통째로 보내는 기존 방식으로 진단한다.
+def tool_audit_graduation(profile, cards):
+    if not cards:
+        return iter(["⚠️ 저장된 성적표 이미지가 없습니다. 사이드바에서 업로드해주세요."])
     
-    time.sleep(2) # [Throttling] 강제 휴식
-    llm = get_llm()
-    image_content = [{"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{img}"}} for img in images_b64]
-    
-    prompt_text = f"""
-    학생: {profile['major']} {profile['grade']}
-    성적표 이미지를 분석해 [학습된 요람]과 대조하여 졸업 요건을 진단해.
-    종합 판정, 이수 현황(표), 미이수 과목, 조언 순서로 작성.
-    [요람] {PRE_LEARNED_DATA}
-    """
+    program = GRADUATION_RULES.program(profile["major"], admission_year(profile)) if GRADUATION_RULES else None
+    courses = load_transcript(profile, cards) if program else []
+    if not courses:
+        images_b64 = grade_card_images(cards)
+        if not images_b64: return iter(["⚠️ 저장된 성적표 이미지를 불러오지 못했습니다. 다시 업로드해주세요."])
+        return llm_audit_graduation(profile, images_b64, transcript_key([c["hash"] for c in cards]))
     
-    msg = HumanMessage(content=[{"type": "text", "text": prompt_text}] + image_content)
-    return run_with_retry(lambda: llm.invoke([msg]).content)
+    report = format_report(evaluate(program, courses, GRADUATION_RULES.renamed))
+    def make_stream():
+        llm = get_llm("GRADUATION_ADVICE")
+        prompt = f"""
+        학생: {profile['major']} {profile['grade']}
+        아래는 학생의 성적표를 학과 졸업요건과 대조한 판정 결과야. 판정은 이미 끝났으니 다시 계산하지 마.
+        {report}
+        미충족 항목을 채우기 위한 수강 계획과 주의사항을 3~5줄로 조언해.
+        """
+        return llm.stream(prompt)
+    def stream():
+        yield report + "\n\n"
+        yield from cached_llm_stream("GRADUATION_ADVICE", report, profile_fields(profile, "major", "grade"), make_stream)
+    return stream()
 
-# 4. [최적화] 키워드 기반 라우팅 (API 호출 0회)
-def decide_intent_rule_based(user_input):
-    intents = []
-    text = user_input.replace(" ", "") # 띄어쓰기 무시
-    
-    # 키워드 사전
-    kw_timetable = ["시간표", "짜줘", "만들어", "수정", "빼줘", "넣어줘"]
-    kw_graduation = ["졸업", "학점", "이수", "요건", "진단", "성적"]
-    kw_qa = ["규정", "장학", "재수강", "설명", "알려줘", "뭐야", "?", "기준"]
-    
-    # 1. 졸업 진단
-    if any(k in text for k in kw_graduation):
-        intents.append("GRADUATION")
-    
-    # 2. 시간표 (졸업 진단과 함께 요청 가능)
-    if any(k in text for k in kw_timetable):
-        intents.append("TIMETABLE")
+# 프로필에 저장된 이수 과목을 재사용하고, 성적표 이미지가 바뀌었을 때만 다시 추출
+def load_transcript(profile, cards):
+    key = transcript_key([c["hash"] for c in cards])
+    saved = profile.get("transcript") or {}
+    if saved.get("images") == key: return saved.get("courses") or []
+    images_b64 = grade_card_images(cards)
+    courses = extract_transcript(images_b64, key) if images_b64 else []
+    if courses:
+        profile["transcript"] = {"images": key, "courses": courses}
+        if st.session_state.user: fb_manager.save_profile(profile, cards)
+    return courses
+
+# 성적표 이미지 → [{"code", "name", "credits", "category", "grade", "term"}]
+# 과목을 하나도 읽지 못한 응답(잘림/형식 오류)은 예외로 올려 캐시에 남기지 않는다 (같은 이미지를 다음에 다시 추출)
+def extract_transcript(images_b64, images_hash):
+    def compute():
+        llm = get_llm("TRANSCRIPT")
+        image_content = [{"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{img}"}} for img in images_b64]
+        prompt_text = """
+        성적표 이미지에 있는 모든 과목을 JSON 배열로만 출력해. 다른 설명은 쓰지 마.
+        형식: [{"code": "학정번호", "name": "과목명", "credits": 학점(숫자), "category": "이수구분(전필/전선/교필/교선/기필/기선 등)",
+               "grade": "성적(A+, P, F 등)", "term": "이수학기(예: 2024-1)"}]
+        """
+        from langchain_core.messages import HumanMessage
+        msg = HumanMessage(content=[{"type": "text", "text": prompt_text}] + image_content)
+        text = run_with_retry(lambda: invoke_text(llm, [msg]))
+        if text != RATE_LIMIT_MESSAGE and not parse_transcript(text):
+            raise ValueError("성적표에서 과목을 읽지 못했습니다.")
+        return text
+    try:
+        return parse_transcript(cached_llm_call("TRANSCRIPT", "", {"images": images_hash}, compute))
+    except (RateLimitExceeded, ValueError):
+        return []
+
+def llm_audit_graduation(profile, images_b64, images_hash):
+    def make_stream():
+        llm = get_llm("GRADUATION")
+        image_content = [{"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{img}"}} for img in images_b64]
         
-    # 3. QA (설명 요청이 포함된 경우)
-    if any(k in text for k in kw_qa):
-        # 시간표나 졸업과 같이 묻는 경우 QA를 먼저 수행
-        if "TIMETABLE" in intents or "GRADUATION" in intents:
-            if "설명" in text or "규정" in text:
-                intents.insert(0, "QA")
-        else:
-            intents.append("QA")
-            
-    # 아무것도 없으면 잡담
-    if not intents:
-        intents.append("CHAT")
+        prompt_text = f"""
+        학생: {profile['major']} {profile['grade']}
+        성적표 이미지를 분석해 [학습된 요람]과 대조하여 졸업 요건을 진단해.
+        종합 판정, 이수 현황(표), 미이수 과목, 조언 순서로 작성.
+        [요람] {partition_text(HANDBOOK, profile)}
+        """
         
-    return list(dict.fromkeys(intents)) # 중복 제거
+        from langchain_core.messages import HumanMessage
+        msg = HumanMessage(content=[{"type": "text", "text": prompt_text}] + image_content)
+        return llm.stream([msg])
+    # 같은 성적표 이미지일 때만 캐시 적중 (이미지 내용 해시를 키에 포함)
+    fields = dict(profile_fields(profile, "major", "grade", "semester"), images=images_hash)
+    return cached_llm_stream("GRADUATION", "", fields, make_stream)
+
+# 4. [최적화] 점수 기반 로컬 라우팅 (API 호출 0회, intent_router)
+# 의도별 확신도가 문턱을 넘은 것만 실행한다 (비싼 도구일수록 문턱이 높음, 모두 못 넘으면 CHAT)
+@st.cache_resource
+def load_intent_router():
+    return IntentRouter()
+
+def decide_intent(user_input):
+    return load_intent_router().route(user_input)
+
+# 5. 의도별 실행 (여러 의도는 동시에 실행하고 표시는 라우터 순서대로)
+MAX_PARALLEL_INTENTS = 3
+INTENT_LABELS = {
+    "QA": "📚 문서를 검색하고 있습니다...",
+    "TIMETABLE": "📅 시간표를 생성하고 있습니다...",
+    "GRADUATION": "🎓 성적표를 분석하고 있습니다...",
+    "CHAT": "💬 답변을 작성 중입니다...",
+}
+
+# 반환: {"content", "type", "data", "stream"} — stream 이 있으면 content 는 스트림이 끝난 뒤 채워진다
+# history: 이번 질문 이전의 대화 (current_chat 스냅샷)
+def run_intent(intent, prompt, profile, history=()):
+    res = {"content": "", "type": "text", "data": None, "stream": None}
+    with UI.trace.span("memory", intent=intent) as span:
+        context = conversation_memory().context(list(history), intent) if intent in ("QA", "CHAT") else ""
+        span["chars"] = len(context)
+    if intent == "QA":
+        res["stream"] = tool_qa(prompt, profile, context)
+    elif intent == "TIMETABLE":
+        with UI.trace.span("tool.TIMETABLE") as span:
+            edited = tool_edit_timetable(st.session_state.timetable_data, prompt, profile)
+            span["edit"] = bool(edited)
+            if edited:
+                res["content"], res["data"] = edited
+            else:
+                extra = prompt if "수정" in prompt or "빼줘" in prompt else ""
+                res["content"], res["data"] = tool_generate_timetable(profile, extra)
+        res["type"] = "html"
+    elif intent == "GRADUATION":
+        if not st.session_state.grade_cards:
+            res["content"] = "⚠️ 성적표 이미지가 없습니다. 사이드바에서 업로드해주세요."
+        else:
+            res["stream"] = tool_audit_graduation(profile, st.session_state.grade_cards)
+    else: # CHAT
+        chat = f"[이전 대화]\n{context}\n" if context else ""
+        res["stream"] = cached_llm_stream(
+            "CHAT", with_history(prompt, context), {},
+            lambda: get_llm("CHAT").stream(f"{chat}사용자: {prompt}\n친절한 학사 조교로서 답변해."))
+    return res
+
+# 백그라운드 스레드에서 끝까지 실행 (스크립트 컨텍스트를 붙여 session_state/상태창 접근 허용)
+def run_intent_in_background(ctx, intent, prompt, profile, history=()):
+    add_script_run_ctx(threading.current_thread(), ctx)
+    res = run_intent(intent, prompt, profile, history)
+    if res["stream"] is not None:
+        res["content"], res["stream"] = "".join(res["stream"]), None
+    return res
+
+# 백그라운드 의도가 끝나는 즉시 (화면 표시 순서와 상관없이) 상태줄을 바꾼다
+# 콜백은 의도를 실행한 스레드(스크립트 컨텍스트가 붙어 있음) 또는 이미 끝났으면 등록한 메인 스레드에서 불린다
+def mark_done(line, intent):
+    label = INTENT_LABELS.get(intent, INTENT_LABELS['CHAT'])
+    return lambda future: line.write(f"{label} {'⚠️' if future.exception() else '✅'}")
+
+# 턴이 끝나면 누적 지표에 반영하고 (설정돼 있으면) 파일로 내보낸다. 내보내기 실패는 응답에 영향을 주지 않음
+def export_trace(trace):
+    trace.finish()
+    st.session_state.last_trace = trace.to_dict()
+    try:
+        if setting("TRACE_LOG"): write_jsonl(setting("TRACE_LOG"), trace)
+        if setting("METRICS_FILE"): write_prometheus(setting("METRICS_FILE"), METRICS)
+    except OSError:
+        pass
+
+def debug_enabled():
+    return st.query_params.get("debug") == "1" or bool(setting("DEBUG_PANEL"))
 
 # -----------------------------------------------------------------------------
 # [UI] 사이드바 및 메인
@@ -366,16 +880,23 @@ with st.sidebar:
                 user, err = fb_manager.auth_user(email, pw, "login")
                 if user:
                     st.session_state.user = user
+                    chat_writer()   # 지난 실행에서 못 보낸 대화 저장(outbox)을 이어서 보냄
                     saved = fb_manager.load_profile()
                     if saved:
+                        cards = saved.pop('grade_cards', [])
+                        legacy = saved.pop('grade_card_img', None)
                         st.session_state.user_profile.update(saved)
-                        if 'grade_card_img' in saved:
-                            st.session_state.grade_card_img = saved['grade_card_img']
+                        if legacy:   # 예전 형식(프로필 문서에 base64 통째로) → 청크 문서로 옮김
+                            cards = from_legacy(legacy)
+                            st.session_state.grade_card_img = {c["hash"]: c.pop("b64") for c in cards}
+                            fb_manager.save_profile(st.session_state.user_profile, cards)
+                        st.session_state.grade_cards = [ref(c) for c in cards]
                         
                         # 위젯 키값 업데이트
                         if "major" in saved: st.session_state.agent_major = saved["major"]
                         if "grade" in saved: st.session_state.agent_grade = saved["grade"]
                         if "semester" in saved: st.session_state.agent_sem = saved["semester"]
+                        if saved.get("admission_year"): st.session_state.agent_year = saved["admission_year"]
                         if "credit" in saved: st.session_state.agent_credit = saved["credit"]
                         if "requirements" in saved: st.session_state.agent_reqs = saved["requirements"]
                         
@@ -398,7 +919,7 @@ with st.sidebar:
     st.subheader("📝 내 학사 정보 설정")
     st.caption("이 정보는 시간표, 졸업진단, 질문 답변 시 AI가 참고합니다.")
     
-    kw_depts = ["선택해주세요", "전자융합공학과", "전자공학과", "컴퓨터정보공학부", "소프트웨어학부", "정보융합학부", "경영학부"]
+    kw_depts = [UNSET] + DEPARTMENTS
     
     p = st.session_state.user_profile
     
@@ -406,8 +927,8 @@ with st.sidebar:
     major = st.selectbox("학과", kw_depts, index=major_idx, key="agent_major")
     
     c1, c2 = st.columns(2)
-    grades = ["선택해주세요", "1학년", "2학년", "3학년", "4학년"]
-    semesters = ["선택해주세요", "1학기", "2학기"]
+    grades = [UNSET] + GRADES
+    semesters = [UNSET] + SEMESTERS
     
     grade_idx = grades.index(p["grade"]) if p["grade"] in grades else 0
     sem_idx = semesters.index(p["semester"]) if p["semester"] in semesters else 0
@@ -415,6 +936,12 @@ with st.sidebar:
     grade = st.selectbox("학년", grades, index=grade_idx, key="agent_grade")
     semester = st.selectbox("학기", semesters, index=sem_idx, key="agent_sem")
     
+    # 졸업요건은 입학년도(학번)별로 다르다. 비워 두면 저장하지 않고 그때그때 학년으로 추정 (추정값은 안내만)
+    this_year = datetime.date.today().year
+    year = admission_year(dict(p, grade=grade, admission_year=None))
+    adm_year = st.number_input("입학년도 (학번)", 2000, this_year, p.get("admission_year"), key="agent_year",
+                               placeholder=f"비워 두면 {year} (학년으로 추정)" if year else "비워 두면 학년으로 추정")
+    
     credit = st.number_input("목표 학점", 0, 24, p["credit"], key="agent_credit")
     reqs = st.text_area("요구사항", value=p["requirements"], key="agent_reqs")
     
@@ -430,29 +957,37 @@ with st.sidebar:
     if st.button("설정 저장"):
         st.session_state.user_profile = {
             "major": major, "grade": grade, "semester": semester,
-            "credit": credit, "requirements": reqs, "blocked_days": new_blocked
+            "credit": credit, "requirements": reqs, "blocked_days": new_blocked,
+            "admission_year": int(adm_year) if adm_year else None, "transcript": p.get("transcript")
         }
         if st.session_state.user:
-            fb_manager.save_profile(st.session_state.user_profile, st.session_state.grade_card_img)
+            fb_manager.save_profile(st.session_state.user_profile, st.session_state.grade_cards)
         st.success("저장됨!")
     
     st.divider()
     
     # 성적표
     st.subheader("📄 성적표")
-    if st.session_state.grade_card_img:
-        st.info(f"✅ {len(st.session_state.grade_card_img)}장의 성적표가 저장되어 있습니다.")
+    cards = st.session_state.grade_cards
+    if cards:
+        st.info(f"✅ {len(cards)}장의 성적표가 저장되어 있습니다. ({sum(c['size'] for c in cards) / 1024:,.0f} KB)")
+        saved_tx = p.get("transcript") or {}
+        if saved_tx.get("images") == transcript_key([c["hash"] for c in cards]):
+            st.caption(f"이수 과목 {len(saved_tx.get('courses') or [])}개를 읽어 두었습니다. (성적표가 바뀔 때만 다시 읽음)")
     else:
         st.caption("저장된 성적표가 없습니다.")
 
     uploaded_imgs = st.file_uploader("새로 업로드 (기존 파일 덮어씀)", type=['png', 'jpg'], accept_multiple_files=True)
-    if uploaded_imgs:
-        imgs_b64 = []
-        for img in uploaded_imgs:
-            img_bytes = img.read()
-            imgs_b64.append(base64.b64encode(img_bytes).decode('utf-8'))
-        st.session_state.grade_card_img = imgs_b64
-        st.success("업로드 완료! (설정 저장을 눌러주세요)")
+    # 업로더는 rerun 마다 같은 파일을 돌려주므로 새 업로드일 때만 축소/재압축/중복 제거
+    upload_sig = [getattr(img, "file_id", img.name) for img in uploaded_imgs or []]
+    if uploaded_imgs and upload_sig != st.session_state.get("upload_sig"):
+        st.session_state.upload_sig = upload_sig
+        with UI.trace.span("image.ingest", files=len(uploaded_imgs)):
+            new_cards = ingest([img.getvalue() for img in uploaded_imgs])
+        st.session_state.grade_card_img = {c["hash"]: c.pop("b64") for c in new_cards}
+        st.session_state.grade_cards = [ref(c) for c in new_cards]
+        dropped = len(uploaded_imgs) - len(new_cards)
+        st.success(f"업로드 완료! (설정 저장을 눌러주세요){f' — 중복/읽을 수 없는 이미지 {dropped}장 제외' if dropped else ''}")
 
     st.divider()
 
@@ -463,18 +998,53 @@ with st.sidebar:
             for h in fb_manager.load_chat_history_list():
                 dt = h['updated_at'].strftime('%m/%d %H:%M') if h.get('updated_at') else ""
                 if st.button(f"💬 {h.get('summary', '대화')} ({dt})", key=h['id']):
-                    st.session_state.current_chat = h['messages']
+                    # 이어서 대화하면 같은 세션에 append
+                    st.session_state.current_chat = list(fb_manager.load_chat_messages(h['id']))
+                    st.session_state.session_id = h['id']
+                    st.session_state.saved_count = len(st.session_state.current_chat)
+                    st.session_state.chat_seq = next_seq(st.session_state.current_chat)
+                    st.session_state.timetable_data = next((m["data"] for m in reversed(st.session_state.current_chat) if m.get("data")), "")
                     st.rerun()
         else: st.caption("로그인 필요")
         
     with tab2:
         if st.session_state.user:
-            for b in fb_manager.load_bookmarks():
-                with st.expander(f"📌 {b.get('note', '항목')}"):
-                    if b['type'] == 'html': st.markdown(b['content'], unsafe_allow_html=True)
-                    else: st.markdown(b['content'])
+            page = fb_manager.load_bookmarks()
+            opened = st.session_state.setdefault("opened_bookmarks", set())
+            for b in page["items"]:
+                with st.expander(f"📌 {b.get('note', '항목')}", expanded=b['id'] in opened):
+                    if b['id'] not in opened:
+                        if st.button("열기", key=f"open_{b['id']}"):
+                            opened.add(b['id'])
+                            st.rerun()
+                        continue
+                    body = fb_manager.load_bookmark(b['id']) or {}
+                    if body.get('data'):
+                        st.markdown(render_timetable(body['data']), unsafe_allow_html=True)
+                        if st.button("✏️ 이 시간표 수정하기", key=f"edit_{b['id']}"):
+                            st.session_state.timetable_data = body['data']
+                            st.toast("이제 채팅으로 수정 요청을 보내세요. (예: 금요일 공강으로 수정해줘)")
+                    elif body.get('type') == 'html': st.markdown(body.get('content', ''), unsafe_allow_html=True)
+                    else: st.markdown(body.get('content', ''))
+            if not page["done"] and st.button("더 보기", key="more_bookmarks"):
+                fb_manager.load_more_bookmarks()
+                st.rerun()
         else: st.caption("로그인 필요")
 
+    # 디버그 패널 (?debug=1 또는 DEBUG_PANEL 설정 시): 마지막 턴의 구간/카운터와 프로세스 누적 지표
+    if debug_enabled():
+        with st.expander("🔧 디버그 (마지막 요청)"):
+            last = st.session_state.get("last_trace")
+            if last:
+                st.caption(f"총 {last['total_ms']:,.0f}ms · {last.get('intents')}")
+                st.code("\n".join(
+                    f"{s['start_ms']:>8,.1f} +{s['ms']:>8,.1f}ms  {s['name']}  "
+                    + " ".join(f"{k}={v}" for k, v in s.items() if k not in ("name", "start_ms", "ms", "thread"))
+                    for s in last["spans"]), language=None)
+                st.json(last["counters"])
+            else: st.caption("아직 요청이 없습니다.")
+            st.json({"process": METRICS.snapshot(), "cache": RESPONSE_CACHE.stats(), "rate_limiter": RATE_LIMITER.stats()}, expanded=False)
+
 # -----------------------------------------------------------------------------
 # [Main] 채팅 인터페이스
 # -----------------------------------------------------------------------------
@@ -489,66 +1059,80 @@ else:
     st.caption(f"**{profile['major']} {profile['grade']}**님, 무엇을 도와드릴까요?")
 
     # 대화 내용 출력
-    for msg in st.session_state.current_chat:
+    for i, msg in enumerate(st.session_state.current_chat):
         with st.chat_message(msg["role"]):
             if msg.get("type") == "html": st.markdown(msg["content"], unsafe_allow_html=True)
             else: st.markdown(msg["content"])
             
             if msg["role"] == "assistant" and st.session_state.user:
-                k = f"save_{hash(str(msg['content']))}"
+                k = f"save_{i}_{hash(str(msg['content']))}"   # 같은 답변이 두 번 나와도 키가 겹치지 않게
                 if st.button("💾 저장", key=k):
                     note = "시간표" if msg.get("type") == "html" else "답변"
-                    fb_manager.add_bookmark(msg.get("type", "text"), msg["content"], note)
+                    fb_manager.add_bookmark(msg.get("type", "text"), msg["content"], note, msg.get("data"))
                     st.toast("저장됨!")
 
     # 사용자 입력 처리
     if prompt := st.chat_input("예: 1학년 시간표 짜줘, 졸업 요건 봐줘"):
         st.session_state.current_chat.append({"role": "user", "content": prompt})
         with st.chat_message("user"): st.markdown(prompt)
+        UI.trace = Trace("turn", METRICS, session=st.session_state.session_id[:8])
 
         with st.chat_message("assistant"):
-            # 에이전트 사고 과정 시각화 (Status Container)
-            with st.status("🤖 AI가 작업을 계획하고 있습니다...", expanded=True) as status:
-                
+            # 에이전트 사고 과정 시각화 (Status Container) + 그 아래에 답변을 스트리밍
+            status = st.status("🤖 AI가 작업을 계획하고 있습니다...", expanded=True)
+            answer_area = st.container()
+            UI.status = status
+            
+            with status:
+                if not data_ready(): st.write("📂 자료집을 불러오는 중입니다... (서버 시작 직후 한 번만)")
                 st.write("🔍 사용자의 의도를 분석 중입니다...")
-                intents = decide_intent_rule_based(prompt)
-                st.write(f"👉 작업 분류: {intents}")
+                with UI.trace.span("route") as span:
+                    intents, scores = decide_intent(prompt)
+                    span["intents"] = intents
+                UI.trace.attrs["intents"] = intents
+                st.write(f"👉 작업 분류: {intents} (" + ", ".join(f"{i} {scores[i]:.2f}" for i in intents) + ")")
                 
-                for intent in intents:
-                    res_con, res_type = "", "text"
-                    
-                    if intent == "QA":
-                        st.write("📚 문서를 검색하고 있습니다...")
-                        res_con = tool_qa(prompt, profile)
-                        
-                    elif intent == "TIMETABLE":
-                        st.write("📅 시간표를 생성하고 있습니다...")
-                        extra = prompt if "수정" in prompt or "빼줘" in prompt else ""
-                        res_con = tool_generate_timetable(profile, extra)
-                        res_type = "html"
-                        
-                    elif intent == "GRADUATION":
-                        st.write("🎓 성적표를 분석하고 있습니다...")
-                        if not st.session_state.grade_card_img:
-                             res_con = "⚠️ 성적표 이미지가 없습니다. 사이드바에서 업로드해주세요."
-                        else:
-                            res_con = tool_audit_graduation(profile, st.session_state.grade_card_img)
-                            
-                    else: # CHAT
-                        st.write("💬 답변을 작성 중입니다...")
-                        llm = get_llm()
-                        res_con = run_with_retry(lambda: llm.invoke(f"사용자: {prompt}\n친절한 학사 조교로서 답변해.").content)
-                    
-                    # 상태창 업데이트 완료
-                    status.update(label="완료!", state="complete", expanded=False)
+                progress = [st.empty() for _ in intents]
+                for line, intent in zip(progress, intents):
+                    line.write(f"{INTENT_LABELS.get(intent, INTENT_LABELS['CHAT'])} ⏳")
+            
+            # 첫 의도는 메인 스레드에서 스트리밍, 나머지는 동시에 백그라운드에서 실행
+            ctx = get_script_run_ctx()
+            history = st.session_state.current_chat[:-1]
+            with ThreadPoolExecutor(max_workers=MAX_PARALLEL_INTENTS) as pool:
+                futures = [None]
+                for line, it in zip(progress[1:], intents[1:]):
+                    futures.append(pool.submit(run_intent_in_background, ctx, it, prompt, profile, history))
+                    futures[-1].add_done_callback(mark_done(line, it))
+                
+                for i, intent in enumerate(intents):
+                    res = run_intent(intent, prompt, profile, history) if i == 0 else futures[i].result()
                     
-                    if res_type == "html": st.markdown(res_con, unsafe_allow_html=True)
-                    else: st.markdown(res_con)
+                    # 첫 조각이 도착하는 즉시 화면에 표시 (전체 텍스트는 write_stream 이 반환)
+                    with answer_area:
+                        if res["stream"] is not None: res["content"] = st.write_stream(res["stream"])
+                        elif res["type"] == "html": st.markdown(res["content"], unsafe_allow_html=True)
+                        else: st.markdown(res["content"])
+                    if i == 0: progress[i].write(f"{INTENT_LABELS.get(intent, INTENT_LABELS['CHAT'])} ✅")
                     
-                    st.session_state.current_chat.append({"role": "assistant", "content": res_con, "type": res_type})
+                    reply = {"role": "assistant", "content": res["content"], "type": res["type"]}
+                    if res["data"]:
+                        reply["data"] = res["data"]
+                        st.session_state.timetable_data = res["data"]   # 다음 수정 요청의 기준
+                    st.session_state.current_chat.append(reply)
+            
+            # 상태창 업데이트 완료
+            status.update(label="완료!", state="complete", expanded=False)
+            UI.status = None
+            # 오래된 메시지가 쌓였으면 다음 턴 전에 요약을 갱신 (응답 경로 밖에서)
+            update_memory_in_background(conversation_memory(), list(st.session_state.current_chat))
         
-        # 자동 저장
+        # 자동 저장 (이번 턴에 추가된 메시지만)
         if st.session_state.user:
-            fb_manager.save_chat_session(st.session_state.session_id, st.session_state.current_chat, summary=prompt[:15])
+            new_messages = st.session_state.current_chat[st.session_state.saved_count:]
+            fb_manager.append_chat_messages(st.session_state.session_id, new_messages, st.session_state.chat_seq, summary=prompt[:15])
+            st.session_state.saved_count += len(new_messages)
+            st.session_state.chat_seq += len(new_messages)
         
+        export_trace(UI.trace)
         st.rerun()
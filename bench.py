@@ -0,0 +1,539 @@
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import hashlib
+import argparse
+import datetime
+import tempfile
+import itertools
+import threading
+from collections import Counter, defaultdict
+from chat_memory import estimate_tokens
+
+# -----------------------------------------------------------------------------
+# [Benchmark] Gemini 할당량/운영 Firestore 없이 앱 전체 흐름의 성능을 잰다
+# -----------------------------------------------------------------------------
+# streamlit AppTest 로 app.py 를 화면 없이 실행하고, 고정된 한국어 질문 목록을 채팅으로 보낸다.
+#   LLM: FakeChatModel (결정적 응답, 첫 토큰 지연/초당 토큰 수 설정 가능)
+#   Firestore: FakeFirestore (인메모리, 읽기/쓰기 횟수 집계). 가입 → 성적표 → 채팅 → 대화 저장까지 실제 코드 경로를 탄다.
+#   응답 캐시/대화 outbox/trace 는 임시 디렉터리에 따로 만든다 (data/ 의 파일은 건드리지 않음).
+# 보고: 코퍼스/강좌 테이블 로드 시간, 최대 메모리(RSS), 의도별 턴 지연 백분위(첫 회=캐시 미스, 다음 회=캐시 적중),
+#       구간별 지연, 의도별 프롬프트 크기, LLM 호출 수, Firestore 읽기/쓰기 수.
+# 기준치(bench_baseline.json)와 비교해 머신과 상관없는 지표(프롬프트 크기, LLM 호출 수, Firestore 읽기/쓰기)가 나빠지면 exit 1.
+# 시간/메모리는 머신마다 달라서 참고로만 보여준다.
+#   python bench.py                  # 실행 후 기준치와 비교
+#   python bench.py --save           # 이번 결과를 기준치로 저장
+#   python bench.py --rpm 10         # 운영과 같은 분당 요청 한도로 (대기 시간 포함)
+APP_PATH = "app.py"
+BASELINE_PATH = "bench_baseline.json"
+FIRST_TOKEN_MS = 300
+TOKENS_PER_SEC = 150
+REPLY_TOKENS = 120
+RPM = 6000                 # 벤치마크는 한도 대기 없이 앱 자체 시간만 잰다 (기본)
+PASSES = 2                 # 1회차: 캐시 미스, 2회차부터: 같은 대화를 새 세션에서 반복 (캐시 적중)
+TIME_TOLERANCE = 0.25      # 시간 지표: 기준치 대비 25% + SLACK_MS 초과 시 표시 (참고용)
+SLACK_MS = 30
+SIZE_TOLERANCE = 0.10      # 크기/횟수 지표
+GATED = ("prompts.", "llm_calls.", "firestore.", "llm_clients")   # 넘으면 실패하는 지표 (결정적인 값만)
+TIMEOUT = 300
+
+PROFILE = {"major": "컴퓨터정보공학부", "grade": "2학년", "semester": "1학기", "credit": 19,
+           "requirements": "", "blocked_days": [], "admission_year": None}
+QUERIES = [
+    "재수강 규정 알려줘",
+    "수강신청 기간 알려줘",
+    "장학금 성적 기준 알려줘",
+    "그거 말고 수강 철회는?",
+    "2학년 시간표 짜줘",
+    "금요일 공강으로 시간표 짜줘",
+    "회로이론 분반 바꿔줘",
+    "공학수학1 빼줘",
+    "선형대수 넣어줘",
+    "졸업 요건 봐줘",
+    "졸업까지 몇 학점 남았어?",
+    "시간표 짜주고 재수강 규정도 알려줘",
+    "안녕",
+    "고마워",
+    "너는 누구야",
+]
+# 성적표 추출 요청에 돌려줄 이수 과목
+TRANSCRIPT = [
+    {"code": "", "name": "대학수학및연습1", "credits": 3, "category": "기필", "grade": "A+", "term": "2024-1"},
+    {"code": "", "name": "C프로그래밍", "credits": 3, "category": "전필", "grade": "A0", "term": "2024-1"},
+    {"code": "", "name": "광운인되기", "credits": 1, "category": "교필", "grade": "P", "term": "2024-1"},
+    {"code": "", "name": "대학물리학1", "credits": 3, "category": "기필", "grade": "B+", "term": "2024-1"},
+    {"code": "", "name": "자료구조", "credits": 3, "category": "전필", "grade": "A0", "term": "2024-2"},
+]
+FILLER = "자료집에 따르면 해당 규정은 학기마다 적용되며 자세한 내용은 학사 공지를 확인하세요".split()
+
+
+# -----------------------------------------------------------------------------
+# [Fakes] ChatGoogleGenerativeAI / Firestore 대역
+# -----------------------------------------------------------------------------
+class FakeChatModel:
+    # 설정과 호출 기록은 클래스 단위 (앱은 등급 설정마다 하나를 만들어 재사용, clients 로 센다)
+    first_token_ms = FIRST_TOKEN_MS
+    tokens_per_sec = TOKENS_PER_SEC
+    reply_tokens = REPLY_TOKENS
+    turn = None                # 벤치마크가 턴마다 설정 → 호출 기록을 턴에 묶는다
+    calls = []
+    clients = 0
+    inflight = 0
+    _lock = threading.Lock()
+
+    def __init__(self, model=None, temperature=0, google_api_key=None, **kwargs):
+        self.model = model
+        with self._lock: FakeChatModel.clients += 1
+
+    @staticmethod
+    def prompt_text(prompt):
+        if isinstance(prompt, str): return prompt
+        parts = []
+        for message in prompt:
+            content = getattr(message, "content", message)
+            if isinstance(content, str): parts.append(content)
+            else: parts += [p.get("text", "") for p in content if isinstance(p, dict) and p.get("type") == "text"]
+        return "\n".join(parts)
+
+    def reply(self, text):
+        if "번호 하나만" in text: return "1"
+        if "JSON 배열로만" in text: return json.dumps(TRANSCRIPT, ensure_ascii=False)
+        seed = int(hashlib.sha256(text.encode()).hexdigest()[:8], 16)
+        words = itertools.islice(itertools.cycle(FILLER), seed % len(FILLER), None)
+        out, size = [], 0
+        while size < self.reply_tokens * 2:
+            word = next(words)
+            out.append(word)
+            size += len(word) + 1
+        return " ".join(out)
+
+    def _record(self, text, reply):
+        usage = {"input_tokens": estimate_tokens(text), "output_tokens": estimate_tokens(reply)}
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        # 대화 요약(턴이 끝난 뒤 백그라운드 호출)은 따로 집계
+        kind = "MEMORY_SUMMARY" if "[이전 요약]" in text else None
+        with self._lock:
+            FakeChatModel.calls.append({"turn": FakeChatModel.turn, "kind": kind, "model": self.model, "prompt_chars": len(text), **usage})
+        return usage
+
+    @classmethod
+    def _busy(cls, n):
+        with cls._lock: cls.inflight += n
+
+    @classmethod
+    def wait_idle(cls, grace=0.05, timeout=30.0):
+        # 턴이 끝난 뒤 시작되는 백그라운드 호출(대화 요약)까지 끝나야 다음 턴의 프롬프트가 매번 같아진다
+        time.sleep(grace)
+        deadline = time.time() + timeout
+        while cls.inflight and time.time() < deadline: time.sleep(0.02)
+
+    def invoke(self, prompt):
+        from langchain_core.messages import AIMessage
+        self._busy(1)
+        try:
+            text = self.prompt_text(prompt)
+            reply = self.reply(text)
+            time.sleep((self.first_token_ms + estimate_tokens(reply) / self.tokens_per_sec * 1000) / 1000)
+            return AIMessage(content=reply, usage_metadata=self._record(text, reply))
+        finally:
+            self._busy(-1)
+
+    def stream(self, prompt):
+        from langchain_core.messages import AIMessageChunk
+        self._busy(1)
+        try:
+            text = self.prompt_text(prompt)
+            reply = self.reply(text)
+            time.sleep(self.first_token_ms / 1000)
+            step = 16   # 조각당 글자 수 (약 8토큰)
+            for i in range(0, len(reply), step):
+                if i: time.sleep(estimate_tokens(reply[i:i + step]) / self.tokens_per_sec)
+                yield AIMessageChunk(content=reply[i:i + step])
+            yield AIMessageChunk(content="", usage_metadata=self._record(text, reply))
+        finally:
+            self._busy(-1)
+
+
+class FakeSnapshot:
+    def __init__(self, id, data):
+        self.id, self._data, self.exists = id, data, data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeDocument:
+    def __init__(self, db, path):
+        self.db, self.path, self.id = db, path, path.split("/")[-1]
+
+    def collection(self, name):
+        return FakeCollection(self.db, f"{self.path}/{name}")
+
+    def set(self, data, merge=False):
+        self.db.ops["write"] += 1
+        data = {k: self.db.resolve(v) for k, v in data.items()}
+        if merge and self.path in self.db.store: self.db.store[self.path].update(data)
+        else: self.db.store[self.path] = data
+
+    def delete(self):
+        self.db.ops["write"] += 1
+        self.db.store.pop(self.path, None)
+
+    def get(self, field_paths=None):
+        self.db.ops["read"] += 1
+        data = self.db.store.get(self.path)
+        if data is not None and field_paths: data = {k: data[k] for k in field_paths if k in data}
+        return FakeSnapshot(self.id, data)
+
+
+class FakeQuery:
+    def __init__(self, collection, fields=None, order=None, limit=None, after=None):
+        self.collection, self.fields, self.order, self._limit, self.after = collection, fields, order, limit, after
+
+    def _with(self, **kwargs):
+        args = dict(collection=self.collection, fields=self.fields, order=self.order, limit=self._limit, after=self.after)
+        return FakeQuery(**{**args, **kwargs})
+
+    def select(self, fields): return self._with(fields=fields)
+    def order_by(self, field, direction=None): return self._with(order=(field, direction))
+    def limit(self, n): return self._with(limit=n)
+    def start_after(self, snapshot): return self._with(after=snapshot.id)
+
+    def stream(self):
+        db, path = self.collection.db, self.collection.path
+        rows = [(k.rsplit("/", 1)[1], v) for k, v in db.store.items() if k.rsplit("/", 1)[0] == path]
+        if self.order:
+            field, direction = self.order
+            rows.sort(key=lambda r: (r[1].get(field) is not None, r[1].get(field)), reverse=str(direction).upper().startswith("DESC"))
+        if self.after is not None:
+            ids = [r[0] for r in rows]
+            rows = rows[ids.index(self.after) + 1:] if self.after in ids else []
+        if self._limit: rows = rows[:self._limit]
+        db.ops["read"] += max(len(rows), 1)   # 결과가 없어도 쿼리 한 번은 읽기 1회로 과금
+        for id, data in rows:
+            yield FakeSnapshot(id, {k: data[k] for k in self.fields if k in data} if self.fields else data)
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, db, path):
+        self.db, self.path = db, path
+        super().__init__(self)
+
+    def document(self, id=None):
+        return FakeDocument(self.db, f"{self.path}/{id or uuid.uuid4().hex[:20]}")
+
+    def list_documents(self):
+        return [FakeDocument(self.db, k) for k in list(self.db.store) if k.rsplit("/", 1)[0] == self.path]
+
+    def add(self, data):
+        doc = self.document()
+        doc.set(data)
+        return None, doc
+
+
+class FakeBatch:
+    def __init__(self):
+        self.ops = []
+
+    def set(self, doc, data, merge=False):
+        self.ops.append((doc, data, merge))
+
+    def commit(self):
+        for doc, data, merge in self.ops: doc.set(data, merge)
+
+
+class FakeFirestore:
+    def __init__(self, server_timestamp=None):
+        self.store = {}
+        self.ops = Counter()
+        self.server_timestamp = server_timestamp
+        self._lock = threading.Lock()
+
+    def resolve(self, value):
+        if self.server_timestamp is not None and value is self.server_timestamp:
+            return datetime.datetime.now(datetime.timezone.utc)
+        return value
+
+    def collection(self, name): return FakeCollection(self, name)
+    def document(self, path): return FakeDocument(self, path)
+    def batch(self): return FakeBatch()
+    def get_all(self, refs): return [r.get() for r in refs]
+
+    def counts(self):
+        with self._lock: return dict(self.ops)
+
+
+def install_fakes():
+    # 앱은 두 라이브러리를 처음 쓸 때 import 하므로 모듈 속성만 바꿔 두면 된다
+    import langchain_google_genai
+    langchain_google_genai.ChatGoogleGenerativeAI = FakeChatModel
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+    db = FakeFirestore(firestore.SERVER_TIMESTAMP)
+    credentials.Certificate = lambda info: None
+    firebase_admin.initialize_app = lambda cred=None, *args, **kwargs: firebase_admin._apps.setdefault("[DEFAULT]", object())
+    firestore.client = lambda *args, **kwargs: db
+    return db
+
+
+# -----------------------------------------------------------------------------
+# [Run]
+# -----------------------------------------------------------------------------
+def percentile(values, p):
+    values = sorted(values)
+    if not values: return None
+    return values[min(len(values) - 1, max(0, -(-len(values) * p // 100) - 1))]
+
+
+def summarize_ms(values):
+    return {"n": len(values), "p50_ms": round(percentile(values, 50), 1), "p90_ms": round(percentile(values, 90), 1),
+            "max_ms": round(max(values), 1)}
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def sample_grade_card():
+    # 성적표 자리에 넣을 이미지 (줄무늬 PNG)
+    from PIL import Image, ImageDraw
+    img = Image.new("RGB", (900, 1200), "white")
+    draw = ImageDraw.Draw(img)
+    for y in range(60, 1200, 40): draw.line([(40, y), (860, y)], fill=(90, 90, 90), width=2)
+    buf = io.BytesIO()
+    img.save(buf, "PNG")
+    return buf.getvalue()
+
+
+def measure_loads():
+    from corpus import load_corpus
+    from catalog import load_catalog
+    started = time.perf_counter()
+    corpus = load_corpus() if os.path.exists("data") else None
+    corpus_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    catalog = load_catalog(corpus=corpus)
+    catalog_ms = (time.perf_counter() - started) * 1000
+    source = "pdf" if corpus is None or corpus.parsed else "artifact"
+    return {"corpus_load_ms": round(corpus_ms, 1), "catalog_load_ms": round(catalog_ms, 1), "corpus_source": source,
+            "documents": len(corpus.documents) if corpus else 0, "sections": len(catalog.df) if catalog is not None else 0}
+
+
+def new_session(at):
+    at.session_state.current_chat = []
+    at.session_state.session_id = str(uuid.uuid4())
+    at.session_state.saved_count = 0
+    at.session_state.chat_seq = 0
+    at.session_state.timetable_data = ""
+
+
+def wait_for_writes(db, settle=1.0, timeout=15.0):
+    # 대화 저장은 백그라운드 writer 가 보내므로 쓰기 수가 더 이상 늘지 않을 때까지 기다린다
+    deadline, last, stable = time.time() + timeout, None, time.time()
+    while time.time() < deadline:
+        now = db.counts().get("write", 0)
+        if now != last: last, stable = now, time.time()
+        elif time.time() - stable >= settle: return
+        time.sleep(0.1)
+
+
+def run(passes=PASSES, rpm=RPM, queries=QUERIES, timeout=TIMEOUT):
+    from streamlit.testing.v1 import AppTest
+    from image_store import ingest, ref
+
+    report = {"config": {"first_token_ms": FakeChatModel.first_token_ms, "tokens_per_sec": FakeChatModel.tokens_per_sec,
+                         "reply_tokens": FakeChatModel.reply_tokens, "rpm": rpm, "passes": passes, "queries": len(queries)}}
+    report["load"] = measure_loads()
+
+    db = install_fakes()
+    tmp = tempfile.mkdtemp(prefix="bench-")
+    trace_log = os.path.join(tmp, "traces.jsonl")
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    at.secrets["GOOGLE_API_KEY"] = "bench"
+    at.secrets["firebase_service_account"] = {"type": "bench"}
+    at.secrets["LLM_RPM"] = str(rpm)
+    at.secrets["LLM_CACHE_PATH"] = os.path.join(tmp, "llm_cache.sqlite3")
+    at.secrets["CHAT_OUTBOX_PATH"] = os.path.join(tmp, "chat_outbox.sqlite3")
+    at.secrets["TRACE_LOG"] = trace_log
+
+    started = time.perf_counter()
+    at.run()
+    report["load"]["first_run_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    errors = [str(e.value) for e in at.exception]
+
+    # 가입 → 프로필/성적표 설정
+    next(w for w in at.text_input if w.label == "이메일").set_value(f"bench-{uuid.uuid4().hex[:6]}@example.com")
+    next(w for w in at.text_input if w.label == "비밀번호").set_value("bench")
+    next(b for b in at.button if b.label == "가입").click().run()
+    at.session_state.user_profile = dict(PROFILE)
+    cards = ingest([sample_grade_card()])
+    at.session_state.grade_card_img = {c["hash"]: c.pop("b64") for c in cards}
+    at.session_state.grade_cards = [ref(c) for c in cards]
+    at.run()
+    report["firestore"] = {"login": db.counts()}
+
+    turns = []
+    for n in range(passes):
+        name = "cold" if n == 0 else "warm"
+        new_session(at)
+        before, calls = db.counts(), len(FakeChatModel.calls)
+        for i, query in enumerate(queries):
+            FakeChatModel.turn = (n, i)
+            started = time.perf_counter()
+            at.chat_input[0].set_value(query).run()
+            turns.append({"pass": name, "query": query, "wall_ms": (time.perf_counter() - started) * 1000})
+            errors += [f"{query}: {e.value}" for e in at.exception]
+            FakeChatModel.wait_idle()
+        wait_for_writes(db)
+        after = db.counts()
+        report["firestore"][f"pass{n + 1}"] = {k: after.get(k, 0) - before.get(k, 0) for k in ("read", "write")}
+        report.setdefault("llm_calls", {})[f"pass{n + 1}"] = len(FakeChatModel.calls) - calls
+    FakeChatModel.turn = None
+
+    traces = []
+    if os.path.exists(trace_log):
+        with open(trace_log, encoding="utf-8") as f:
+            traces = [json.loads(line) for line in f if line.strip()]
+    for turn, trace in zip(turns, traces):
+        turn["intents"] = "+".join(trace.get("intents") or ["?"])
+        turn["trace"] = trace
+
+    by_intent = defaultdict(list)
+    spans = defaultdict(list)
+    for n in range(passes):
+        for turn in turns[n * len(queries):(n + 1) * len(queries)]:
+            if "trace" not in turn: continue
+            by_intent[(f"pass{n + 1}", turn["intents"])].append(turn["trace"]["total_ms"])
+            if n == 0:
+                for span in turn["trace"]["spans"]: spans[span["name"]].append(span["ms"])
+    report["turns"] = {f"{p}.{intent}": summarize_ms(v) for (p, intent), v in sorted(by_intent.items())}
+    report["spans"] = {name: summarize_ms(v) for name, v in sorted(spans.items())}
+
+    prompts = defaultdict(list)
+    for call in FakeChatModel.calls:
+        if call["turn"] is None or call["turn"][0] != 0: continue
+        prompts[call["kind"] or turns[call["turn"][1]].get("intents", "?")].append(call)
+    report["prompts"] = {intent: {"calls": len(v), "avg_chars": round(sum(c["prompt_chars"] for c in v) / len(v)),
+                                  "max_chars": max(c["prompt_chars"] for c in v),
+                                  "input_tokens": sum(c["input_tokens"] for c in v)} for intent, v in sorted(prompts.items())}
+    report["models"] = dict(Counter(c["model"] for c in FakeChatModel.calls))
+    report["llm_clients"] = FakeChatModel.clients
+    report["load"]["peak_rss_mb"] = peak_rss_mb()
+    report["errors"] = errors
+    return report
+
+
+# -----------------------------------------------------------------------------
+# [Baseline] 기준치 비교
+# -----------------------------------------------------------------------------
+def flatten(report):
+    # 비교할 지표만 {이름: 값}
+    metrics = {f"load.{k}": v for k, v in report["load"].items() if isinstance(v, (int, float)) and v is not None}
+    for section in ("turns", "spans"):
+        for name, s in report[section].items():
+            metrics[f"{section}.{name}.p50_ms"] = s["p50_ms"]
+            metrics[f"{section}.{name}.p90_ms"] = s["p90_ms"]
+    for name, s in report["prompts"].items():
+        metrics[f"prompts.{name}.max_chars"] = s["max_chars"]
+        metrics[f"prompts.{name}.input_tokens"] = s["input_tokens"]
+    for phase, ops in report["firestore"].items():
+        for op, n in ops.items(): metrics[f"firestore.{phase}.{op}"] = n
+    for phase, n in report["llm_calls"].items(): metrics[f"llm_calls.{phase}"] = n
+    if "llm_clients" in report: metrics["llm_clients"] = report["llm_clients"]
+    return metrics
+
+
+def regressed(name, value, base):
+    if name.endswith("_ms"): return value > base * (1 + TIME_TOLERANCE) + SLACK_MS
+    return value > base * (1 + SIZE_TOLERANCE)
+
+
+def compare(report, baseline):
+    # 반환: 회귀 목록 [(이름, 기준치, 이번 값)] (GATED 지표만, 시간/메모리 변화는 출력만)
+    current, base = flatten(report), flatten(baseline)
+    if report["load"].get("corpus_source") != baseline["load"].get("corpus_source"):
+        print(f"ℹ️ 코퍼스 로드 방식이 다릅니다 (기준 {baseline['load'].get('corpus_source')}, 이번 {report['load'].get('corpus_source')}) — 로드 시간은 비교하지 않습니다.")
+        base = {k: v for k, v in base.items() if not k.startswith("load.")}
+    regressions, slower, improved = [], [], []
+    for name, old in sorted(base.items()):
+        if name not in current or old is None: continue
+        new = current[name]
+        if regressed(name, new, old): (regressions if name.startswith(GATED) else slower).append((name, old, new))
+        elif regressed(name, old, new): improved.append((name, old, new))
+    for name, old, new in improved:
+        print(f"   ✔ {name}: {old:,} → {new:,}")
+    for name, old, new in slower:
+        print(f"   ℹ️ {name}: {old:,} → {new:,} (참고)")
+    for name, old, new in regressions:
+        print(f"   ✗ {name}: {old:,} → {new:,}")
+    missing = sorted(set(base) - set(current))
+    if missing: print(f"   ℹ️ 이번 실행에 없는 지표 {len(missing)}개: {', '.join(missing[:5])}{' …' if len(missing) > 5 else ''}")
+    return regressions
+
+
+def print_report(report):
+    load = report["load"]
+    print(f"📦 코퍼스 {load['corpus_load_ms']:,.0f}ms ({load['corpus_source']}, 문서 {load['documents']}개) · "
+          f"강좌 테이블 {load['catalog_load_ms']:,.0f}ms ({load['sections']}행) · 첫 화면 {load['first_run_ms']:,.0f}ms · "
+          f"최대 RSS {load['peak_rss_mb']}MB")
+    print("⏱️ 턴 지연 (의도별)")
+    for name, s in report["turns"].items():
+        print(f"   {name:<32} n={s['n']:<3} p50 {s['p50_ms']:>8,.0f}ms  p90 {s['p90_ms']:>8,.0f}ms  max {s['max_ms']:>8,.0f}ms")
+    print("⏱️ 구간 지연 (1회차)")
+    for name, s in report["spans"].items():
+        print(f"   {name:<32} n={s['n']:<3} p50 {s['p50_ms']:>8,.1f}ms  p90 {s['p90_ms']:>8,.1f}ms")
+    print("📝 프롬프트 크기 (1회차)")
+    for name, s in report["prompts"].items():
+        print(f"   {name:<32} 호출 {s['calls']:<3} 평균 {s['avg_chars']:>7,}자  최대 {s['max_chars']:>7,}자  입력 {s['input_tokens']:>7,}토큰")
+    print(f"🤖 LLM 호출: {report['llm_calls']} · 모델별 {report.get('models', {})} · 클라이언트 {report.get('llm_clients', 0)}개")
+    print(f"🔥 Firestore: {report['firestore']}")
+    for e in report["errors"]: print(f"❌ {e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="가짜 LLM/Firestore 로 앱 전체 흐름 벤치마크")
+    parser.add_argument("--save", action="store_true", help="이번 결과를 기준치로 저장")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="기준치 파일")
+    parser.add_argument("--passes", type=int, default=PASSES, help="질문 목록 반복 횟수 (1회차 캐시 미스, 이후 적중)")
+    parser.add_argument("--rpm", type=int, default=RPM, help="분당 LLM 요청 한도")
+    parser.add_argument("--first-token-ms", type=int, default=FIRST_TOKEN_MS, help="가짜 LLM 첫 토큰 지연")
+    parser.add_argument("--tokens-per-sec", type=float, default=TOKENS_PER_SEC, help="가짜 LLM 출력 속도")
+    parser.add_argument("--reply-tokens", type=int, default=REPLY_TOKENS, help="가짜 LLM 응답 길이")
+    parser.add_argument("--json", help="전체 결과를 JSON 으로 저장할 경로")
+    args = parser.parse_args()
+
+    FakeChatModel.first_token_ms = args.first_token_ms
+    FakeChatModel.tokens_per_sec = args.tokens_per_sec
+    FakeChatModel.reply_tokens = args.reply_tokens
+    report = run(args.passes, args.rpm)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f: json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({k: v for k, v in report.items() if k != "errors"}, f, ensure_ascii=False, indent=2)
+        print(f"💾 기준치 저장: {args.baseline}")
+        sys.exit(1 if report["errors"] else 0)
+    if not os.path.exists(args.baseline):
+        print(f"ℹ️ 기준치 파일({args.baseline})이 없습니다. --save 로 만드세요.")
+        sys.exit(1 if report["errors"] else 0)
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("config") != report["config"]:
+        print("⚠️ 기준치와 설정(가짜 LLM 지연/한도/질문 수)이 다릅니다. 결과 비교가 의미 없을 수 있습니다.")
+    print(f"📊 기준치({args.baseline})와 비교")
+    regressions = compare(report, baseline)
+    if regressions:
+        print(f"❌ 회귀 {len(regressions)}건")
+    elif not report["errors"]:
+        print("✅ 기준치 안입니다.")
+    sys.exit(1 if regressions or report["errors"] else 0)
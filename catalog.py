@@ -0,0 +1,218 @@
+import os
+import re
+import glob
+from collections import Counter
+from corpus import CORPUS_DIR, file_sha256, extract_all
+
+# -----------------------------------------------------------------------------
+# [Catalog] 강의시간표 PDF → 강좌 테이블 (generate.py 가 빌드, app.py 가 로드)
+# -----------------------------------------------------------------------------
+# 한 줄 = 한 분반:  학정번호 과목명 [분반제한] 이수구분 학점 시수 [담당교수] [강의시간] [강의유형]
+#   예) 7060-2-4512-01 기초전자회로및실험1 전필 3 4 유지상 화5,6,7,금3 TBL강의
+CATALOG_VERSION = 1
+CATALOG_NAME = "catalog.pkl"
+TIMETABLE_GLOBS = ["*강의시간표*.pdf", "data/*강의시간표*.pdf"]
+DAYS = ["월", "화", "수", "목", "금", "토", "일"]
+GENERAL_DEPT = "교양"
+
+COLUMNS = ["term", "code", "name", "section", "department", "grade", "category", "credits", "hours",
+           "professor", "slots", "online", "restriction", "lecture_type"]
+
+_code_re = re.compile(r"^([0-9A-Z]{4})-(\d)-(\d{4})-(\d{2})\s+(.*)$")
+_row_re = re.compile(r"^(?:(?P<pre>.+?)\s+)?(?P<cat>[가-힣]{2})\s+(?P<credits>\d+(?:\.\d)?)\s+(?P<hours>\d+)(?:\s+(?P<tail>.*))?$")
+_time_re = re.compile(r"[월화수목금토일]\d+(?:,\d+)*(?:,[월화수목금토일]\d+(?:,\d+)*)*")
+_term_re = re.compile(r"(\d{4})학년도\s*([12])학기")
+_title_re = re.compile(r"^(?!\*|※)(.+?)\s*강의시간표")
+_english_word_re = re.compile(r"^[A-Za-z0-9&/().,:'\-+#]+$")
+
+
+def list_timetable_sources(patterns=None):
+    files = []
+    for pattern in patterns or TIMETABLE_GLOBS:
+        files.extend(glob.glob(pattern))
+    return sorted(set(files))
+
+
+def parse_slots(text):
+    # "화5,6,7,금3" → [("화", 5), ("화", 6), ("화", 7), ("금", 3)]
+    slots, day = [], None
+    for part in text.split(","):
+        part = part.strip()
+        if part and part[0] in DAYS:
+            day, part = part[0], part[1:]
+        if day and part.isdigit():
+            slots.append((day, int(part)))
+    return slots
+
+
+def format_slots(slots):
+    return " ".join(f"{d}{p}" for d, p in slots)
+
+
+def split_name(pre):
+    # 과목명 뒤에 붙는 분반 제한(예: "전융 2학년", "1학년만수강가능")을 분리. 영문 과목명은 여러 단어 허용
+    words = (pre or "").split()
+    if not words: return "", ""
+    n = 1
+    while n < len(words) and _english_word_re.match(words[n]) and _english_word_re.match(words[0]):
+        n += 1
+    return " ".join(words[:n]), " ".join(words[n:])
+
+
+def parse_tail(tail):
+    # "[담당교수] [강의시간] [강의유형]" 분리
+    tail = (tail or "").strip()
+    m = _time_re.search(tail)
+    if m:
+        professor, slots, lecture_type = tail[:m.start()].strip(), parse_slots(m.group(0)), tail[m.end():].strip()
+    else:
+        words = tail.split(maxsplit=1)
+        if words and not words[0].startswith("원격"):
+            professor, lecture_type = words[0], (words[1] if len(words) > 1 else "")
+        else:
+            professor, lecture_type = "", tail
+        slots = []
+    return professor, slots, lecture_type
+
+
+def page_department(title):
+    title = title.strip()
+    if "교양" in title and "교과목" in title: return GENERAL_DEPT
+    words = title.replace(" 교과목", "").split()
+    if len(words) >= 2 and words[-1] == "공통": return " ".join(words[-2:])
+    return words[-1] if words else ""
+
+
+def parse_line(line):
+    m = _code_re.match(line)
+    if not m: return None
+    prefix, grade, number, section, rest = m.groups()
+    r = _row_re.match(rest)
+    if not r: return None
+    name, restriction = split_name(r["pre"])
+    professor, slots, lecture_type = parse_tail(r["tail"])
+    return {
+        "code": f"{prefix}-{grade}-{number}", "prefix": prefix, "name": name, "section": section,
+        "grade": int(grade), "category": r["cat"], "credits": float(r["credits"]), "hours": int(r["hours"]),
+        "professor": professor, "slots": format_slots(slots),
+        "online": "원격수업100%" in lecture_type or (not slots and "원격" in lecture_type), "restriction": restriction, "lecture_type": lecture_type,
+    }
+
+
+def parse_pages(pages):
+    # 학과명은 페이지 하단 제목에 있으므로, 제목이 하나뿐인 페이지에서 학정번호 앞자리 → 학과 매핑을 학습해
+    # 제목이 없거나(이어지는 페이지) 여러 개인 페이지의 행에도 적용한다.
+    parsed, votes, last_title, term = [], {}, "", ""
+    for text in pages:
+        lines = text.splitlines()
+        t = _term_re.search(text)
+        if t: term = f"{t.group(1)}-{t.group(2)}"
+        titles = [page_department(m.group(1)) for m in map(_title_re.match, lines) if m]
+        rows = [r for r in map(parse_line, lines) if r]
+        if len(titles) == 1:
+            for r in rows:
+                if r["prefix"] != "0000":
+                    votes.setdefault(r["prefix"], Counter())[titles[0]] += 1
+        page_title = titles[0] if titles else last_title
+        if titles: last_title = titles[-1]
+        for r in rows:
+            r["term"], r["page_department"] = term, page_title
+        parsed.extend(rows)
+
+    prefix_dept = {p: c.most_common(1)[0][0] for p, c in votes.items()}
+    for r in parsed:
+        page_dept = r.pop("page_department")
+        r["department"] = prefix_dept.get(r.pop("prefix"), page_dept)
+    return parsed
+
+
+class CourseCatalog:
+    def __init__(self, df):
+        self.df = df
+        # 학과/대상학년별 행 인덱스 (필터링 시 전체 스캔 대신 사용)
+        self.by_department = df.groupby("department", observed=True).indices if len(df) else {}
+        self.by_grade = df.groupby("grade").indices if len(df) else {}
+        self.by_term = df.groupby("term", observed=True).indices if len(df) else {}
+
+    @property
+    def sources(self):
+        return self.df.attrs.get("sources", {})
+
+    def terms(self):
+        return sorted(self.by_term)
+
+    def filter(self, department=None, grade=None, term=None):
+        import numpy as np
+        idx = None
+        for key, table in ((department, self.by_department), (grade, self.by_grade), (term, self.by_term)):
+            if key is None: continue
+            keys = key if isinstance(key, (list, tuple, set)) else [key]
+            rows = np.concatenate([table.get(k, np.array([], dtype=np.intp)) for k in keys]) if keys else np.array([], dtype=np.intp)
+            idx = rows if idx is None else np.intersect1d(idx, rows)
+        return self.df if idx is None else self.df.iloc[np.sort(idx)]
+
+    def __len__(self):
+        return len(self.df)
+
+
+def build_frame(rows, sources):
+    import pandas as pd
+    df = pd.DataFrame(rows, columns=COLUMNS)
+    for col in ("term", "department", "category", "professor", "lecture_type"):
+        df[col] = df[col].astype("category")
+    df["grade"] = df["grade"].astype("int8")
+    df["hours"] = df["hours"].astype("int8")
+    df["credits"] = df["credits"].astype("float32")
+    df["online"] = df["online"].astype(bool)
+    df.attrs = {"version": CATALOG_VERSION, "sources": sources}
+    return df
+
+
+def save_catalog(df, out_dir=CORPUS_DIR):
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, CATALOG_NAME)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        df.to_pickle(tmp, compression="gzip")
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp): os.remove(tmp)
+
+
+def build_catalog(extracted, out_dir=CORPUS_DIR):
+    # extracted: corpus.extract_pdf 결과 리스트 (강의시간표 PDF)
+    rows = []
+    for doc in extracted:
+        rows.extend(parse_pages(doc["pages"]))
+    df = build_frame(rows, {d["source"]: d["sha256"] for d in extracted})
+    save_catalog(df, out_dir)
+    return CourseCatalog(df)
+
+
+def load_catalog(patterns=None, out_dir=CORPUS_DIR, corpus=None):
+    # 저장된 테이블이 현재 PDF 와 일치하지 않으면 다시 만들어 저장한다
+    # corpus(load_corpus 결과)를 주면 파일 해시와 페이지 텍스트를 거기서 가져온다 (PDF 를 두 번 읽지 않음)
+    import pandas as pd
+    sources = list_timetable_sources(patterns)
+    known = {d["source"]: d for d in corpus.documents} if corpus else {}
+    path = os.path.join(out_dir, CATALOG_NAME)
+    try:
+        df = pd.read_pickle(path, compression="gzip")
+    except Exception:
+        df = None
+    if df is not None and df.attrs.get("version") == CATALOG_VERSION:
+        cached = df.attrs.get("sources", {})
+        sha = lambda p: known[p]["sha256"] if p in known else file_sha256(p)
+        if sorted(cached) == sources and all(sha(p) == cached[p] for p in sources):
+            return CourseCatalog(df)
+    extracted = {p: {"source": p, "sha256": known[p]["sha256"], "pages": corpus.page_texts(known[p])}
+                 for p in sources if p in known}
+    extracted.update((d["source"], d) for d in extract_all([p for p in sources if p not in known]))
+    extracted = [extracted[p] for p in sources if p in extracted]
+    rows = [r for doc in extracted for r in parse_pages(doc["pages"])]
+    df = build_frame(rows, {d["source"]: d["sha256"] for d in extracted})
+    try:
+        save_catalog(df, out_dir)
+    except OSError:
+        pass   # 읽기 전용 볼륨이면 이번 프로세스에서만 쓴다
+    return CourseCatalog(df)
@@ -0,0 +1,117 @@
+import re
+import threading
+
+# -----------------------------------------------------------------------------
+# [Chat Memory] 의도별 토큰 예산 안에서 이전 대화를 프롬프트에 넣기
+# -----------------------------------------------------------------------------
+# 최근 메시지는 (압축해서) 그대로, 그보다 오래된 메시지는 누적 요약 한 덩어리로 넣는다.
+# HTML 시간표/표 같은 큰 결과는 "[시간표 2025-1 18학점: ...]" 같은 짧은 참조로 바꾼다.
+# 요약은 세션마다 하나를 유지하며, 창 밖으로 밀려난 메시지만 이전 요약에 덧붙여 갱신한다 (전체를 다시 요약하지 않음).
+CHARS_PER_TOKEN = 2          # 한국어 위주 텍스트의 보수적 추정 (토크나이저 없이)
+BUDGETS = {"QA": 800, "CHAT": 1200, "DEFAULT": 600}
+SUMMARY_SHARE = 0.3          # 예산 중 요약에 쓰는 최대 비율
+MAX_MESSAGE_TOKENS = 200     # 메시지 하나의 최대 길이 (넘으면 자름)
+SUMMARY_BATCH = 4            # 창 밖으로 밀려난 메시지가 이만큼 쌓이면 요약 갱신
+SUMMARY_TOKENS = 250
+
+FOLLOWUP_WORDS = ("그거", "그건", "그게", "이거", "저거", "그럼", "그러면", "다른", "아까", "방금", "위에",
+                  "그중", "거기", "말고", "더자세히", "왜")
+
+_table_re = re.compile(r"(?:^\|.*\|\s*$\n?)+", re.M)
+_tag_re = re.compile(r"<[^>]+>")
+_space_re = re.compile(r"\s+")
+
+
+def estimate_tokens(text):
+    return -(-len(text or "") // CHARS_PER_TOKEN)
+
+
+def clip(text, tokens):
+    limit = tokens * CHARS_PER_TOKEN
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def is_followup(text):
+    return any(w in _space_re.sub("", text or "") for w in FOLLOWUP_WORDS)
+
+
+def compact_message(message):
+    # 메시지 → 한 줄 텍스트. 구조화 결과는 참조로, 표/HTML 은 걷어낸다
+    data = message.get("data")
+    if data and data.get("courses") is not None:
+        names = ", ".join(f"{c['name']}({c['section']})" for c in data["courses"])
+        text = f"[시간표 {data.get('term') or ''} {float(data.get('credits') or 0):g}학점: {names}]"
+    elif message.get("type") == "html":
+        text = "[시간표(HTML) 생략]"
+    else:
+        text = _table_re.sub("[표 생략]\n", str(message.get("content") or ""))
+    text = _space_re.sub(" ", _tag_re.sub(" ", text)).strip()
+    role = "사용자" if message.get("role") == "user" else "조교"
+    return f"{role}: {clip(text, MAX_MESSAGE_TOKENS)}"
+
+
+class ConversationMemory:
+    def __init__(self):
+        self.summary = ""
+        self.upto = 0             # 요약에 반영된 메시지 수 (current_chat 앞에서부터)
+        self._lock = threading.Lock()
+        self._updating = False
+
+    def window(self, messages, budget):
+        # 뒤에서부터 예산이 허락하는 만큼의 최근 메시지 (압축본)
+        lines, used = [], 0
+        for m in reversed(messages):
+            line = compact_message(m)
+            cost = estimate_tokens(line)
+            if used + cost > budget: break
+            lines.insert(0, line)
+            used += cost
+        return lines
+
+    def context(self, messages, intent):
+        # messages: 이번 질문을 뺀 이전 대화. 반환: 프롬프트에 넣을 블록 (없으면 "")
+        if not messages: return ""
+        budget = BUDGETS.get(intent, BUDGETS["DEFAULT"])
+        with self._lock:
+            summary = clip(self.summary, int(budget * SUMMARY_SHARE)) if self.summary else ""
+            upto = self.upto
+        recent = self.window(messages[upto:], budget - estimate_tokens(summary))
+        # 요약도 최근 창도 못 담은 메시지가 있으면 요약이 따라잡기 전이라는 뜻이므로 건너뛴 표시만 남긴다
+        skipped = len(messages) - upto - len(recent)
+        parts = []
+        if summary: parts.append(f"(이전 대화 요약) {summary}")
+        if skipped > 0: parts.append(f"(… 이전 메시지 {skipped}개 생략)")
+        return "\n".join(parts + recent)
+
+    def pending(self, messages, keep):
+        # 최근 keep 개를 뺀, 아직 요약에 반영되지 않은 메시지
+        with self._lock:
+            return messages[self.upto:max(self.upto, len(messages) - keep)]
+
+    def update(self, messages, summarize=None, keep=SUMMARY_BATCH):
+        # 창 밖으로 밀려난 메시지가 SUMMARY_BATCH 이상 쌓였을 때만 이전 요약 + 새 메시지로 요약을 갱신
+        # summarize(이전 요약, [압축된 메시지...]) → 새 요약. 없거나 실패하면 사용자 질문만 모은 요약으로 대신한다
+        new = self.pending(messages, keep)
+        if len(new) < SUMMARY_BATCH: return False
+        with self._lock:
+            if self._updating: return False
+            self._updating = True
+            previous, start = self.summary, self.upto
+        try:
+            lines = [compact_message(m) for m in new]
+            summary = ""
+            if summarize:
+                try:
+                    summary = summarize(previous, lines) or ""
+                except Exception:
+                    summary = ""
+            if not summary or summary.startswith("⚠️"):
+                asked = [clip(str(m.get("content") or ""), 40) for m in new if m.get("role") == "user"]
+                summary = " / ".join(filter(None, [previous, "사용자가 물은 것: " + ", ".join(asked) if asked else ""]))
+            with self._lock:
+                self.summary = clip(summary, SUMMARY_TOKENS)
+                self.upto = start + len(new)
+            return True
+        finally:
+            with self._lock:
+                self._updating = False
@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import logging
+import random
+import sqlite3
+import threading
+
+# -----------------------------------------------------------------------------
+# [Chat Writer] 대화 저장: 로컬 outbox(SQLite) → 백그라운드 스레드가 Firestore 에 배치 커밋
+# -----------------------------------------------------------------------------
+# 응답 경로에서는 outbox 에 한 줄 쓰고 바로 돌아온다. 스레드가 모아서 커밋하고, 실패하면 지수 백오프로 재시도한다.
+# Firestore 가 내려가 있거나 프로세스가 재시작돼도 outbox 에 남은 쓰기는 다음 기동 때 이어서 보낸다.
+# 배치가 실패하면 한 건씩 보내 문제 있는 쓰기를 골라낸다. 영구 오류(잘못된 값, 권한, 크기 초과)이거나
+# MAX_ATTEMPTS 번 실패한 쓰기는 dead_letter 테이블로 옮기고 로그를 남긴다 (한 건 때문에 outbox 전체가 막히지 않게).
+#   op = {"path": "users/{uid}/chat_sessions/{sid}/messages/000003", "data": {...}, "merge": bool}
+OUTBOX_PATH = os.path.join("data", "chat_outbox.sqlite3")
+FLUSH_INTERVAL = 0.5      # 초, 쓰기가 몰릴 때 이 간격으로 모아서 보낸다
+MAX_BATCH_OPS = 400       # Firestore 배치 한도(500) 아래
+MAX_BATCH_BYTES = 4_000_000
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+MAX_ATTEMPTS = 10         # 일시 오류로 이만큼 실패한 쓰기는 dead_letter 로
+SERVER_TIMESTAMP = "__server_timestamp__"   # JSON 으로 저장할 수 있도록 커밋 직전에 firestore.SERVER_TIMESTAMP 로 바꾼다
+PERMANENT_ERRORS = ("InvalidArgument", "PermissionDenied", "FailedPrecondition", "TypeError", "ValueError")
+PERMANENT_MARKS = ("INVALID_ARGUMENT", "PERMISSION_DENIED", "exceeds the maximum", "too large", "too big")
+
+log = logging.getLogger(__name__)
+
+
+def is_permanent_error(e):
+    # 다시 보내도 성공할 수 없는 오류 (google.api_core 를 import 하지 않고 예외 이름/메시지로 판단)
+    return type(e).__name__ in PERMANENT_ERRORS or any(mark in str(e) for mark in PERMANENT_MARKS)
+
+
+def message_id(seq):
+    # 문서 ID 순서 = 메시지 순서
+    return f"{seq:06d}"
+
+
+def next_seq(messages):
+    # 불러온 메시지 다음 번호 (예전 형식 메시지에는 seq 가 없다)
+    return messages[-1].get("seq", len(messages) - 1) + 1 if messages else 0
+
+
+def session_ops(uid, session_id, messages, start_seq, summary):
+    # 새 메시지 문서들 + 세션 요약 문서(merge). 이전 메시지는 다시 쓰지 않는다
+    base = f"users/{uid}/chat_sessions/{session_id}"
+    ops = []
+    for i, m in enumerate(messages):
+        seq = start_seq + i
+        doc = {"seq": seq, "role": m["role"], "content": m["content"], "type": m.get("type", "text"),
+               "created_at": SERVER_TIMESTAMP}
+        if m.get("data"): doc["data"] = m["data"]
+        ops.append({"path": f"{base}/messages/{message_id(seq)}", "data": doc, "merge": False})
+    ops.append({"path": base, "data": {"summary": summary, "count": start_seq + len(messages),
+                                       "updated_at": SERVER_TIMESTAMP}, "merge": True})
+    return ops
+
+
+class ChatWriter:
+    def __init__(self, db, server_timestamp=None, path=OUTBOX_PATH, sleep=time.sleep):
+        self.db = db
+        self.server_timestamp = server_timestamp
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.written = self.failures = self.dead = 0
+        self.last_error = None
+        if os.path.dirname(path): os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, op TEXT, size INTEGER)")
+        if "attempts" not in [row[1] for row in self._db.execute("PRAGMA table_info(outbox)")]:
+            self._db.execute("ALTER TABLE outbox ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")   # 예전 outbox 파일
+        self._db.execute("""CREATE TABLE IF NOT EXISTS dead_letter (
+            id INTEGER PRIMARY KEY, op TEXT, size INTEGER, attempts INTEGER, error TEXT, failed_at REAL)""")
+        if self.pending(): self._ensure_thread()   # 지난 실행에서 못 보낸 쓰기
+
+    def enqueue(self, ops):
+        # 한 트랜잭션으로 outbox 에 넣고 스레드를 깨운다 (응답 경로의 비용은 로컬 SQLite 쓰기 한 번)
+        rows = [(s, len(s)) for s in (json.dumps(op, ensure_ascii=False) for op in ops)]
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany("INSERT INTO outbox (op, size) VALUES (?, ?)", rows)
+            self._db.execute("COMMIT")
+        self._ensure_thread()
+        self._wake.set()
+
+    def pending(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="chat-writer", daemon=True)
+            self._thread.start()
+
+    def _next_batch(self):
+        with self._lock:
+            rows = self._db.execute("SELECT id, op, size FROM outbox ORDER BY id LIMIT ?", (MAX_BATCH_OPS,)).fetchall()
+        batch, total = [], 0
+        for row_id, op, size in rows:
+            if batch and total + size > MAX_BATCH_BYTES: break
+            batch.append((row_id, json.loads(op)))
+            total += size
+        return batch
+
+    def _resolve(self, value):
+        if value == SERVER_TIMESTAMP: return self.server_timestamp
+        if isinstance(value, dict): return {k: self._resolve(v) for k, v in value.items()}
+        if isinstance(value, list): return [self._resolve(v) for v in value]
+        return value
+
+    def _commit(self, batch):
+        wb = self.db.batch()
+        for _, op in batch:
+            wb.set(self.db.document(op["path"]), self._resolve(op["data"]), merge=op["merge"])
+        wb.commit()
+
+    def _done(self, batch):
+        with self._lock:
+            self._db.executemany("DELETE FROM outbox WHERE id=?", [(row_id,) for row_id, _ in batch])
+        self.written += len(batch)
+
+    def _failed(self, row_id, error):
+        # 시도 횟수를 올리고 영구 오류이거나 한도에 닿으면 dead_letter 로 옮긴다. 반환: 옮겼는지
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.execute("UPDATE outbox SET attempts = attempts + 1 WHERE id=?", (row_id,))
+            op, size, attempts = self._db.execute("SELECT op, size, attempts FROM outbox WHERE id=?", (row_id,)).fetchone()
+            dead = is_permanent_error(error) or attempts >= MAX_ATTEMPTS
+            if dead:
+                self._db.execute("INSERT OR REPLACE INTO dead_letter VALUES (?, ?, ?, ?, ?, ?)",
+                                 (row_id, op, size, attempts, f"{type(error).__name__}: {error}", time.time()))
+                self._db.execute("DELETE FROM outbox WHERE id=?", (row_id,))
+            self._db.execute("COMMIT")
+        if dead:
+            self.dead += 1
+            log.error("대화 저장 실패: %s 쓰기를 %d번 시도 후 dead_letter 로 옮겼습니다 (%s: %s)",
+                      json.loads(op)["path"], attempts, type(error).__name__, error)
+        return dead
+
+    def flush(self):
+        # outbox 가 빌 때까지 보낸다. 배치가 실패하면 앞에서부터 한 건씩 보내 성공한 쓰기는 지우고,
+        # 실패한 쓰기는 시도 횟수를 올린다. 다시 보낼 쓰기(일시 오류)에서 멈추고 예외를 올린다 (남은 쓰기는 outbox 에 유지)
+        while True:
+            batch = self._next_batch()
+            if not batch: return
+            try:
+                self._commit(batch)
+                self._done(batch)
+                continue
+            except Exception:
+                pass
+            for row in batch:
+                try:
+                    self._commit([row])
+                except Exception as e:
+                    if self._failed(row[0], e): continue
+                    raise
+                self._done([row])
+
+    def _run(self):
+        while True:
+            self._wake.wait(timeout=FLUSH_INTERVAL)
+            self._wake.clear()
+            try:
+                self.flush()
+                self.failures, self.last_error = 0, None
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                self.sleep(random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** min(self.failures, 10)))))
+
+    def stats(self):
+        return {"pending": self.pending(), "written": self.written, "failures": self.failures, "dead": self.dead,
+                "last_error": self.last_error}
@@ -0,0 +1,93 @@
+import os
+import re
+import ast
+import sys
+import argparse
+import subprocess
+
+# -----------------------------------------------------------------------------
+# [Startup Check] 첫 화면까지의 import 시간 예산 (콜드 스타트가 헬스체크 시간을 넘지 않도록)
+# -----------------------------------------------------------------------------
+# app.py 의 최상위 import 만 새 프로세스에서 실행해 `python -X importtime` 으로 모듈별 누적 시간을 잰다.
+# 인터프리터가 시작할 때 올리는 모듈(site, encodings 등 `python -c pass` 에서도 로드되는 것)은 빼고 센다.
+# 예산을 넘거나, 처음 쓸 때 import 해야 하는 무거운 모듈이 최상위에서 딸려 오면 실패(exit 1)한다.
+APP_PATH = "app.py"
+IMPORT_BUDGET_MS = 800     # streamlit 포함 (streamlit 단독 약 300ms, 무거운 모듈을 모두 올리면 1.7s)
+RUNS = 3                   # 디스크 캐시 영향을 줄이려고 여러 번 재서 가장 빠른 값을 쓴다
+HEAVY_MODULES = (
+    "pandas", "numpy", "PIL.Image", "pypdf", "requests",
+    "langchain_core", "langchain_community", "langchain_google_genai",
+    "firebase_admin", "google.cloud.firestore",
+)
+
+_line_re = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)$")
+
+
+def top_level_imports(path=APP_PATH):
+    # 모듈 최상위(함수 밖)의 import 문만. 함수 안에서 import 하는 모듈은 첫 사용 때 로드된다
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(a.name for a in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def importtime(code, path=APP_PATH):
+    # 반환: ({들여쓰기 한 칸인 모듈: 누적 ms}, 로드된 전체 모듈 이름 집합)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(path)))
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import 실패")
+    top, loaded = {}, set()
+    for line in proc.stderr.splitlines():
+        m = _line_re.match(line)
+        if not m: continue
+        loaded.add(m.group(4))
+        if len(m.group(3)) == 1:
+            top[m.group(4)] = int(m.group(2)) / 1000
+    return top, loaded
+
+
+def measure(modules, path=APP_PATH):
+    # 반환: ({앱이 올린 최상위 모듈: 누적 ms}, 로드된 전체 모듈 이름 집합)
+    # 들여쓰기 한 칸에는 인터프리터 시작 때의 import(site 등)도 섞여 있으므로 빈 프로세스에서도 로드되는 모듈은 뺀다
+    _, startup = importtime("pass", path)
+    top, loaded = importtime("; ".join(f"import {m}" for m in modules), path)
+    return {name: ms for name, ms in top.items() if name not in startup}, loaded
+
+
+def check(budget_ms=IMPORT_BUDGET_MS, runs=RUNS, path=APP_PATH):
+    modules = top_level_imports(path)
+    best = None
+    for _ in range(max(1, runs)):
+        top, loaded = measure(modules, path)
+        if best is None or sum(top.values()) < sum(best[0].values()):
+            best = (top, loaded)
+    top, loaded = best
+    total = sum(top.values())
+
+    print(f"⏱️ {path} 최상위 import {len(modules)}개: {total:,.0f}ms (예산 {budget_ms:,}ms, {runs}회 중 최소)")
+    for name, ms in sorted(top.items(), key=lambda x: -x[1])[:10]:
+        print(f"   {ms:8,.1f}ms  {name}")
+
+    heavy = [m for m in HEAVY_MODULES if m in loaded]
+    ok = total <= budget_ms and not heavy
+    if heavy:
+        print(f"❌ 첫 사용 때 import 해야 하는 모듈이 시작 시 로드됩니다: {', '.join(heavy)}")
+    if total > budget_ms:
+        print(f"❌ import 시간이 예산을 {total - budget_ms:,.0f}ms 초과했습니다.")
+    if ok:
+        print("✅ 시작 시간 예산 안입니다.")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="app.py 시작 import 시간 예산 검사")
+    parser.add_argument("--budget", type=int, default=IMPORT_BUDGET_MS, help="예산 (ms)")
+    parser.add_argument("--runs", type=int, default=RUNS, help="측정 횟수 (가장 빠른 값 사용)")
+    args = parser.parse_args()
+    sys.exit(0 if check(args.budget, args.runs) else 1)
@@ -0,0 +1,304 @@
+import os
+import re
+import glob
+import json
+import mmap
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+# -----------------------------------------------------------------------------
+# [Corpus] PDF 지식 베이스 아티팩트 (generate.py 가 빌드, app.py 가 로드)
+# -----------------------------------------------------------------------------
+# data/corpus/corpus.txt     : 모든 문서/페이지 텍스트를 이어붙인 UTF-8 blob
+# data/corpus/manifest.json  : 버전, 원본 파일 해시, 문서/페이지별 byte offset, 문서 종류(kind)/학기(term)
+# 문서는 (종류, 학기) 파티션으로 나뉜다. 앱은 학생에게 필요한 파티션만 꺼내 쓰고, 최근에 쓴 몇 개만 메모리에 둔다.
+ARTIFACT_VERSION = 2
+SOURCE_GLOBS = ["data/*.pdf", "*강의시간표*.pdf"]
+CORPUS_DIR = os.path.join("data", "corpus")
+BLOB_NAME = "corpus.txt"
+MANIFEST_NAME = "manifest.json"
+HANDBOOK, TIMETABLE = "handbook", "timetable"   # 수강신청 자료집(요람·규정) / 강의시간표
+MAX_PARTITIONS = 4
+
+_file_term_re = re.compile(r"(20\d{2})\s*-\s*([12])(?!\d)")
+_text_term_re = re.compile(r"(20\d{2})\s*학년도\s*([12])\s*학기")
+
+
+def doc_header(name):
+    return f"\n\n--- [문서: {name}] ---\n"
+
+
+def doc_kind(name):
+    return TIMETABLE if "강의시간표" in name else HANDBOOK
+
+
+def doc_term(name, pages=()):
+    # 파일명의 "2025-1" → 없으면 앞쪽 페이지의 "2025학년도 1학기" → 없으면 "" (모든 학기에 포함)
+    m = _file_term_re.search(name) or next(filter(None, (_text_term_re.search(p) for p in pages[:3])), None)
+    return f"{m.group(1)}-{m.group(2)}" if m else ""
+
+
+def partition_name(kind, term):
+    return f"{kind}-{term or 'all'}"
+
+
+def list_sources(patterns=None):
+    files = []
+    for pattern in patterns or SOURCE_GLOBS:
+        files.extend(glob.glob(pattern))
+    return sorted(set(files))
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def corpus_hash(documents):
+    # 원본 파일 해시만으로 결정 → 캐시/인덱스의 버전 태그로 사용
+    h = hashlib.sha256(f"v{ARTIFACT_VERSION}".encode())
+    for d in sorted(documents, key=lambda d: d["name"]):
+        h.update(f"{d['name']}:{d['sha256']}".encode())
+    return h.hexdigest()[:16]
+
+
+# 프로세스 풀 워커에서 실행되므로 top-level 함수로 둔다
+def extract_pdf(path):
+    from langchain_community.document_loaders import PyPDFLoader
+    st_ = os.stat(path)
+    pages = [p.page_content for p in PyPDFLoader(path).load()]
+    name = os.path.basename(path)
+    return {
+        "source": path, "name": name, "sha256": file_sha256(path),
+        "size": st_.st_size, "mtime": st_.st_mtime, "pages": pages,
+        "kind": doc_kind(name), "term": doc_term(name, pages),
+    }
+
+
+def extract_all(paths, workers=None, on_done=None, on_error=None):
+    # 실패한 파일은 건너뛰고(on_error 로 알림) 나머지는 입력 순서대로 반환
+    if not paths: return []
+    workers = workers or min(len(paths), os.cpu_count() or 1)
+    results = {}
+
+    def collect(path, get):
+        try:
+            results[path] = get()
+            if on_done: on_done(results[path])
+        except Exception as e:
+            if on_error: on_error(path, e)
+
+    if workers <= 1:
+        for p in paths:
+            collect(p, lambda: extract_pdf(p))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {p: pool.submit(extract_pdf, p) for p in paths}
+            for p, fut in futures.items():
+                collect(p, fut.result)
+    return [results[p] for p in paths if p in results]
+
+
+def write_artifact(extracted, out_dir=CORPUS_DIR):
+    # 임시 파일은 프로세스마다 따로 (앱과 generate.py/warm_cache.py 가 동시에 써도 섞이지 않게)
+    os.makedirs(out_dir, exist_ok=True)
+    tmp_blob = os.path.join(out_dir, f"{BLOB_NAME}.{os.getpid()}.tmp")
+    tmp_manifest = os.path.join(out_dir, f"{MANIFEST_NAME}.{os.getpid()}.tmp")
+    try:
+        return _write_artifact(extracted, out_dir, tmp_blob, tmp_manifest)
+    finally:
+        for tmp in (tmp_blob, tmp_manifest):
+            if os.path.exists(tmp): os.remove(tmp)
+
+
+def _write_artifact(extracted, out_dir, tmp_blob, tmp_manifest):
+    documents, offset = [], 0
+    with open(tmp_blob, "wb") as f:
+        for doc in extracted:
+            start = offset
+            header = doc_header(doc["name"]).encode("utf-8")
+            f.write(header)
+            offset += len(header)
+            pages = []
+            for text in doc["pages"]:
+                data = (text + "\n").encode("utf-8")
+                f.write(data)
+                pages.append([offset, len(data)])
+                offset += len(data)
+            documents.append({
+                "source": doc["source"], "name": doc["name"], "sha256": doc["sha256"],
+                "size": doc["size"], "mtime": doc["mtime"], "kind": doc["kind"], "term": doc["term"],
+                "offset": start, "length": offset - start, "pages": pages,
+            })
+    manifest = {
+        "version": ARTIFACT_VERSION, "corpus_hash": corpus_hash(documents),
+        "blob": BLOB_NAME, "blob_size": offset, "documents": documents,
+    }
+    with open(tmp_manifest, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    # blob → manifest 순서로 교체해야 manifest 가 항상 유효한 blob 을 가리킨다
+    os.replace(tmp_blob, os.path.join(out_dir, BLOB_NAME))
+    os.replace(tmp_manifest, os.path.join(out_dir, MANIFEST_NAME))
+    return manifest
+
+
+def read_manifest(out_dir=CORPUS_DIR):
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != ARTIFACT_VERSION: return None
+    blob_path = os.path.join(out_dir, manifest.get("blob", BLOB_NAME))
+    if not os.path.exists(blob_path) or os.path.getsize(blob_path) != manifest.get("blob_size"):
+        return None
+    return manifest
+
+
+def is_fresh(entry, path):
+    # 크기/mtime 이 같으면 해시 계산 생략, 다르면(예: git checkout) 해시로 최종 판단
+    try:
+        st_ = os.stat(path)
+    except OSError:
+        return False
+    if st_.st_size != entry["size"]: return False
+    if abs(st_.st_mtime - entry["mtime"]) < 1e-3: return True
+    return file_sha256(path) == entry["sha256"]
+
+
+class Corpus:
+    def __init__(self, documents, blob=None):
+        # documents: manifest 형식 dict. 아티팩트에 없는 문서는 "texts"(페이지 리스트)를 직접 가진다
+        self.documents = documents
+        self.hash = corpus_hash(documents)
+        self._blob = blob
+        self._text = None
+        self.parsed = []          # 이번 로드에서 PDF 를 다시 파싱한 문서 (아티팩트가 없거나 오래됐을 때)
+
+    def _slice(self, offset, length):
+        return self._blob[offset:offset + length].decode("utf-8")
+
+    def document_text(self, doc):
+        if "texts" in doc:
+            return doc_header(doc["name"]) + "".join(t + "\n" for t in doc["texts"])
+        return self._slice(doc["offset"], doc["length"])
+
+    def page_texts(self, doc):
+        # 문서의 페이지 텍스트 리스트 (아티팩트에는 페이지마다 "\n" 을 붙여 저장했으므로 그것만 뗀다)
+        if "texts" in doc: return list(doc["texts"])
+        return [self._slice(off, length)[:-1] for off, length in doc["pages"]]
+
+    def pages(self):
+        # (문서명, 페이지 번호(1부터), 텍스트)
+        for doc in self.documents:
+            if "texts" in doc:
+                for i, t in enumerate(doc["texts"]):
+                    yield doc["name"], i + 1, t
+            else:
+                for i, (off, length) in enumerate(doc["pages"]):
+                    yield doc["name"], i + 1, self._slice(off, length).rstrip("\n")
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = "".join(self.document_text(d) for d in self.documents)
+        return self._text
+
+    def __len__(self):
+        return len(self.text)
+
+    def terms(self, kind):
+        return sorted({d["term"] for d in self.documents if d["kind"] == kind and d["term"]})
+
+    def partitions(self):
+        return sorted({(d["kind"], d["term"]) for d in self.documents})
+
+    def subset(self, kind, term):
+        # 같은 blob 을 공유하는 부분 코퍼스 (학기 표시가 없는 문서는 모든 학기에 포함)
+        return Corpus([d for d in self.documents if d["kind"] == kind and d["term"] in (term, "")], self._blob)
+
+
+class PartitionStore:
+    # (종류, 학기) → load(부분 코퍼스, 종류, 학기) 결과. 최근에 쓴 max_items 개만 메모리에 두고 나머지는 버린다 (LRU)
+    # 전체 코퍼스는 mmap 이라 손대지 않은 학기의 텍스트는 메모리에 올라오지 않는다
+    def __init__(self, corpus, load=None, max_items=MAX_PARTITIONS):
+        self.corpus = corpus
+        self.load = load or (lambda corpus, kind, term: corpus)
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def get(self, kind, term):
+        key = (kind, term or "")
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        value = self.load(self.corpus.subset(*key), *key)
+        with self._lock:
+            self.loads += 1
+            self._items[key] = value
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {"loaded": [partition_name(*k) for k in self._items], "loads": self.loads}
+
+
+def open_blob(out_dir, manifest):
+    path = os.path.join(out_dir, manifest["blob"])
+    if manifest["blob_size"] == 0: return b""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def refresh_artifact(corpus, out_dir=CORPUS_DIR):
+    # 다시 파싱한 결과까지 아티팩트로 다시 써서 다음 시작부터는 mmap 으로 바로 연다. 쓸 수 없으면(읽기 전용 볼륨 등) None
+    extracted = [dict(d, pages=corpus.page_texts(d)) for d in corpus.documents]
+    try:
+        manifest = write_artifact(extracted, out_dir)
+    except OSError:
+        return None
+    return Corpus(manifest["documents"], open_blob(out_dir, manifest))
+
+
+def load_corpus(patterns=None, out_dir=CORPUS_DIR):
+    # 아티팩트를 mmap 으로 열고, 변경/추가된 PDF 만 다시 파싱한다 (삭제된 PDF 는 제외)
+    # 다시 파싱했거나 PDF 가 삭제됐으면 아티팩트를 갱신한다 (컨테이너 콜드 스타트마다 다시 파싱하지 않게)
+    sources = list_sources(patterns)
+    manifest = read_manifest(out_dir)
+    cached = {d["source"]: d for d in manifest["documents"]} if manifest else {}
+    blob = open_blob(out_dir, manifest) if manifest else None
+
+    documents, stale = [], []
+    for path in sources:
+        entry = cached.get(path)
+        if entry and is_fresh(entry, path):
+            documents.append(entry)
+        else:
+            stale.append(path)
+            documents.append(None)
+
+    if stale:
+        parsed = {d["source"]: d for d in extract_all(stale)}
+        for i, path in enumerate(sources):
+            if documents[i] is None and path in parsed:
+                doc = parsed[path]
+                documents[i] = {k: doc[k] for k in ("source", "name", "sha256", "size", "mtime", "kind", "term")}
+                documents[i]["texts"] = doc["pages"]
+
+    documents = [d for d in documents if d is not None]
+    corpus = Corpus(documents, blob)
+    if stale or {d["source"] for d in documents} != set(cached):
+        corpus = refresh_artifact(corpus, out_dir) or corpus
+    corpus.parsed = stale
+    return corpus
@@ -1,42 +1,67 @@
 import os
-import glob
-from langchain_community.document_loaders import PyPDFLoader
+import time
+import argparse
+from corpus import CORPUS_DIR, HANDBOOK, list_sources, extract_all, write_artifact, load_corpus, partition_name
+from retrieval import build_index
+from catalog import list_timetable_sources, build_catalog
+from graduation import RULES_PATH, load_rules, is_stale
 
-def generate_cache():
+def generate_cache(workers=None):
     print("🔄 PDF 문서를 텍스트로 변환(학습) 중입니다...")
-    
+
     # 데이터 폴더 확인
     if not os.path.exists("data"):
         print("❌ 'data' 폴더가 없습니다. PDF 파일을 data 폴더에 넣어주세요.")
         return
 
-    pdf_files = glob.glob("data/*.pdf")
+    pdf_files = list_sources()
     if not pdf_files:
         print("❌ 'data' 폴더에 PDF 파일이 없습니다.")
         return
 
-    all_content = ""
-    # 모든 PDF 읽기
-    for pdf_file in pdf_files:
-        try:
-            print(f"   - 읽는 중: {pdf_file}")
-            loader = PyPDFLoader(pdf_file)
-            pages = loader.load_and_split()
-            filename = os.path.basename(pdf_file)
-            all_content += f"\n\n--- [문서: {filename}] ---\n"
-            for page in pages:
-                all_content += page.page_content
-        except Exception as e:
-            print(f"⚠️ 에러 발생 ({pdf_file}): {e}")
-            continue
-
-    # 결과 저장
-    cache_path = "data/cached_knowledge.txt"
-    with open(cache_path, "w", encoding="utf-8") as f:
-        f.write(all_content)
-    
-    print(f"\n✅ 학습 완료! '{cache_path}' 파일이 생성되었습니다.")
-    print("🚀 이제 이 파일(cached_knowledge.txt)을 GitHub에 함께 올리면, 웹사이트가 즉시 로딩됩니다.")
+    # 모든 PDF(자료집 + 강의시간표)를 프로세스 풀에서 병렬로 읽기
+    started = time.time()
+    timetable_files = list_timetable_sources()
+    all_files = pdf_files + [f for f in timetable_files if f not in pdf_files]
+    for pdf_file in all_files:
+        print(f"   - 읽는 중: {pdf_file}")
+    extracted = extract_all(
+        all_files, workers=workers,
+        on_done=lambda d: print(f"   ✔ 완료: {d['source']} ({len(d['pages'])}쪽)"),
+        on_error=lambda path, e: print(f"⚠️ 에러 발생 ({path}): {e}"),
+    )
+
+    # 결과 저장 (blob + manifest, 문서마다 종류/학기 파티션 표시)
+    timetables = [d for d in extracted if d["source"] in timetable_files]
+    manifest = write_artifact(extracted, CORPUS_DIR)
+
+    # 검색용 BM25 역색인: 자료집 학기 파티션마다 하나 (부분 코퍼스 해시로 버전 관리)
+    corpus = load_corpus()
+    indexes = {partition_name(kind, term): build_index(corpus.subset(kind, term), CORPUS_DIR, partition_name(kind, term))
+               for kind, term in corpus.partitions() if kind == HANDBOOK}
+
+    # 강의시간표 → 강좌 테이블
+    catalog = build_catalog(timetables, CORPUS_DIR)
+
+    print(f"\n✅ 학습 완료! '{CORPUS_DIR}' 아티팩트가 생성되었습니다. ({time.time() - started:.1f}s)")
+    print(f"   - 문서 {len(manifest['documents'])}개, {manifest['blob_size']:,} bytes, corpus_hash={manifest['corpus_hash']}")
+    print(f"   - 파티션: {', '.join(partition_name(k, t) for k, t in corpus.partitions())}")
+    for name, index in indexes.items():
+        print(f"   - 검색 인덱스 {name}: 청크 {len(index.chunks)}개, 토큰 {len(index.postings):,}종")
+    print(f"   - 강좌 테이블: {len(catalog):,}개 분반, 학기 {', '.join(catalog.terms()) or '없음'}")
+
+    # 졸업요건은 자료집에서 옮겨 적은 데이터이므로, 자료집이 바뀌었으면 다시 대조하도록 알린다
+    rules = load_rules()
+    if rules is None:
+        print(f"⚠️ 졸업요건 규칙({RULES_PATH})을 읽을 수 없습니다. 졸업 진단은 요람 전체 방식으로 동작합니다.")
+    elif is_stale(rules):
+        print(f"⚠️ 자료집이 바뀌었습니다. {RULES_PATH} 의 졸업요건을 새 자료집과 대조해 갱신하세요.")
+    else:
+        print(f"   - 졸업요건: 학과 {len(rules.majors())}개, 규칙 {len(rules.data['programs'])}개")
+    print("🚀 이제 이 폴더(data/corpus)를 GitHub에 함께 올리면, 웹사이트가 즉시 로딩됩니다.")
 
 if __name__ == "__main__":
-    generate_cache()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="PDF 지식 베이스 아티팩트 빌드")
+    parser.add_argument("--workers", type=int, default=None, help="병렬 추출 프로세스 수 (기본: CPU 수)")
+    args = parser.parse_args()
+    generate_cache(args.workers)
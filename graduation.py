@@ -0,0 +1,169 @@
+import os
+import re
+import json
+import hashlib
+import datetime
+from corpus import file_sha256
+
+# -----------------------------------------------------------------------------
+# [Graduation] 학과·입학년도별 졸업요건 모델 + 로컬 판정기
+# -----------------------------------------------------------------------------
+# 요건은 수강신청 자료집(졸업이수학점 표, 공학프로그램 졸업요건, 교양 및 MSC 교과과정표)에서 한 번 옮겨 적은
+# data/graduation_rules.json 에 있다. 판정은 이수 과목 리스트만으로 결정적으로 하고, LLM 은 조언만 쓴다.
+#   program = {"majors", "years": [시작, 끝], "total", "areas": [{"name", "min", "categories" | "courses"}],
+#              "required": [[과목, 대체과목...], ...], "note"}
+#   course  = {"code", "name", "credits", "category"(전필/전선/교필/교선/기필/기선...), "grade"(A+, P, F ...), "term"}
+RULES_PATH = os.path.join("data", "graduation_rules.json")
+RULES_VERSION = 1
+FAILED_GRADES = {"F", "NP", "U"}
+
+# 성적표에 풀어서 적힌 이수구분 → 약칭
+CATEGORY_ALIASES = {
+    "전공필수": "전필", "전공선택": "전선", "교양필수": "교필", "교양선택": "교선",
+    "기초교양필수": "기필", "기초교양선택": "기선", "필수교양": "교필", "균형교양": "교선",
+}
+
+_name_re = re.compile(r"\s+|\(.*?\)")
+_json_re = re.compile(r"\[.*\]", re.S)
+
+
+def normalize_name(name, renamed=None):
+    # 공백과 "(구. 컴퓨팅사고)" 같은 괄호 주석을 지우고, 이름이 바뀐 과목은 현재 이름으로
+    name = _name_re.sub("", str(name or ""))
+    return (renamed or {}).get(name, name)
+
+
+def normalize_category(category):
+    category = _name_re.sub("", str(category or ""))
+    return CATEGORY_ALIASES.get(category, category)
+
+
+def admission_year(profile, today=None):
+    # 프로필에 입학년도가 없으면 학년으로 추정 (학년도는 3월에 바뀜)
+    year = profile.get("admission_year")
+    if year: return int(year)
+    m = re.search(r"\d", str(profile.get("grade")))
+    if not m: return None
+    today = today or datetime.date.today()
+    school_year = today.year if today.month >= 3 else today.year - 1
+    return school_year - int(m.group(0)) + 1
+
+
+class GraduationRules:
+    def __init__(self, data):
+        self.data = data
+        self.renamed = data.get("renamed", {})
+        self.by_major = {}
+        for p in data.get("programs", []):
+            for major in p["majors"]:
+                self.by_major.setdefault(major, []).append(p)
+
+    @property
+    def source(self):
+        return self.data.get("source", {})
+
+    def majors(self):
+        return sorted(self.by_major)
+
+    def program(self, major, year):
+        if year is None: return None
+        return next((p for p in self.by_major.get(major, []) if p["years"][0] <= year <= p["years"][1]), None)
+
+
+def load_rules(path=RULES_PATH):
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return GraduationRules(data) if data.get("version") == RULES_VERSION else None
+
+
+def is_stale(rules):
+    # 규칙을 옮겨 적은 자료집과 현재 data 폴더의 자료집이 다르면 True (파일이 없으면 판단 불가 → False)
+    src = rules.source
+    if not src.get("path") or not os.path.exists(src["path"]): return False
+    return file_sha256(src["path"]) != src.get("sha256")
+
+
+def transcript_key(image_hashes):
+    # 성적표 이미지 내용 해시들로 만든 키 (이미지가 바뀔 때만 다시 추출)
+    return hashlib.sha256("".join(image_hashes).encode()).hexdigest()
+
+
+def parse_transcript(text):
+    # LLM 이 성적표에서 뽑은 JSON 배열 → course 리스트 (코드블록/앞뒤 설명 허용)
+    m = _json_re.search(str(text or ""))
+    if not m: return []
+    try:
+        rows = json.loads(m.group(0))
+    except ValueError:
+        return []
+    courses = []
+    for r in rows if isinstance(rows, list) else []:
+        if not isinstance(r, dict) or not r.get("name"): continue
+        try:
+            credits = float(r.get("credits") or 0)
+        except (TypeError, ValueError):
+            continue
+        courses.append({"code": str(r.get("code") or ""), "name": str(r["name"]), "credits": credits,
+                        "category": str(r.get("category") or ""), "grade": str(r.get("grade") or ""),
+                        "term": str(r.get("term") or "")})
+    return courses
+
+
+def passed_courses(courses, renamed=None):
+    # 낙제 과목 제외, 재수강은 과목명 기준으로 한 번만 인정
+    passed = {}
+    for c in courses:
+        if str(c.get("grade") or "").strip().upper() in FAILED_GRADES: continue
+        name = normalize_name(c["name"], renamed)
+        if name in passed and passed[name]["credits"] >= float(c.get("credits") or 0): continue
+        passed[name] = {"name": name, "credits": float(c.get("credits") or 0),
+                        "category": normalize_category(c.get("category"))}
+    return list(passed.values())
+
+
+def evaluate(program, courses, renamed=None):
+    courses = passed_courses(courses, renamed)
+    names = {c["name"] for c in courses}
+    total = sum(c["credits"] for c in courses)
+
+    areas = []
+    for area in program["areas"]:
+        if "courses" in area:
+            listed = {normalize_name(n, renamed) for n in area["courses"]}
+            earned = sum(c["credits"] for c in courses if c["name"] in listed)
+        else:
+            earned = sum(c["credits"] for c in courses if c["category"] in area["categories"])
+        areas.append({"name": area["name"], "min": area["min"], "earned": earned, "met": earned >= area["min"]})
+
+    # 대체 과목 중 하나라도 이수하면 충족
+    missing = [" 또는 ".join(alts) for alts in program["required"]
+               if not any(normalize_name(a, renamed) in names for a in alts)]
+    return {
+        "majors": program["majors"], "years": program["years"], "note": program.get("note", ""),
+        "total": {"min": program["total"], "earned": total, "met": total >= program["total"]},
+        "areas": areas, "missing": missing,
+        "met": total >= program["total"] and all(a["met"] for a in areas) and not missing,
+    }
+
+
+def format_report(result):
+    start, end = result["years"]
+    years = f"{start}학번 이후" if end >= 2099 else (f"{start}학번" if start == end else f"{start}~{end}학번")
+    lines = [
+        f"### {'✅ 졸업요건 충족' if result['met'] else '⚠️ 졸업요건 미충족'} ({', '.join(result['majors'])} {years})",
+        "", "| 구분 | 이수 | 기준 | 판정 |", "|---|---:|---:|:---:|",
+        f"| 총 이수학점 | {result['total']['earned']:g} | {result['total']['min']:g} | {'✅' if result['total']['met'] else '❌'} |",
+    ]
+    for a in result["areas"]:
+        lines.append(f"| {a['name']} | {a['earned']:g} | {a['min']:g} | {'✅' if a['met'] else '❌'} |")
+    lines.append("")
+    if result["missing"]:
+        lines.append("**미이수 필수 과목:** " + ", ".join(result["missing"]))
+    else:
+        lines.append("**필수 과목:** 모두 이수")
+    if result["note"]:
+        lines.append(f"\n<small>※ {result['note']}</small>")
+    return "\n".join(lines)
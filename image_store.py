@@ -0,0 +1,86 @@
+import io
+import base64
+import hashlib
+
+# -----------------------------------------------------------------------------
+# [Image Store] 성적표 이미지 수집: 축소 → 재압축 → 중복 제거 → 청크 분할
+# -----------------------------------------------------------------------------
+# 프로필 문서에는 가벼운 참조(card ref)만 두고, 이미지 본문은 청크 문서에 따로 저장해 필요할 때만 읽는다.
+#   card = {"hash", "phash", "width", "height", "size", "chunks", "b64"}   (ref 는 "b64" 를 뺀 나머지)
+MAX_SIDE = 2000          # 긴 변 기준 (휴대폰 캡처도 글자가 읽히는 해상도)
+JPEG_QUALITY = 80
+CHUNK_SIZE = 900_000     # base64 문자 수, Firestore 문서 1 MiB 제한 아래로
+HASH_SIZE = 32           # 1024비트 dHash (글자 위주 문서는 8×8 로는 서로 다른 페이지도 같게 나온다)
+DUP_DISTANCE = 6         # 해밍 거리 이하 + 가로세로 비율이 같으면 같은 이미지로 본다
+
+REF_KEYS = ("hash", "phash", "width", "height", "size", "chunks")
+
+
+def dhash(img, size=HASH_SIZE):
+    # 인접 픽셀 밝기 비교 지각 해시 (재압축/리사이즈에도 거의 그대로)
+    from PIL import Image
+    small = img.convert("L").resize((size + 1, size), Image.LANCZOS)
+    px = list(small.getdata())
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            bits = (bits << 1) | (px[row * (size + 1) + col] > px[row * (size + 1) + col + 1])
+    return f"{bits:0{size * size // 4}x}"
+
+
+def hamming(a, b):
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+def is_duplicate(a, b):
+    if a["hash"] == b["hash"]: return True
+    if abs(a["width"] / a["height"] - b["width"] / b["height"]) > 0.02: return False
+    return hamming(a["phash"], b["phash"]) <= DUP_DISTANCE
+
+
+def prepare(data):
+    # 원본 바이트 → 회전 보정, 흑백, 축소, JPEG 재압축 (Pillow 는 업로드할 때만 필요하므로 여기서 import)
+    from PIL import Image, ImageOps
+    img = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+    img = img.convert("L")
+    img.thumbnail((MAX_SIDE, MAX_SIDE), Image.LANCZOS)
+    out = io.BytesIO()
+    img.save(out, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    raw = out.getvalue()
+    b64 = base64.b64encode(raw).decode("ascii")
+    return {
+        "hash": hashlib.sha256(raw).hexdigest()[:24], "phash": dhash(img),
+        "width": img.width, "height": img.height, "size": len(raw),
+        "chunks": max(1, -(-len(b64) // CHUNK_SIZE)), "b64": b64,
+    }
+
+
+def ingest(files, existing=()):
+    # files: 업로드 원본 바이트 리스트. existing 과 겹치거나 서로 겹치는 이미지는 버린다
+    cards, seen = [], list(existing)
+    for data in files:
+        try:
+            card = prepare(data)
+        except Exception:
+            continue   # 이미지가 아닌 파일
+        if any(is_duplicate(card, c) for c in seen): continue
+        seen.append(card)
+        cards.append(card)
+    return cards
+
+
+def ref(card):
+    return {k: card[k] for k in REF_KEYS}
+
+
+def split_chunks(b64, size=CHUNK_SIZE):
+    return [b64[i:i + size] for i in range(0, len(b64), size)] or [""]
+
+
+def chunk_ids(ref):
+    return [f"{ref['hash']}_{i}" for i in range(ref["chunks"])]
+
+
+def from_legacy(images_b64):
+    # 예전 프로필 문서에 통째로 들어 있던 base64 이미지 → card (다음 저장 때 청크 문서로 옮겨진다)
+    return ingest([base64.b64decode(b) for b in images_b64])
@@ -0,0 +1,168 @@
+import os
+import re
+import sys
+import json
+import math
+import time
+import argparse
+from collections import Counter
+
+# -----------------------------------------------------------------------------
+# [Intent Router] 가중치 키워드 매처 + 문자 n-gram 분류기로 의도별 확신도를 매긴다
+# -----------------------------------------------------------------------------
+# 키워드는 하나의 정규식으로 컴파일해 한 번만 훑고, 키워드마다 의도별 가중치(음수 가능)를 더한다.
+# 분류기는 질문 예시(data/intent_examples.jsonl + 있으면 data/intent_log.jsonl)로 학습한 나이브 베이즈.
+# 확신도 = 키워드 점수(0~1) 와 분류기 확률의 noisy-OR (한 문장에 여러 의도가 있어도 키워드만으로 각각 높게 나올 수 있게).
+# 의도별 문턱을 넘은 것만 실행한다.
+# 비싼 도구(성적표 이미지 분석, 시간표)는 문턱이 높고, 아무것도 넘지 못하면 CHAT.
+#   python intent_router.py            # 예시 leave-one-out 정확도와 라우팅 시간
+#   python intent_router.py "질문..."   # 질문 하나의 의도별 확신도
+EXAMPLES_PATH = os.path.join("data", "intent_examples.jsonl")
+LOG_PATH = os.path.join("data", "intent_log.jsonl")   # 검토해서 라벨을 붙인 실제 질문 (있으면 같이 학습)
+INTENTS = ("QA", "GRADUATION", "TIMETABLE", "CHAT")
+ORDER = ("QA", "GRADUATION", "TIMETABLE")   # 여러 의도일 때 실행/표시 순서
+THRESHOLDS = {"QA": 0.45, "GRADUATION": 0.6, "TIMETABLE": 0.5}
+MODEL_WEIGHT = 0.5            # 분류기 확률만으로 올라갈 수 있는 최대 확신도 (키워드 없이는 비싼 도구 문턱을 못 넘음)
+KEYWORD_SCALE = 1.5           # 키워드 점수 → 0~1 (1 - e^(-점수/scale))
+NGRAMS = (1, 2, 3)
+
+# 키워드: {의도: 가중치}. 띄어쓰기를 지운 문장에서 찾는다
+KEYWORDS = {
+    # 시간표
+    "시간표": {"TIMETABLE": 2.0},
+    "짜줘": {"TIMETABLE": 1.0}, "짜주": {"TIMETABLE": 1.0}, "짜봐": {"TIMETABLE": 1.0},
+    "만들어": {"TIMETABLE": 0.6},
+    "공강": {"TIMETABLE": 1.5},
+    "분반": {"TIMETABLE": 1.2},
+    "빼줘": {"TIMETABLE": 1.5}, "빼고": {"TIMETABLE": 1.2}, "넣어": {"TIMETABLE": 1.5}, "추가해": {"TIMETABLE": 1.5},
+    "비워": {"TIMETABLE": 1.5}, "옮겨": {"TIMETABLE": 1.2},
+    "바꿔줘": {"TIMETABLE": 0.6}, "수정": {"TIMETABLE": 0.6},
+    "학점으로": {"TIMETABLE": 0.8},
+    # 졸업 진단 (성적표 이미지 분석)
+    "졸업": {"GRADUATION": 1.2},
+    "진단": {"GRADUATION": 1.5},
+    "성적표": {"GRADUATION": 2.0}, "성적": {"GRADUATION": 0.8},
+    "이수": {"GRADUATION": 0.8}, "요건": {"GRADUATION": 0.6},
+    "남은학점": {"GRADUATION": 1.5}, "남은": {"GRADUATION": 0.6}, "남았": {"GRADUATION": 1.2}, "확인": {"GRADUATION": 0.4},
+    "졸업할수있": {"GRADUATION": 2.0}, "졸업가능": {"GRADUATION": 2.0},
+    "봐줘": {"GRADUATION": 0.5},
+    "학점": {"GRADUATION": 0.3},
+    # 규정/안내 질문 (설명을 청하는 말은 졸업 진단 쪽을 깎는다: "졸업 학점 기준 알려줘" 는 QA)
+    "규정": {"QA": 1.5, "GRADUATION": -0.8},
+    "기준": {"QA": 1.2, "GRADUATION": -0.8},
+    "알려줘": {"QA": 1.0, "GRADUATION": -0.6},
+    "설명": {"QA": 1.0, "GRADUATION": -0.4},
+    "뭐야": {"QA": 1.0}, "뭔가요": {"QA": 1.0}, "안내": {"QA": 1.0}, "제도": {"QA": 1.2},
+    "있어?": {"QA": 0.6}, "있나요": {"QA": 0.6}, "들을수있": {"QA": 0.8},
+    "방법": {"QA": 1.2}, "기간": {"QA": 1.2}, "언제": {"QA": 1.0}, "어떻게": {"QA": 1.0},
+    "장학": {"QA": 1.5}, "재수강": {"QA": 1.5}, "철회": {"QA": 1.5}, "정정": {"QA": 1.2},
+    "휴학": {"QA": 1.5}, "복학": {"QA": 1.5}, "계절학기": {"QA": 1.2}, "학사경고": {"QA": 1.5},
+    "신청": {"QA": 0.5},
+    "가능해": {"QA": 0.5}, "되나요": {"QA": 0.5},
+    "?": {"QA": 0.1},
+    # 챗봇 자신에 대한 질문
+    "너는": {"QA": -1.0}, "네이름": {"QA": -1.0}, "할수있어": {"QA": -1.0},
+}
+
+_space_re = re.compile(r"\s+")
+
+
+def norm(text):
+    return _space_re.sub("", str(text or "")).lower()
+
+
+def ngrams(text):
+    return [text[i:i + n] for n in NGRAMS for i in range(len(text) - n + 1)]
+
+
+def load_examples(*paths):
+    # [(문장, 의도)], 없는 파일은 건너뛴다
+    examples = []
+    for path in paths or (EXAMPLES_PATH, LOG_PATH):
+        if not os.path.exists(path): continue
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip(): continue
+                row = json.loads(line)
+                if row.get("intent") in INTENTS: examples.append((row["text"], row["intent"]))
+    return examples
+
+
+class NgramClassifier:
+    # 문자 n-gram 다항 나이브 베이즈 (라플라스 스무딩)
+    def __init__(self, examples):
+        self.counts = {i: Counter() for i in INTENTS}
+        docs = Counter()
+        for text, intent in examples:
+            self.counts[intent].update(ngrams(norm(text)))
+            docs[intent] += 1
+        vocab = set().union(*self.counts.values())
+        self.size = max(len(vocab), 1)
+        total = sum(docs.values()) or 1
+        self.prior = {i: math.log((docs[i] + 1) / (total + len(INTENTS))) for i in INTENTS}
+        self.totals = {i: sum(c.values()) + self.size for i, c in self.counts.items()}
+
+    def predict(self, text):
+        # {의도: 확률}
+        grams = ngrams(norm(text))
+        logp = {i: self.prior[i] + sum(math.log((self.counts[i][g] + 1) / self.totals[i]) for g in grams) for i in INTENTS}
+        top = max(logp.values())
+        exp = {i: math.exp(v - top) for i, v in logp.items()}
+        z = sum(exp.values())
+        return {i: v / z for i, v in exp.items()}
+
+
+class IntentRouter:
+    def __init__(self, examples=None, keywords=KEYWORDS):
+        self.keywords = keywords
+        # 긴 키워드 우선 (예: "성적표" 가 "성적" 보다 먼저)
+        self.pattern = re.compile("|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True)))
+        self.model = NgramClassifier(load_examples() if examples is None else examples)
+
+    def keyword_scores(self, text):
+        scores = dict.fromkeys(INTENTS, 0.0)
+        for m in self.pattern.finditer(text):
+            for intent, w in self.keywords[m.group(0)].items(): scores[intent] += w
+        return scores
+
+    def scores(self, text):
+        # {의도: 확신도 0~1}
+        text = norm(text)
+        kw = self.keyword_scores(text)
+        prob = self.model.predict(text)
+        return {i: 1 - math.exp(-max(kw[i], 0) / KEYWORD_SCALE) * (1 - MODEL_WEIGHT * prob[i]) for i in INTENTS}
+
+    def route(self, text):
+        # 반환: (실행할 의도 리스트, {의도: 확신도})
+        scores = self.scores(text)
+        intents = [i for i in ORDER if scores[i] >= THRESHOLDS[i]]
+        return intents or ["CHAT"], scores
+
+
+def evaluate(examples):
+    # leave-one-out: 예시 하나씩 빼고 학습한 라우터가 첫 의도를 맞히는지
+    wrong = []
+    for n, (text, intent) in enumerate(examples):
+        intents, _ = IntentRouter(examples[:n] + examples[n + 1:]).route(text)
+        if intent not in intents: wrong.append((text, intent, intents))
+    return wrong
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="의도 라우터 확인")
+    parser.add_argument("text", nargs="?", help="확인할 질문 (없으면 예시 전체 평가)")
+    args = parser.parse_args()
+    examples = load_examples()
+    router = IntentRouter(examples)
+    if args.text:
+        intents, scores = router.route(args.text)
+        print(f"👉 {intents}  " + ", ".join(f"{i} {s:.2f}" for i, s in sorted(scores.items(), key=lambda x: -x[1])))
+        sys.exit(0)
+
+    wrong = evaluate(examples)
+    print(f"📊 예시 {len(examples)}개 leave-one-out: {len(examples) - len(wrong)}개 정답 ({1 - len(wrong) / max(len(examples), 1):.1%})")
+    for text, intent, intents in wrong:
+        print(f"   ✗ '{text}' 정답 {intent} → {intents}")
+    started = time.perf_counter()
+    for text, _ in examples: router.route(text)
+    print(f"⏱️ 라우팅 평균 {(time.perf_counter() - started) / max(len(examples), 1) * 1e6:,.0f}µs")
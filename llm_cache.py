@@ -0,0 +1,146 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+# -----------------------------------------------------------------------------
+# [LLM Cache] SQLite 응답 캐시 (LRU + TTL) + 동일 요청 single-flight 병합
+# -----------------------------------------------------------------------------
+# 같은 프로필/같은 질문이 여러 세션에서 동시에 들어오면 LLM 호출은 한 번만 하고 나머지는 그 결과를 기다린다.
+CACHE_PATH = os.path.join("data", "llm_cache.sqlite3")
+MAX_ENTRIES = 5000
+TTL_SECONDS = 7 * 24 * 3600
+
+_space_re = re.compile(r"\s+")
+_trailing_re = re.compile(r"[\s?!.~…]+$")
+
+
+def normalize_prompt(text):
+    # 공백/대소문자/끝의 물음표·마침표 차이는 같은 질문으로 본다
+    return _trailing_re.sub("", _space_re.sub(" ", str(text or "")).strip().lower())
+
+
+def is_cacheable(value):
+    # 사용량 초과 등 오류 안내 문구는 캐시하지 않는다
+    return isinstance(value, str) and bool(value.strip()) and not value.startswith("⚠️")
+
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResponseCache:
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.hits = self.misses = self.coalesced = 0
+        if os.path.dirname(path): os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY, intent TEXT, value TEXT,
+            created_at REAL, last_access REAL, tags TEXT)""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses(last_access)")
+
+    @staticmethod
+    def make_key(intent, prompt, profile_fields=None, model="", corpus_hash=""):
+        payload = json.dumps({
+            "intent": intent, "prompt": normalize_prompt(prompt), "profile": profile_fields or {},
+            "model": model, "corpus": corpus_hash,
+        }, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            return self._lookup(key)
+
+    def _lookup(self, key):
+        # _lock 을 쥔 채로 부른다
+        now = time.time()
+        row = self._db.execute("SELECT value, created_at FROM responses WHERE key=?", (key,)).fetchone()
+        if row is None: return None
+        if self.ttl and now - row[1] > self.ttl:
+            self._db.execute("DELETE FROM responses WHERE key=?", (key,))
+            return None
+        self._db.execute("UPDATE responses SET last_access=? WHERE key=?", (now, key))
+        return row[0]
+
+    def put(self, key, value, intent="", tags=None):
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                             (key, intent, value, now, now, json.dumps(tags or {}, ensure_ascii=False)))
+            self._evict(now)
+
+    def _evict(self, now):
+        if self.ttl:
+            self._db.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+        count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_entries:
+            self._db.execute("DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                             (count - self.max_entries,))
+
+    def purge_stale(self, corpus_version):
+        # 다른 데이터 버전으로 만든 응답 삭제 (키에 버전이 들어가 적중하지는 않지만 자리를 차지한다)
+        with self._lock:
+            cur = self._db.execute("DELETE FROM responses WHERE json_extract(tags, '$.corpus') IS NOT ?",
+                                   (corpus_version,))
+            return cur.rowcount
+
+    def get_or_compute(self, key, compute, intent="", tags=None):
+        return "".join(self.stream_through(key, lambda: [compute()], intent, tags))
+
+    def stream_through(self, key, stream, intent="", tags=None):
+        # 캐시 적중 → 전체 응답을 한 번에 yield
+        # 미스(리더) → stream() 의 조각을 그대로 흘려보내며 모아서 끝나면 저장
+        # 같은 키로 진행 중인 호출이 있으면(팔로워) 리더가 끝날 때까지 기다렸다가 완성본을 yield
+        # 조회와 리더 등록을 한 락 안에서 한다. 따로 하면 그 사이에 이전 리더가 저장하고 떠난 뒤 새 리더가 되어 LLM 을 또 부른다
+        with self._lock:
+            cached = self._lookup(key)
+            flight = self._inflight.get(key) if cached is None else None
+            leader = cached is None and flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+        if cached is not None:
+            self.hits += 1
+            yield cached
+            return
+        if not leader:
+            self.coalesced += 1
+            flight.event.wait()
+            if flight.error is not None: raise flight.error
+            yield flight.value
+            return
+
+        self.misses += 1
+        parts = []
+        try:
+            for chunk in stream():
+                parts.append(chunk)
+                yield chunk
+            flight.value = "".join(parts)
+            if is_cacheable(flight.value):
+                self.put(key, flight.value, intent, tags)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            if flight.value is None and flight.error is None:
+                flight.error = RuntimeError("응답 생성이 중단되었습니다.")
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def stats(self):
+        with self._lock:
+            size = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"entries": size, "hits": self.hits, "misses": self.misses, "coalesced": self.coalesced}
@@ -0,0 +1,112 @@
+import json
+import types
+import hashlib
+from corpus import HANDBOOK, partition_name
+from retrieval import load_index, format_hits
+from scheduler import resolve_term
+from llm_cache import ResponseCache
+
+# -----------------------------------------------------------------------------
+# [Prompts] app.py 와 warm_cache.py 가 같이 쓰는 프롬프트·캐시 키·프로필 선택지
+# -----------------------------------------------------------------------------
+# 예열한 캐시가 앱에서 적중하려면 프롬프트, 키에 들어가는 프로필 필드, 모델, 데이터 버전이 완전히 같아야 한다.
+DEFAULT_MODEL = "gemini-2.5-flash-preview-09-2025"
+SCHEDULER_MODEL = "scheduler"   # LLM 없이 로컬에서 만든 결과(시간표 후보)의 캐시 키용 모델 이름
+
+# 모델 등급: 짧게 답하는 의도(잡담, 후보 번호 고르기, 대화 요약)는 LIGHT,
+# 규정 질문(QA)은 가벼운 모델이되 긴 규정 설명이 잘리지 않게 FULL 과 같은 출력 상한/타임아웃(ANSWER),
+# 성적표 읽기/졸업 진단/시간표 직접 생성처럼 답의 품질이 중요한 곳은 FULL. 등급마다 출력 토큰 상한과 타임아웃(초)이 다르다.
+# max_retries 는 클라이언트 자체 재시도 (호출 쪽에도 run_with_retry / Rate Limiter 백오프가 있으므로 작게)
+LIGHT_MODEL = "gemini-2.5-flash-lite-preview-09-2025"
+MODEL_TIERS = {
+    "LIGHT": {"model": LIGHT_MODEL, "max_output_tokens": 1024, "timeout": 30, "max_retries": 1},
+    "ANSWER": {"model": LIGHT_MODEL, "max_output_tokens": 8192, "timeout": 120, "max_retries": 2},
+    "FULL": {"model": DEFAULT_MODEL, "max_output_tokens": 8192, "timeout": 120, "max_retries": 2},
+}
+# 의도(캐시 intent 이름) → 등급. 없는 의도는 FULL
+INTENT_TIERS = {
+    "CHAT": "LIGHT", "TIMETABLE_PICK": "LIGHT", "MEMORY_SUMMARY": "LIGHT", "QA": "ANSWER",
+    "TIMETABLE": "FULL", "TRANSCRIPT": "FULL", "GRADUATION": "FULL", "GRADUATION_ADVICE": "FULL",
+}
+QA_TOP_K = 6
+
+UNSET = "선택해주세요"
+DEPARTMENTS = ["전자융합공학과", "전자공학과", "컴퓨터정보공학부", "소프트웨어학부", "정보융합학부", "경영학부"]
+GRADES = ["1학년", "2학년", "3학년", "4학년"]
+SEMESTERS = ["1학기", "2학기"]
+DEFAULT_CREDIT = 19
+
+# 의도별로 응답을 바꾸는 프로필 필드 (캐시 키에 들어감)
+CACHE_FIELDS = {
+    "QA": ("major", "grade", "semester"),
+    "TIMETABLE_OPTIONS": ("major", "grade", "semester", "credit", "blocked_days"),
+}
+
+
+def default_profile(major, grade, semester):
+    return {"major": major, "grade": grade, "semester": semester, "credit": DEFAULT_CREDIT,
+            "requirements": "", "blocked_days": [], "admission_year": None}
+
+
+def llm_tier(intent, tiers=None, routes=None):
+    # 의도의 등급 설정 {"model", "max_output_tokens", "timeout", "max_retries"}
+    # tiers/routes: 설정으로 덮어쓸 값 (예: {"LIGHT": {"model": ...}}, {"QA": "FULL"})
+    name = dict(INTENT_TIERS, **(routes or {})).get(intent, "FULL")
+    return dict(MODEL_TIERS.get(name, MODEL_TIERS["FULL"]), **(tiers or {}).get(name, {}))
+
+
+def table_setting(value):
+    # secrets.toml 의 표([LLM_INTENT_TIERS] ...) 또는 환경변수의 JSON 문자열 → dict
+    if not value: return {}
+    if isinstance(value, str): return json.loads(value)
+    return {k: table_setting(v) if hasattr(v, "items") else v for k, v in value.items()}
+
+
+def profile_fields(profile, *keys):
+    return {k: profile.get(k) for k in keys}
+
+
+def cache_key(intent, text, profile, version, model=None):
+    model = model or llm_tier(intent)["model"]
+    return ResponseCache.make_key(intent, text, profile_fields(profile, *CACHE_FIELDS[intent]), model, version)
+
+
+def data_version(corpus, catalog):
+    # 응답 캐시 키에 들어가는 데이터 버전 (자료집/강의시간표 PDF 가 바뀌면 기존 캐시는 자동으로 무효)
+    return hashlib.sha256(json.dumps(
+        [corpus.hash if corpus else "", sorted(catalog.sources.items())]
+    ).encode()).hexdigest()[:16]
+
+
+def content_text(chunk):
+    # LangChain 응답/스트림 조각 → 텍스트 (Gemini 는 content 가 파트 리스트로 오기도 함)
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, list):
+        return "".join(p.get("text", "") if isinstance(p, dict) else str(p) for p in content)
+    return content or ""
+
+
+def load_partition(corpus, kind, term):
+    # corpus.PartitionStore 의 loader: 부분 코퍼스 텍스트 + (자료집이면) BM25 인덱스
+    index = load_index(corpus, partition=partition_name(kind, term)) if kind == HANDBOOK and corpus.documents else None
+    return types.SimpleNamespace(corpus=corpus, text=corpus.text, index=index)
+
+
+def profile_partition(store, kind, profile):
+    # 학생의 학기(미선택 시 날짜)에 맞는 파티션
+    if store is None: return None
+    term = resolve_term(store.corpus.terms(kind), profile.get("semester")) or ""
+    return store.get(kind, term)
+
+
+def qa_prompt(query, profile, part, history="", search=None):
+    # history: chat_memory 가 만든 이전 대화 블록 (후속 질문일 때만), search: 검색에 쓸 문장 (기본은 질문)
+    hits = part.index.search(search or query, k=QA_TOP_K) if part and part.index else []
+    context = f"\n        [이전 대화]\n{history}" if history else ""
+    return f"""
+        [학생 정보] {profile['major']} {profile['grade']}
+        [문서 발췌] {format_hits(hits) if hits else "(관련 문서를 찾지 못함)"}{context}
+        [질문] {query}
+        문서 발췌 내용을 바탕으로 답변해. 근거 문장은 " "로 인용하고 (문서명, 쪽)을 함께 적어.
+        발췌에 없는 내용은 추측하지 말고 자료집에서 찾을 수 없다고 답해.
+        """
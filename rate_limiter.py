@@ -0,0 +1,156 @@
+import time
+import random
+import threading
+from collections import deque, OrderedDict
+
+# -----------------------------------------------------------------------------
+# [Rate Limiter] 프로세스 공용 토큰 버킷 + 사용자별 공정 대기열 + 429 지수 백오프
+# -----------------------------------------------------------------------------
+# 한가할 때는 대기 없이 바로 통과하고, 몰릴 때만 대기열에서 차례를 기다린다.
+# 대기열은 사용자별 FIFO 를 라운드로빈으로 돌기 때문에 한 사용자가 여러 요청을 쌓아도 다른 사용자가 밀리지 않는다.
+REQUESTS_PER_MINUTE = 10   # Gemini 분당 요청 한도에 맞춘다
+BURST = 5                  # 유휴 상태에서 한 번에 통과할 수 있는 요청 수
+MAX_RETRIES = 4
+BACKOFF_BASE = 2.0         # 초
+BACKOFF_CAP = 30.0
+
+
+def is_rate_limit_error(e):
+    return "429" in str(e) or "RESOURCE_EXHAUSTED" in str(e)
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+class _Ticket:
+    def __init__(self, user):
+        self.user = user
+        self.granted = threading.Event()
+
+
+class RateLimiter:
+    def __init__(self, rate_per_minute=REQUESTS_PER_MINUTE, burst=BURST):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._queues = OrderedDict()   # user → deque[_Ticket] (라운드로빈 순서)
+        self._dispatcher = None
+        self.retries = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _waiting(self):
+        return sum(len(q) for q in self._queues.values())
+
+    def position(self, ticket):
+        # 라운드로빈 기준 대략적인 순번 (1부터)
+        with self._cond:
+            pos = 0
+            depth = next((i for q in self._queues.values() for i, t in enumerate(q) if t is ticket), 0)
+            for q in self._queues.values():
+                pos += min(len(q), depth + 1)
+            return max(pos, 1)
+
+    def acquire(self, user="anonymous", on_wait=None, timeout=None):
+        # 토큰이 있고 대기열이 비어 있으면 즉시 통과. 아니면 대기열에 넣고 on_wait(순번)으로 진행 상황 알림
+        with self._cond:
+            self._refill()
+            if not self._queues and self.tokens >= 1:
+                self.tokens -= 1
+                return
+            ticket = _Ticket(user)
+            self._queues.setdefault(user, deque()).append(ticket)
+            self._ensure_dispatcher()
+            self._cond.notify_all()
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        last = None
+        while not ticket.granted.wait(0.5):
+            if on_wait:
+                pos = self.position(ticket)
+                if pos != last:
+                    on_wait(pos)
+                    last = pos
+            if deadline and time.monotonic() > deadline:
+                with self._cond:
+                    q = self._queues.get(user)
+                    if q and ticket in q:
+                        q.remove(ticket)
+                        if not q: del self._queues[user]
+                if not ticket.granted.is_set():
+                    raise RateLimitExceeded("대기 시간 초과")
+
+    def _ensure_dispatcher(self):
+        if self._dispatcher is None or not self._dispatcher.is_alive():
+            self._dispatcher = threading.Thread(target=self._dispatch, name="rate-limiter", daemon=True)
+            self._dispatcher.start()
+
+    def _dispatch(self):
+        # 토큰이 생길 때마다 다음 사용자 대기열의 맨 앞 요청을 깨운다
+        with self._cond:
+            while True:
+                while not self._queues:
+                    # 대기가 끝난 뒤 락을 다시 잡기 전에 acquire() 가 줄을 섰을 수 있으므로 대기열을 다시 보고 끝낸다.
+                    # 락을 쥔 채 None 으로 두어야 다음 acquire() 가 (아직 살아 있는) 이 스레드를 믿지 않고 새로 띄운다
+                    if not self._cond.wait(timeout=60) and not self._queues:
+                        self._dispatcher = None
+                        return
+                self._refill()
+                if self.tokens < 1:
+                    self._cond.wait(timeout=(1 - self.tokens) / self.rate)
+                    continue
+                user, q = next(iter(self._queues.items()))
+                ticket = q.popleft()
+                del self._queues[user]
+                if q: self._queues[user] = q   # 남은 요청은 맨 뒤로 (라운드로빈)
+                self.tokens -= 1
+                ticket.granted.set()
+
+    def penalize(self):
+        # 429 를 받으면 버킷을 비워 다른 요청도 잠시 쉬게 한다
+        with self._cond:
+            self._refill()
+            self.tokens = min(self.tokens, 0.0)
+
+    def _backoff(self, attempt, on_retry, sleep):
+        self.penalize()
+        self.retries += 1
+        if on_retry: on_retry(attempt + 1)
+        sleep(random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt))))
+
+    def call(self, func, user="anonymous", on_wait=None, retries=MAX_RETRIES, sleep=time.sleep, on_retry=None):
+        # acquire → 호출. 429 면 지수 백오프 + full jitter 후 다시 줄을 선다 (on_retry(재시도 횟수)로 알림)
+        for attempt in range(retries + 1):
+            self.acquire(user, on_wait)
+            try:
+                return func()
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == retries:
+                    raise
+                self._backoff(attempt, on_retry, sleep)
+
+    def stream(self, make_stream, user="anonymous", on_wait=None, retries=MAX_RETRIES, sleep=time.sleep, on_retry=None):
+        # call() 의 스트리밍 버전. 첫 조각을 받기 전의 429 만 재시도한다 (이미 보낸 조각은 되돌릴 수 없음)
+        for attempt in range(retries + 1):
+            self.acquire(user, on_wait)
+            started = False
+            try:
+                for chunk in make_stream():
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                if started or not is_rate_limit_error(e) or attempt == retries:
+                    raise
+                self._backoff(attempt, on_retry, sleep)
+
+    def stats(self):
+        with self._cond:
+            self._refill()
+            return {"tokens": round(self.tokens, 2), "waiting": self._waiting(), "retries": self.retries}
@@ -0,0 +1,129 @@
+import os
+import re
+import json
+import math
+from collections import Counter, defaultdict
+from corpus import CORPUS_DIR
+
+# -----------------------------------------------------------------------------
+# [Retrieval] 문자 n-gram BM25 역색인 (generate.py 가 빌드, tool_qa 가 검색)
+# -----------------------------------------------------------------------------
+# 한국어는 띄어쓰기/조사 변화가 많아 형태소 분석 대신 어절 내부 문자 bigram 을 토큰으로 쓴다.
+INDEX_VERSION = 1
+INDEX_NAME = "index.json"
+CHUNK_CHARS = 700      # 청크 최대 길이 (문자)
+CHUNK_OVERLAP = 120    # 청크 간 겹치는 길이 (앞 청크의 마지막 줄들)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_word_re = re.compile(r"[0-9A-Za-z가-힣]+")
+# 질문에만 등장하는 요청 표현 (검색어에서 제외)
+QUERY_STOPWORDS = {"알려줘", "알려주세요", "뭐야", "뭐예요", "무엇인가요", "어떻게", "해줘", "설명해줘",
+                   "궁금해", "궁금합니다", "있어", "있나요", "돼", "되나요", "좀", "은", "는", "이", "가"}
+
+
+def tokenize(text, stopwords=()):
+    tokens = []
+    for word in _word_re.findall(text.lower()):
+        if word in stopwords: continue
+        if len(word) == 1:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+def chunk_page(text):
+    # 줄 단위로 CHUNK_CHARS 까지 모으고, 다음 청크는 마지막 CHUNK_OVERLAP 문자 분량의 줄로 시작
+    chunks, cur, size = [], [], 0
+    for line in text.splitlines():
+        line = line.strip()
+        if not line: continue
+        if cur and size + len(line) > CHUNK_CHARS:
+            chunks.append("\n".join(cur))
+            keep, kept = [], 0
+            for prev in reversed(cur):
+                if kept + len(prev) > CHUNK_OVERLAP: break
+                keep.insert(0, prev)
+                kept += len(prev)
+            cur, size = keep, kept
+        cur.append(line)
+        size += len(line)
+    if cur: chunks.append("\n".join(cur))
+    return chunks
+
+
+class BM25Index:
+    def __init__(self, chunks, postings, corpus_hash):
+        # chunks: [{"doc", "page", "text", "len"}], postings: {term: [[chunk_id, tf], ...]}
+        self.chunks = chunks
+        self.postings = postings
+        self.corpus_hash = corpus_hash
+        n = len(chunks)
+        self.avg_len = (sum(c["len"] for c in chunks) / n) if n else 0.0
+        self.idf = {t: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for t, p in postings.items()}
+
+    @classmethod
+    def build(cls, corpus):
+        chunks, postings = [], defaultdict(list)
+        for doc, page, text in corpus.pages():
+            for chunk in chunk_page(text):
+                tf = Counter(tokenize(chunk))
+                cid = len(chunks)
+                chunks.append({"doc": doc, "page": page, "text": chunk, "len": sum(tf.values())})
+                for term, count in tf.items():
+                    postings[term].append([cid, count])
+        return cls(chunks, dict(postings), corpus.hash)
+
+    def save(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "corpus_hash": self.corpus_hash,
+                       "chunks": self.chunks, "postings": self.postings},
+                      f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != INDEX_VERSION: return None
+        return cls(data["chunks"], data["postings"], data["corpus_hash"])
+
+    def search(self, query, k=5):
+        scores = defaultdict(float)
+        for term, qtf in Counter(tokenize(query, QUERY_STOPWORDS)).items():
+            idf = self.idf.get(term)
+            if idf is None: continue
+            for cid, tf in self.postings[term]:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.chunks[cid]["len"] / self.avg_len)
+                scores[cid] += qtf * idf * tf * (BM25_K1 + 1) / (tf + norm)
+        top = sorted(scores.items(), key=lambda x: -x[1])[:k]
+        return [dict(self.chunks[cid], score=round(score, 3)) for cid, score in top]
+
+
+def index_path(out_dir=CORPUS_DIR, partition=None):
+    # 파티션별 인덱스는 index-{종류}-{학기}.json
+    return os.path.join(out_dir, f"index-{partition}.json" if partition else INDEX_NAME)
+
+
+def build_index(corpus, out_dir=CORPUS_DIR, partition=None):
+    index = BM25Index.build(corpus)
+    os.makedirs(out_dir, exist_ok=True)
+    index.save(index_path(out_dir, partition))
+    return index
+
+
+def load_index(corpus, out_dir=CORPUS_DIR, partition=None):
+    # 디스크 인덱스가 현재 코퍼스와 다르면(PDF 변경) 메모리에서 다시 만든다
+    index = BM25Index.load(index_path(out_dir, partition))
+    if index is None or index.corpus_hash != corpus.hash:
+        index = BM25Index.build(corpus)
+    return index
+
+
+def format_hits(hits):
+    return "\n\n".join(f"[{i + 1}] (문서: {h['doc']}, {h['page']}쪽)\n{h['text']}" for i, h in enumerate(hits))
@@ -0,0 +1,216 @@
+import re
+import heapq
+import datetime
+from catalog import DAYS
+
+# -----------------------------------------------------------------------------
+# [Scheduler] 강좌 테이블 기반 결정적 시간표 생성 (비트마스크 + 분기한정 탐색)
+# -----------------------------------------------------------------------------
+# 각 분반의 강의시간을 (요일 × 교시) 격자 위의 비트마스크로 표현해 충돌 검사를 AND 한 번으로 끝낸다.
+PERIODS = 13            # 0교시 ~ 12교시
+MAX_NODES = 200_000     # 탐색 노드 상한 (최악의 경우에도 1초 이내)
+TOP_N = 3
+
+# 사이드바 학과 → (시간표 분반 제한에 쓰이는 약칭들, 소속 단과대학)
+MAJOR_ALIASES = {
+    "전자융합공학과": (("전융", "전정대"), "전자정보공과대학"),
+    "전자공학과": (("전자", "전정대"), "전자정보공과대학"),
+    "컴퓨터정보공학부": (("컴정", "인융대"), "인공지능융합대학"),
+    "소프트웨어학부": (("소프트", "인융대"), "인공지능융합대학"),
+    "정보융합학부": (("정융", "인융대"), "인공지능융합대학"),
+    "경영학부": (("경영",), "경영대학"),
+}
+
+# 과목 종류별 학점당 가중치 (점수 함수)
+WEIGHTS = {"major_required": 3.0, "major": 2.0, "common": 1.5, "general_required": 1.5}
+CREDIT_GAP_PENALTY = 2.0   # 목표 학점과의 차이 1학점당
+DAY_PENALTY = 0.5          # 등교 일수 1일당
+GAP_PENALTY = 0.2          # 하루 안의 공강 1교시당
+
+_split_re = re.compile(r"[,\s()]+")
+_grade_only_re = re.compile(r"(\d)학년(?:만수강가능| 전용|전용)")
+_excluded_marks = ("외국인만", "외국인전용", "참빛인재대학", "영어트랙전용")
+
+
+def slot_bit(day, period):
+    return 1 << (DAYS.index(day) * PERIODS + period)
+
+
+def slots_mask(slots):
+    mask = 0
+    for day, period in slots:
+        mask |= slot_bit(day, period)
+    return mask
+
+
+def day_mask(day):
+    return ((1 << PERIODS) - 1) << (DAYS.index(day) * PERIODS)
+
+
+def parse_slot_text(text):
+    # catalog 의 "화5 화6 금3" → [("화", 5), ("화", 6), ("금", 3)]
+    return [(t[0], int(t[1:])) for t in (text or "").split() if t[0] in DAYS and t[1:].isdigit()]
+
+
+def parse_grade(grade):
+    m = re.search(r"\d", str(grade))
+    return int(m.group(0)) if m else None
+
+
+def resolve_term(terms, semester, today=None):
+    # "1학기"/"2학기" → 카탈로그에 있는 해당 학기 중 가장 최근 학년도 (예: "2025-1")
+    # 학기 미선택 시 날짜로 판단 (상반기 수강신청은 1학기, 하반기는 2학기)
+    if not terms: return None
+    sem = parse_grade(semester)
+    if sem is None:
+        today = today or datetime.date.today()
+        sem = 1 if today.month <= 6 else 2
+    matching = sorted(t for t in terms if t.endswith(f"-{sem}"))
+    return matching[-1] if matching else sorted(terms)[-1]
+
+
+def restricted_to(restriction, aliases):
+    return any(a in set(_split_re.split(restriction or "")) for a in aliases)
+
+
+def restriction_allows(restriction, lecture_type, aliases, grade):
+    text = f"{restriction} {lecture_type}"
+    if any(mark in text for mark in _excluded_marks): return False
+    restriction = (restriction or "").strip()
+    if not restriction or restriction == "외국인학생수강불가": return True
+    m = _grade_only_re.search(restriction)
+    if m: return int(m.group(1)) == grade
+    return restricted_to(restriction, aliases)
+
+
+def candidate_groups(catalog, major, grade, term, blocked_days=()):
+    # 학정번호별로 분반 후보를 묶는다: [{"code", "name", "kind", "credits", "weight", "sections": [...]}]
+    aliases, college = MAJOR_ALIASES.get(major, ((), None))
+    blocked = 0
+    for d in blocked_days or ():
+        if d in DAYS: blocked |= day_mask(d)
+
+    df = catalog.filter(grade=grade, term=term)
+    groups = {}
+    for row in df.itertuples(index=False):
+        dept = row.department
+        if dept == major:
+            kind = "major_required" if row.category == "전필" else "major"
+        elif college and dept == f"{college} 공통":
+            kind = "common"
+        elif dept == "교양" and row.category == "교필":
+            kind = "general_required"
+        elif dept == "교양" and restricted_to(row.restriction, aliases):
+            kind = "common"   # 예: 공학수학1 "전융 2학년" 분반
+        else:
+            continue
+        if dept != major and not restriction_allows(row.restriction, row.lecture_type, aliases, grade):
+            continue
+        slots = parse_slot_text(row.slots)
+        mask = slots_mask(slots)
+        if mask & blocked: continue
+
+        g = groups.setdefault(row.code, {
+            "code": row.code, "name": row.name, "kind": kind, "credits": float(row.credits),
+            "weight": WEIGHTS[kind] * float(row.credits), "sections": {},
+        })
+        if WEIGHTS[kind] * float(row.credits) > g["weight"]:
+            g["kind"], g["weight"] = kind, WEIGHTS[kind] * float(row.credits)
+        # 같은 분반이 여러 페이지(교양/단과대 공통 등)에 실리면 정보가 더 많은 행을 쓴다
+        prev = g["sections"].get(row.section)
+        if prev is None or (not prev["professor"] and row.professor):
+            g["sections"][row.section] = {
+                "code": row.code, "name": row.name, "section": row.section, "credits": float(row.credits),
+                "professor": row.professor, "category": row.category, "slots": slots, "mask": mask,
+                "online": bool(row.online), "lecture_type": row.lecture_type,
+            }
+    for g in groups.values():
+        g["sections"] = list(g["sections"].values())
+    # 가중치가 큰 과목부터 탐색해야 한정(bound)이 빨리 좁혀진다
+    return sorted(groups.values(), key=lambda g: (-g["weight"], len(g["sections"]), g["code"]))
+
+
+def layout_penalty(mask):
+    penalty = 0.0
+    for d in range(len(DAYS)):
+        day = (mask >> (d * PERIODS)) & ((1 << PERIODS) - 1)
+        if not day: continue
+        penalty += DAY_PENALTY
+        bits = bin(day)[2:].strip("0")
+        penalty += GAP_PENALTY * bits.count("0")
+    return penalty
+
+
+def score(weight, credits, mask, target):
+    return weight - CREDIT_GAP_PENALTY * abs(target - credits) - layout_penalty(mask)
+
+
+def solve(groups, target_credits, top_n=TOP_N, max_nodes=MAX_NODES):
+    # 과목마다 "분반 하나 선택 또는 건너뛰기"를 DFS 로 탐색하며 상위 top_n 조합을 유지한다.
+    # 남은 과목의 가중치를 모두 더해도 현재 top_n 최저점을 못 넘기면 가지치기.
+    suffix = [0.0] * (len(groups) + 1)
+    for i in range(len(groups) - 1, -1, -1):
+        suffix[i] = suffix[i + 1] + groups[i]["weight"]
+
+    best, seen, nodes = [], set(), 0
+    chosen = []
+
+    def record(weight, credits, mask):
+        s = score(weight, credits, mask, target_credits)
+        key = tuple(sorted((c["code"], c["section"]) for c in chosen))
+        if key in seen: return
+        if len(best) < top_n:
+            heapq.heappush(best, (s, key, list(chosen), credits))
+        elif s > best[0][0]:
+            heapq.heapreplace(best, (s, key, list(chosen), credits))
+        else:
+            return
+        seen.add(key)
+
+    def dfs(i, weight, credits, mask):
+        nonlocal nodes
+        nodes += 1
+        if nodes > max_nodes: return
+        if i == len(groups):
+            record(weight, credits, mask)
+            return
+        if len(best) == top_n and weight + suffix[i] <= best[0][0]:
+            return
+        g = groups[i]
+        if credits + g["credits"] <= target_credits:
+            for sec in g["sections"]:
+                if sec["mask"] & mask: continue
+                chosen.append(sec)
+                dfs(i + 1, weight + g["weight"], credits + g["credits"], mask | sec["mask"])
+                chosen.pop()
+        dfs(i + 1, weight, credits, mask)
+
+    dfs(0, 0.0, 0.0, 0)
+    results = []
+    for s, _, courses, credits in sorted(best, key=lambda b: -b[0]):
+        if not courses: continue
+        results.append({"score": round(s, 2), "credits": credits, "courses": courses})
+    return results
+
+
+def build_timetables(catalog, profile, top_n=TOP_N, today=None):
+    # profile(major/grade/semester/credit/blocked_days) → 점수순 시간표 후보 리스트
+    if catalog is None: return []
+    grade = parse_grade(profile.get("grade"))
+    term = resolve_term(catalog.terms(), profile.get("semester"), today)
+    if grade is None or term is None: return []
+    groups = candidate_groups(catalog, profile.get("major"), grade, term, profile.get("blocked_days"))
+    results = solve(groups, float(profile.get("credit") or 0), top_n)
+    for r in results:
+        r["term"] = term
+        r["courses"] = [{k: v for k, v in c.items() if k != "mask"} for c in r["courses"]]
+    return results
+
+
+def describe(timetable):
+    # LLM 설명용 압축 텍스트
+    lines = [f"[{timetable['term']}] 총 {timetable['credits']:g}학점 (점수 {timetable['score']})"]
+    for c in timetable["courses"]:
+        when = " ".join(f"{d}{p}" for d, p in c["slots"]) or ("온라인" if c["online"] else "시간미지정")
+        lines.append(f"- {c['name']}({c['code']}-{c['section']}) {c['category']} {c['credits']:g}학점 {c['professor']} {when}")
+    return "\n".join(lines)
@@ -0,0 +1,98 @@
+import time
+import sqlite3
+
+import chat_writer
+from chat_writer import ChatWriter, session_ops
+
+
+class InvalidArgument(Exception):
+    pass
+
+
+class ServiceUnavailable(Exception):
+    pass
+
+
+class FakeBatch:
+    def __init__(self, client):
+        self.client = client
+        self.ops = []
+
+    def set(self, ref, data, merge=False):
+        self.ops.append((ref, data))
+
+    def commit(self):
+        self.client.commits += 1
+        if any(self.client.reject in ref for ref, _ in self.ops): raise self.client.error
+        self.client.docs.update(self.ops)
+
+
+class FakeFirestore:
+    # reject 가 경로에 들어간 쓰기가 배치에 있으면 배치 전체를 거절한다
+    def __init__(self, reject, error):
+        self.reject, self.error = reject, error
+        self.docs, self.commits = {}, 0
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def document(self, path):
+        return path
+
+
+def drain(writer, timeout=10):
+    deadline = time.time() + timeout
+    while writer.pending() and time.time() < deadline:
+        time.sleep(0.01)
+    return writer.pending()
+
+
+def dead_letters(path):
+    with sqlite3.connect(path) as db:
+        return db.execute("SELECT op, attempts, error FROM dead_letter").fetchall()
+
+
+def ops():
+    messages = [{"role": "user", "content": f"질문 {i}"} for i in range(3)]
+    return session_ops("u1", "s1", messages, 0, "요약")
+
+
+def test_permanent_error_goes_to_dead_letter(tmp_path):
+    path = str(tmp_path / "outbox.sqlite3")
+    db = FakeFirestore("messages/000001", InvalidArgument("400 Document exceeds the maximum size"))
+    writer = ChatWriter(db, path=path, sleep=lambda s: None)
+    writer.enqueue(ops())
+    assert drain(writer) == 0
+    assert sorted(db.docs) == ["users/u1/chat_sessions/s1", "users/u1/chat_sessions/s1/messages/000000",
+                               "users/u1/chat_sessions/s1/messages/000002"]
+    (op, attempts, error), = dead_letters(path)
+    assert "messages/000001" in op and attempts == 1 and error.startswith("InvalidArgument")
+    assert writer.stats()["dead"] == 1
+
+    # 막힌 쓰기가 빠졌으므로 다음 대화는 바로 저장된다
+    writer.enqueue(session_ops("u1", "s1", [{"role": "assistant", "content": "답"}], 3, "요약"))
+    assert drain(writer) == 0
+    assert "users/u1/chat_sessions/s1/messages/000003" in db.docs
+
+
+def test_transient_error_gives_up_after_max_attempts(tmp_path, monkeypatch):
+    monkeypatch.setattr(chat_writer, "MAX_ATTEMPTS", 3)
+    path = str(tmp_path / "outbox.sqlite3")
+    db = FakeFirestore("messages/000001", ServiceUnavailable("503 unavailable"))
+    writer = ChatWriter(db, path=path, sleep=lambda s: None)
+    writer.enqueue(ops())
+    assert drain(writer) == 0
+    assert len(db.docs) == 3
+    (op, attempts, error), = dead_letters(path)
+    assert "messages/000001" in op and attempts == 3 and error.startswith("ServiceUnavailable")
+
+
+def test_pending_rows_from_old_outbox_are_migrated(tmp_path):
+    path = str(tmp_path / "outbox.sqlite3")
+    with sqlite3.connect(path) as old:
+        old.execute("CREATE TABLE outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, op TEXT, size INTEGER)")
+        old.execute("INSERT INTO outbox (op, size) VALUES (?, ?)", ('{"path": "users/u1", "data": {}, "merge": true}', 40))
+    db = FakeFirestore("nothing", ServiceUnavailable())
+    writer = ChatWriter(db, path=path, sleep=lambda s: None)
+    assert drain(writer) == 0
+    assert "users/u1" in db.docs
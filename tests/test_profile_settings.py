@@ -0,0 +1,51 @@
+import os
+import uuid
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import bench
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+DB = bench.install_fakes()   # Firestore 클라이언트는 cache_resource 라 모듈에서 한 번만 바꾼다
+
+
+@pytest.fixture
+def app(tmp_path):
+    # 가짜 Gemini/Firestore 로 앱을 띄우고 가입해 둔다 (bench.py 와 같은 방식)
+    at = AppTest.from_file(APP, default_timeout=300)
+    at.secrets["GOOGLE_API_KEY"] = "bench"
+    at.secrets["firebase_service_account"] = {"type": "bench"}
+    at.secrets["LLM_CACHE_PATH"] = str(tmp_path / "llm_cache.sqlite3")
+    at.secrets["CHAT_OUTBOX_PATH"] = str(tmp_path / "chat_outbox.sqlite3")
+    at.run()
+    next(w for w in at.text_input if w.label == "이메일").set_value(f"t-{uuid.uuid4().hex[:8]}@example.com")
+    next(w for w in at.text_input if w.label == "비밀번호").set_value("bench")
+    next(b for b in at.button if b.label == "가입").click().run()
+    return at
+
+
+def save(at):
+    next(b for b in at.button if b.label == "설정 저장").click().run()
+    return at.session_state.user_profile
+
+
+def stored_profile(at):
+    return DB.store[f"users/{at.session_state.user['localId']}/profile/info"]
+
+
+def test_admission_year_left_blank_is_not_saved(app):
+    at = app
+    at.selectbox(key="agent_grade").set_value("3학년").run()
+    profile = save(at)
+    assert profile["grade"] == "3학년"
+    assert profile["admission_year"] is None
+    assert stored_profile(at)["admission_year"] is None
+
+
+def test_admission_year_entered_is_saved(app):
+    at = app
+    at.selectbox(key="agent_grade").set_value("3학년").run()
+    at.number_input(key="agent_year").set_value(2021).run()
+    assert save(at)["admission_year"] == 2021
+    assert stored_profile(at)["admission_year"] == 2021
@@ -0,0 +1,49 @@
+from timetable_edit import parse_edits, apply_edits, pick
+
+PROFILE = {"major": "소프트웨어학부", "grade": "2학년", "blocked_days": []}
+
+
+def section(code, name, sec, slots):
+    return {
+        "code": code, "name": name, "section": sec, "credits": 3.0, "professor": "", "category": "전공",
+        "online": False, "slots": slots, "department": "소프트웨어학부", "departments": ["소프트웨어학부"],
+        "grade": 2, "restriction": "", "lecture_type": "",
+    }
+
+
+SECTIONS = {
+    "A1": [section("A1", "자료구조", "01", ["금1"]), section("A1", "자료구조", "02", ["월1"])],
+    "B1": [section("B1", "선형대수", "01", ["금2"]), section("B1", "선형대수", "02", ["화3"])],
+    "C1": [section("C1", "운영체제", "01", ["수4"])],
+}
+
+
+def edit(text, courses):
+    timetable = {"term": "2025-1", "courses": courses}
+    ops = parse_edits(text, timetable, SECTIONS, PROFILE["major"], PROFILE["grade"])
+    return apply_edits(timetable, ops, SECTIONS, PROFILE)
+
+
+def days(timetable):
+    return {slot[0] for c in timetable["courses"] for slot in c["slots"]}
+
+
+def test_free_day_already_free():
+    courses = [pick(SECTIONS["C1"][0])]
+    new, notes = edit("금요일 공강으로 해줘", courses)
+    assert notes == ["ℹ️ 금요일은 이미 공강입니다."]
+    assert new["courses"] == courses
+
+
+def test_free_day_blocks_earlier_add():
+    # 추가가 공강 요청보다 먼저 나와도 금요일 분반을 넣지 않는다 (넣었다가 옮기지 않고 처음부터 02분반)
+    new, notes = edit("선형대수 넣고 금요일 공강으로 해줘", [pick(SECTIONS["A1"][0])])
+    assert "금" not in days(new)
+    assert "➕ 선형대수 02분반 추가 (화3)" in notes
+    assert not any(n.startswith("🔁 선형대수") for n in notes)
+
+
+def test_free_day_blocks_later_add():
+    new, notes = edit("금요일 공강으로 하고 선형대수 넣어줘", [pick(SECTIONS["A1"][0])])
+    assert "금" not in days(new)
+    assert {c["code"]: c["section"] for c in new["courses"]} == {"A1": "02", "B1": "02"}
@@ -0,0 +1,265 @@
+import re
+from catalog import DAYS
+from scheduler import MAJOR_ALIASES, slots_mask, day_mask, parse_slot_text, parse_grade, layout_penalty, restriction_allows
+from timetable_render import parse_slot
+
+# -----------------------------------------------------------------------------
+# [Timetable Edit] 마지막 시간표에 수정 요청을 로컬 델타 연산으로 적용 (재생성/LLM 없음)
+# -----------------------------------------------------------------------------
+# 요청 문장 → 연산 리스트 → 바뀌는 과목의 분반만 나머지 과목의 점유 비트마스크와 대조한다. 나머지 과목은 그대로 둔다.
+#   op = {"op": "drop" | "swap" | "add" | "replace" | "free_day", "code", "name", "section", "day", "new"}
+#   timetable 은 timetable_render.compact 형식 (slots = ["화5", ...])
+# 새 분반은 scheduler.candidate_groups 처럼 학생 학과(+단과대 공통, 교양)·학년 분반에서만 고른다.
+# 그 밖의 분반만 들어갈 수 있으면 넣지 않고 안내만 한다 (분반 번호를 직접 말하면 그 분반을 넣음).
+DROP_WORDS = ("빼", "삭제", "제외", "없애", "지워", "취소")
+ADD_WORDS = ("넣어", "추가", "넣고", "듣고", "신청")
+SWAP_WORDS = ("분반", "바꿔", "바꾸", "변경", "다른", "옮겨")
+EDIT_WORDS = DROP_WORDS + ADD_WORDS + SWAP_WORDS + ("수정", "공강", "비워")
+COURSE_KEYS = ("code", "name", "section", "credits", "professor", "category", "online", "slots")
+
+_space_re = re.compile(r"\s+|\(.*?\)")
+_clause_re = re.compile(r"\s*(?:[,.;\n]|그리고|대신|(?<=고)\s)\s*")
+_day_re = re.compile(r"([월화수목금토일])요일\s*(?:수업\s*)?(?:은|는|을|를|에|도)?\s*(?:공강|비워|빼|없애|없|쉬)")
+_section_re = re.compile(r"(\d{1,2})\s*분반")
+_particle_re = re.compile(r"(?:으로|로|을|를|이|가|은|는|도|만)$")
+_conj_re = re.compile(r"및|와|과")
+
+
+def norm(text):
+    return _space_re.sub("", str(text or ""))
+
+
+def course_mask(course):
+    return slots_mask(map(parse_slot, course.get("slots") or []))
+
+
+def is_edit_request(text):
+    return any(w in norm(text) for w in EDIT_WORDS)
+
+
+def term_sections(catalog, term):
+    # {학정번호: [분반...]} (compact 형식, 같은 분반이 여러 페이지에 실리면 교수 정보가 있는 행, 실린 학과는 모두 departments 에)
+    sections = {}
+    for row in catalog.filter(term=term).itertuples(index=False):
+        by_section = sections.setdefault(row.code, {})
+        prev = by_section.get(row.section)
+        departments = (prev["departments"] if prev else []) + [row.department]
+        if prev is not None and (prev["professor"] or not row.professor):
+            prev["departments"] = departments
+            continue
+        by_section[row.section] = {
+            "code": row.code, "name": row.name, "section": row.section, "credits": float(row.credits),
+            "professor": row.professor, "category": row.category, "online": bool(row.online),
+            "slots": [f"{d}{p}" for d, p in parse_slot_text(row.slots)],
+            "department": row.department, "departments": departments, "grade": int(row.grade),
+            "restriction": row.restriction, "lecture_type": row.lecture_type,
+        }
+    return {code: list(s.values()) for code, s in sections.items()}
+
+
+def home_departments(major):
+    # 학생이 기본으로 듣는 개설 학과: 소속 학과, 단과대 공통, 교양
+    college = MAJOR_ALIASES.get(major, ((), None))[1]
+    return {major, f"{college} 공통" if college else None, "교양"} - {None}
+
+
+def off_track(section, major, grade):
+    # 학생 학과/학년 밖의 분반이면 이유 ("전자통신공학과 과목, 3학년 대상"), 아니면 ""
+    reasons = []
+    if major and not home_departments(major) & set(section.get("departments") or [section["department"]]):
+        reasons.append(f"{section['department']} 과목")
+    if grade and section.get("grade") and section["grade"] != grade:
+        reasons.append(f"{section['grade']}학년 대상")
+    return ", ".join(reasons)
+
+
+def rank(options, major=None, grade=None):
+    # 같은 이름/앞부분의 과목 중 고를 때: 학생 학과 → 학과·학년 안 → 학과 안 순
+    s = options[0]
+    return (s["department"] != major, bool(off_track(s, major, grade)), bool(off_track(s, major, None)))
+
+
+def lookup(word, sections, major=None, grade=None):
+    # 과목명 일부("선형대수", "확률과통계") → 학정번호. 앞부분이 같은 과목 중 학생 학과/학년 과목, 짧은 이름 순
+    key = _conj_re.sub("", _particle_re.sub("", word))
+    if len(key) < 2 or any(w in word for w in EDIT_WORDS): return None
+    found = [(rank(s, major, grade), len(s[0]["name"]), code) for code, s in sections.items()
+             if _conj_re.sub("", norm(s[0]["name"])).startswith(key)]
+    return min(found)[2] if found else None
+
+
+def parse_edits(text, timetable, sections, major=None, grade=None):
+    # 문장을 절로 나눠 절마다 (요일 공강 / 시간표에 있는 과목 / 카탈로그의 새 과목) × (빼기/추가/분반 변경)을 찾는다
+    if not timetable or not is_edit_request(text): return []
+    grade = parse_grade(grade) if grade else None
+    current = sorted(timetable["courses"], key=lambda c: -len(norm(c["name"])))
+    # 이름이 같은 과목이 여러 학과에 있으면 학생 학과/학년 과목 (순위가 낮은 것이 나중에 덮어씀)
+    by_rank = sorted(sections.items(), key=lambda x: rank(x[1], major, grade), reverse=True)
+    names = sorted({norm(s[0]["name"]): code for code, s in by_rank}.items(), key=lambda x: -len(x[0]))
+    ops = []
+    for clause in filter(None, _clause_re.split(text)):
+        for m in _day_re.finditer(clause):
+            ops.append({"op": "free_day", "day": m.group(1)})
+        rest = norm(_day_re.sub("", clause))
+        mentioned = []
+        for c in current:
+            if norm(c["name"]) in rest:
+                mentioned.append(c)
+                rest = rest.replace(norm(c["name"]), " ")
+        added = []
+        for name, code in names:
+            if len(name) >= 2 and name in rest:
+                added.append(code)
+                rest = rest.replace(name, " ")
+        words = norm(clause)
+        drop = any(w in words for w in DROP_WORDS)
+        swap = any(w in words for w in SWAP_WORDS)
+        add = any(w in words for w in ADD_WORDS)
+        if not added and (add or (swap and mentioned)):
+            # 정확한 과목명이 없으면 단어 앞부분으로 찾는다 (이미 찾은 과목명은 제외)
+            done = {norm(c["name"]) for c in mentioned}
+            added = [code for code in (lookup(w, sections, major, grade) for w in clause.split()
+                                       if norm(w) not in done and not any(n in norm(w) for n in done)) if code]
+        section = _section_re.search(clause)
+        section = f"{int(section.group(1)):02d}" if section else None
+        if len(mentioned) == 1 and len(added) == 1 and swap:
+            # "A 를 B 로 바꿔줘" → B 를 넣을 수 있을 때만 A 를 뺀다 (분반 번호는 B 의 분반)
+            c = mentioned[0]
+            ops.append({"op": "replace", "code": c["code"], "name": c["name"], "new": added[0], "section": section})
+            continue
+        for c in mentioned:
+            if swap and not drop:
+                ops.append({"op": "swap", "code": c["code"], "name": c["name"], "section": section})
+            elif drop:
+                ops.append({"op": "drop", "code": c["code"], "name": c["name"]})
+        if add or (swap and mentioned):
+            ops += [{"op": "add", "code": code, "name": sections[code][0]["name"],
+                     "section": section if len(added) == 1 else None} for code in added]
+    return ops
+
+
+def pick(section):
+    return {k: section[k] for k in COURSE_KEYS}
+
+
+def conflicts(courses, mask):
+    return [c["name"] for c in courses if course_mask(c) & mask]
+
+
+def best_section(options, others, blocked):
+    # 다른 과목과 겹치지 않고 막힌 요일을 피하는 분반 중 하루 배치가 가장 나은 것
+    taken = 0
+    for c in others: taken |= course_mask(c)
+    fits = [s for s in options if not course_mask(s) & (taken | blocked)]
+    return min(fits, key=lambda s: layout_penalty(taken | course_mask(s)), default=None)
+
+
+def apply_edits(timetable, ops, sections, profile):
+    # 반환: (새 시간표, 변경 내역 문장 리스트). 원본은 바꾸지 않는다
+    courses = [dict(c) for c in timetable["courses"]]
+    notes = []
+    # 이번 요청에서 비우는 요일도 처음부터 막는다 (같은 요청의 다른 연산이 그 요일에 분반을 넣지 않게, 순서와 상관없이)
+    blocked = 0
+    for d in list(profile.get("blocked_days") or ()) + [op["day"] for op in ops if op["op"] == "free_day"]:
+        if d in DAYS: blocked |= day_mask(d)
+    major, grade = profile.get("major"), parse_grade(profile.get("grade"))
+    aliases = MAJOR_ALIASES.get(major, ((), None))[0]
+
+    def allowed(code):
+        return [s for s in sections.get(code, [])
+                if s["department"] == major or restriction_allows(s["restriction"], s["lecture_type"], aliases, grade)]
+
+    def choose(options, others, section=None):
+        # 반환: (넣을 분반, 학과/학년 밖이라 넣지 않은 분반). 분반 번호를 직접 말했으면 학과/학년이 달라도 그 분반
+        if section: return best_section(options, others, blocked), None
+        new = best_section([s for s in options if not off_track(s, major, grade)], others, blocked)
+        if new: return new, None
+        return None, best_section([s for s in options if off_track(s, major, grade)], others, blocked)
+
+    def skipped(name, s, request):
+        return (f"⚠️ {name}: {grade or ''}학년 {major or ''} 대상 분반 중에는 들어갈 분반이 없습니다. "
+                f"{s['section']}분반({' '.join(s['slots']) or '온라인'})은 {off_track(s, major, grade)}이라 넣지 않았습니다 "
+                f"(들으려면 '{request.format(section=s['section'])}').")
+
+    def find(code):
+        return next((i for i, c in enumerate(courses) if c["code"] == code), None)
+
+    for op in ops:
+        if op["op"] == "drop":
+            i = find(op["code"])
+            if i is None: continue
+            courses.pop(i)
+            notes.append(f"➖ {op['name']} 삭제")
+
+        elif op["op"] == "swap":
+            i = find(op["code"])
+            if i is None: continue
+            cur, others = courses[i], courses[:i] + courses[i + 1:]
+            options = [s for s in allowed(op["code"]) if s["section"] != cur["section"]]
+            if op["section"]:
+                options = [s for s in options if s["section"] == op["section"]]
+                if not options:
+                    notes.append(f"⚠️ {op['name']} {op['section']}분반을 찾지 못했습니다.")
+                    continue
+            new, other = choose(options, others, op["section"])
+            if other:
+                notes.append(skipped(op["name"], other, op["name"] + " {section}분반으로 바꿔줘"))
+                continue
+            if new is None:
+                hit = sorted({n for s in options for n in conflicts(others, course_mask(s))})
+                notes.append(f"⚠️ {op['name']}: 옮길 수 있는 분반이 없습니다." + (f" (겹치는 과목: {', '.join(hit)})" if hit else ""))
+                continue
+            courses[i] = pick(new)
+            notes.append(f"🔁 {op['name']} {cur['section']}분반 → {new['section']}분반 ({' '.join(new['slots']) or '온라인'})")
+
+        elif op["op"] == "replace":
+            i = find(op["code"])
+            if i is None: continue
+            others = courses[:i] + courses[i + 1:]
+            name = sections[op["new"]][0]["name"]
+            options = [s for s in allowed(op["new"]) if not op.get("section") or s["section"] == op["section"]]
+            new, other = choose(options, others, op.get("section"))
+            if other:
+                notes.append(skipped(name, other, f"{op['name']} 을(를) {name} " + "{section}분반으로 바꿔줘")
+                             + f" {op['name']} 은(는) 그대로 둡니다.")
+                continue
+            if new is None:
+                hit = sorted({n for s in options for n in conflicts(others, course_mask(s))})
+                notes.append(f"⚠️ {name}: 들을 수 있는 분반이 없어 {op['name']} 을(를) 그대로 둡니다." + (f" (겹치는 과목: {', '.join(hit)})" if hit else ""))
+                continue
+            courses[i] = pick(new)
+            notes.append(f"🔁 {op['name']} → {name} {new['section']}분반 ({' '.join(new['slots']) or '온라인'})")
+
+        elif op["op"] == "add":
+            if find(op["code"]) is not None:
+                notes.append(f"ℹ️ {op['name']} 은(는) 이미 시간표에 있습니다.")
+                continue
+            options = [s for s in allowed(op["code"]) if not op.get("section") or s["section"] == op["section"]]
+            new, other = choose(options, courses, op.get("section"))
+            if other:
+                notes.append(skipped(op["name"], other, op["name"] + " {section}분반 넣어줘"))
+                continue
+            if new is None:
+                hit = sorted({n for s in options for n in conflicts(courses, course_mask(s))})
+                notes.append(f"⚠️ {op['name']}: 들을 수 있는 분반이 없습니다." + (f" (겹치는 과목: {', '.join(hit)})" if hit else ""))
+                continue
+            courses.append(pick(new))
+            notes.append(f"➕ {op['name']} {new['section']}분반 추가 ({' '.join(new['slots']) or '온라인'})")
+
+        elif op["op"] == "free_day":
+            busy = [c for c in courses if course_mask(c) & day_mask(op["day"])]
+            if not busy: notes.append(f"ℹ️ {op['day']}요일은 이미 공강입니다.")
+            for cur in busy:
+                i = courses.index(cur)
+                others = courses[:i] + courses[i + 1:]
+                new, other = choose([s for s in allowed(cur["code"]) if s["section"] != cur["section"]], others)
+                if new is None:
+                    courses.pop(i)
+                    notes.append(f"➖ {cur['name']} 삭제 ({op['day']}요일을 피하는 분반 없음)")
+                    if other: notes.append(skipped(cur["name"], other, cur["name"] + " {section}분반 넣어줘"))
+                else:
+                    courses[i] = pick(new)
+                    notes.append(f"🔁 {cur['name']} {cur['section']}분반 → {new['section']}분반 ({op['day']}요일 비움)")
+
+    result = dict(timetable, courses=courses, credits=sum(float(c.get("credits") or 0) for c in courses))
+    return result, notes
@@ -0,0 +1,101 @@
+import zlib
+from html import escape
+from catalog import DAYS
+
+# -----------------------------------------------------------------------------
+# [Render] 구조화된 시간표 → HTML 표 (LLM 없이 로컬에서 결정적으로 생성)
+# -----------------------------------------------------------------------------
+# timetable = {"term", "credits", "courses": [{"code", "name", "section", "credits", "professor",
+#                                              "category", "slots": ["화5", "목6", ...], "online"}]}
+# slots 는 Firestore 가 중첩 배열을 저장하지 못하므로 "요일+교시" 문자열로 둔다 ((요일, 교시) 튜플도 허용)
+DEFAULT_PERIODS = range(1, 10)   # 기본 1~9교시, 0교시/10교시 이후 수업이 있으면 확장
+PALETTE = ["#FFD6D6", "#FFE8C7", "#FFF5BA", "#D9F5C9", "#C9F0EC", "#CFE3FF",
+           "#DCD3FF", "#F8D3F0", "#E6E0D4", "#D4EDDA", "#FCE1C8", "#D6E4F0"]
+ONLINE_LABEL = "온라인/시간미지정"
+
+_table_style = "width:100%;border-collapse:collapse;table-layout:fixed;text-align:center;font-size:13px;"
+_cell_style = "border:1px solid #ddd;padding:4px;vertical-align:middle;"
+_head_style = _cell_style + "background:#f8f9fa;font-weight:600;"
+
+
+def course_color(code):
+    # 학정번호 기준 고정 색 (같은 과목은 어느 시간표/세션에서도 같은 색)
+    return PALETTE[zlib.crc32(code.encode("utf-8")) % len(PALETTE)]
+
+
+def parse_slot(slot):
+    if isinstance(slot, str): return slot[0], int(slot[1:])
+    return slot[0], int(slot[1])
+
+
+def compact(timetable):
+    # 세션/보관함 저장용 최소 필드만 남긴 형태
+    keys = ("code", "name", "section", "credits", "professor", "category", "online")
+    return {
+        "term": timetable.get("term"), "credits": timetable.get("credits"),
+        "courses": [dict({k: c.get(k) for k in keys},
+                         slots=[f"{d}{p}" for d, p in map(parse_slot, c.get("slots") or [])])
+                    for c in timetable.get("courses", [])],
+    }
+
+
+def render_timetable(timetable):
+    courses = timetable.get("courses", [])
+    grid, used_days = {}, set()
+    for c in courses:
+        if c.get("online"): continue   # 온라인 과목은 맨 아래 행에 표시
+        for day, period in map(parse_slot, c.get("slots") or []):
+            grid[(day, period)] = c
+            used_days.add(day)
+    periods = sorted(set(DEFAULT_PERIODS) | {p for _, p in grid})
+    days = [d for d in DAYS if d in DAYS[:5] or d in used_days]
+
+    rows = ["<tr>" + f'<th style="{_head_style}width:48px;">교시</th>'
+            + "".join(f'<th style="{_head_style}">{d}</th>' for d in days) + "</tr>"]
+    covered = set()
+    for i, period in enumerate(periods):
+        cells = [f'<td style="{_head_style}">{period}</td>']
+        for day in days:
+            if (day, period) in covered: continue
+            c = grid.get((day, period))
+            if c is None:
+                cells.append(f'<td style="{_cell_style}"></td>')
+                continue
+            # 같은 과목이 연속 교시면 rowspan 으로 합친다
+            span = 1
+            while i + span < len(periods) and periods[i + span] == period + span \
+                    and grid.get((day, period + span)) is c:
+                covered.add((day, period + span))
+                span += 1
+            rowspan = f' rowspan="{span}"' if span > 1 else ""
+            cells.append(
+                f'<td{rowspan} style="{_cell_style}background:{course_color(c["code"])};">'
+                f'<b>{escape(c["name"])}</b><br><small>{escape(c.get("professor") or "")}</small></td>')
+        rows.append("<tr>" + "".join(cells) + "</tr>")
+
+    extra = [c for c in courses if c.get("online") or not c.get("slots")]
+    if extra:
+        def label(c):
+            when = " ".join(f"{d}{p}" for d, p in map(parse_slot, c.get("slots") or []))
+            return f'{escape(c["name"])} ({"온라인" if c.get("online") else "시간미지정"}{" " + when if when else ""})'
+        items = " · ".join(
+            f'<span style="background:{course_color(c["code"])};padding:1px 4px;border-radius:3px;">{label(c)}</span>'
+            for c in extra)
+        rows.append(f'<tr><td style="{_head_style}font-size:10px;">{ONLINE_LABEL}</td>'
+                    f'<td colspan="{len(days)}" style="{_cell_style}text-align:left;">{items}</td></tr>')
+
+    caption = ""
+    if timetable.get("term") or timetable.get("credits") is not None:
+        caption = f'<caption style="caption-side:top;text-align:left;font-weight:600;">' \
+                  f'{escape(str(timetable.get("term") or ""))} · 총 {float(timetable.get("credits") or 0):g}학점</caption>'
+    return f'<table style="{_table_style}">{caption}' + "".join(rows) + "</table>"
+
+
+def summarize(options):
+    # 후보 비교용 한 줄 요약 (LLM 호출 없이 표 아래에 붙인다)
+    lines = []
+    for i, o in enumerate(options):
+        days = sorted({parse_slot(s)[0] for c in o["courses"] for s in (c.get("slots") or [])}, key=DAYS.index)
+        names = ", ".join(c["name"] for c in o["courses"])
+        lines.append(f"- **후보 {i + 1}**: {o['credits']:g}학점 · 등교 {''.join(days) or '없음'} · {names}")
+    return "\n".join(lines)
@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import uuid
+import threading
+import contextlib
+from collections import Counter
+
+# -----------------------------------------------------------------------------
+# [Tracing] 요청(턴)별 구간 시간·카운터 + 프로세스 누적 지표 (JSONL / Prometheus 텍스트로 내보내기)
+# -----------------------------------------------------------------------------
+# Trace: 한 턴의 구간(span)과 카운터. 여러 스레드(동시 실행 의도)에서 같이 쓴다.
+# Metrics: 프로세스 누적. 구간은 히스토그램, 카운터는 라벨별 합계. Trace 에 기록하면 Metrics 에도 같이 쌓인다.
+#   카운터 이름: cache.hit / cache.miss (intent), llm.calls / llm.input_tokens / llm.output_tokens / llm.output_chars,
+#               llm.retry / llm.rate_limited, firestore.read / firestore.write
+BUCKETS_MS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+PREFIX = "assistant"
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+def _labels(pairs, **extra):
+    pairs = list(pairs) + list(extra.items())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}" if pairs else ""
+
+
+class Metrics:
+    def __init__(self, buckets=BUCKETS_MS):
+        self.buckets = buckets
+        self.counters = Counter()      # (name, labels) → 합계
+        self.spans = {}                # name → [count, sum_ms, [bucket counts]]
+        self.turns = 0
+        self._lock = threading.Lock()
+
+    def count(self, name, n=1, **labels):
+        with self._lock: self.counters[_key(name, labels)] += n
+
+    def observe(self, name, ms):
+        with self._lock:
+            h = self.spans.setdefault(name, [0, 0.0, [0] * len(self.buckets)])
+            h[0] += 1
+            h[1] += ms
+            for i, b in enumerate(self.buckets):
+                if ms <= b: h[2][i] += 1
+
+    def prometheus(self):
+        # Prometheus 텍스트 형식 (node_exporter textfile collector 등으로 수집)
+        with self._lock:
+            counters = sorted(self.counters.items())
+            spans = sorted((k, (c, s, list(b))) for k, (c, s, b) in self.spans.items())
+            turns = self.turns
+        lines = [f"# TYPE {PREFIX}_turns_total counter", f"{PREFIX}_turns_total {turns}"]
+        seen = set()
+        for (name, labels), value in counters:
+            metric = f"{PREFIX}_{name.replace('.', '_')}_total"
+            if metric not in seen:
+                lines.append(f"# TYPE {metric} counter")
+                seen.add(metric)
+            lines.append(f"{metric}{_labels(labels)} {value:g}")
+        metric = f"{PREFIX}_span_duration_seconds"
+        if spans: lines.append(f"# TYPE {metric} histogram")
+        for name, (count, total, buckets) in spans:
+            for b, n in zip(self.buckets, buckets):
+                lines.append(f"{metric}_bucket{_labels([], span=name, le=f'{b / 1000:g}')} {n}")
+            lines.append(f"{metric}_bucket{_labels([], span=name, le='+Inf')} {count}")
+            lines.append(f"{metric}_sum{_labels([], span=name)} {total / 1000:.6f}")
+            lines.append(f"{metric}_count{_labels([], span=name)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        with self._lock:
+            return {"turns": self.turns,
+                    "counters": {name + _labels(labels): v for (name, labels), v in sorted(self.counters.items())},
+                    "spans": {k: {"count": c, "avg_ms": round(s / c, 1) if c else 0} for k, (c, s, _) in sorted(self.spans.items())}}
+
+
+class Trace:
+    def __init__(self, name="turn", metrics=None, **attrs):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.metrics = metrics
+        self.attrs = attrs
+        self.started = time.time()
+        self.t0 = time.perf_counter()
+        self.spans = []
+        self.counters = Counter()
+        self.total_ms = None
+        self._lock = threading.Lock()
+
+    def count(self, name, n=1, **labels):
+        if not n: return
+        with self._lock: self.counters[name + _labels(sorted(labels.items()))] += n
+        if self.metrics: self.metrics.count(name, n, **labels)
+
+    def add_span(self, name, start, ms, **attrs):
+        span = {"name": name, "start_ms": round((start - self.t0) * 1000, 1), "ms": round(ms, 1),
+                "thread": threading.current_thread().name, **attrs}
+        with self._lock: self.spans.append(span)
+        if self.metrics: self.metrics.observe(name, ms)
+        return span
+
+    @contextlib.contextmanager
+    def span(self, name, **attrs):
+        # with trace.span("retrieval") as s: ...; s["hits"] = 6  (yield 한 dict 의 값은 span 속성으로 기록)
+        start = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            self.add_span(name, start, (time.perf_counter() - start) * 1000, **attrs)
+
+    def stream(self, name, chunks, attrs=None):
+        # 스트림 구간: 첫 조각까지(first_ms)와 끝날 때까지, 글자 수. attrs 는 스트림이 끝날 때 읽는다 (도중에 채워도 됨)
+        start, first, chars = time.perf_counter(), None, 0
+        try:
+            for chunk in chunks:
+                if first is None: first = (time.perf_counter() - start) * 1000
+                chars += len(chunk)
+                yield chunk
+        finally:
+            self.add_span(name, start, (time.perf_counter() - start) * 1000,
+                          first_ms=round(first, 1) if first is not None else None, chars=chars, **(attrs or {}))
+
+    def finish(self):
+        self.total_ms = (time.perf_counter() - self.t0) * 1000
+        if self.metrics:
+            self.metrics.observe(self.name, self.total_ms)
+            with self.metrics._lock: self.metrics.turns += 1
+        return self
+
+    def to_dict(self):
+        with self._lock:
+            return {"id": self.id, "name": self.name, "ts": round(self.started, 3), **self.attrs,
+                    "total_ms": round(self.total_ms, 1) if self.total_ms is not None else None,
+                    "spans": sorted(self.spans, key=lambda s: s["start_ms"]), "counters": dict(self.counters)}
+
+
+def write_jsonl(path, trace):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(trace.to_dict(), ensure_ascii=False, default=str) + "\n")
+
+
+def write_prometheus(path, metrics):
+    # 수집기가 반쯤 쓴 파일을 읽지 않도록 임시 파일에 쓰고 교체
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(metrics.prometheus())
+    os.replace(tmp, path)
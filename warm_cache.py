@@ -0,0 +1,145 @@
+import os
+import json
+import time
+import argparse
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from corpus import load_corpus, PartitionStore, HANDBOOK
+from catalog import load_catalog
+from scheduler import build_timetables
+from llm_cache import ResponseCache, CACHE_PATH
+from rate_limiter import RateLimiter, REQUESTS_PER_MINUTE
+from prompts import (SCHEDULER_MODEL, DEPARTMENTS, GRADES, SEMESTERS,
+                     llm_tier, table_setting, default_profile, cache_key, data_version, content_text, load_partition, profile_partition, qa_prompt)
+
+# -----------------------------------------------------------------------------
+# [Warm Cache] 수강신청 기간 전에 기본 프로필(학과 × 학년 × 학기)의 결과를 응답 캐시에 미리 채운다
+# -----------------------------------------------------------------------------
+# 앱과 같은 캐시 파일/키/데이터 버전 태그를 쓰므로 첫 요청부터 적중한다. PDF 가 바뀌면 버전이 달라져 자동 무효.
+#   python warm_cache.py                     # 시간표 후보 + 자주 묻는 질문
+#   python warm_cache.py --skip-qa           # LLM 호출 없이 시간표 후보만
+#   python warm_cache.py --questions q.txt   # 질문 목록 (한 줄에 하나)
+# 앱 서버와 같은 캐시 파일(data/llm_cache.sqlite3 또는 LLM_CACHE_PATH)을 써야 한다 (같은 호스트/볼륨에서 실행).
+COMMON_QUESTIONS = [
+    "재수강 규정 알려줘",
+    "수강신청 기간 알려줘",
+    "최대 신청 학점 기준이 뭐야",
+    "수강 정정 기간 알려줘",
+    "수강 철회 방법 알려줘",
+    "장학금 성적 기준 알려줘",
+    "졸업 학점 기준 알려줘",
+    "계절학기 신청 방법 알려줘",
+]
+WORKERS = 4
+
+
+def secret(name):
+    # 앱의 setting() 과 같은 순서: .streamlit/secrets.toml → 환경변수
+    try:
+        import tomllib
+        with open(os.path.join(".streamlit", "secrets.toml"), "rb") as f:
+            value = tomllib.load(f).get(name)
+    except (OSError, ValueError):
+        value = None
+    return value or os.environ.get(name)
+
+
+def qa_tier():
+    # 앱과 같은 등급 설정을 읽어야 캐시 키의 모델 이름이 같다
+    return llm_tier("QA", table_setting(secret("LLM_MODEL_TIERS")), table_setting(secret("LLM_INTENT_TIERS")))
+
+
+def profiles():
+    return [default_profile(m, g, s) for m, g, s in itertools.product(DEPARTMENTS, GRADES, SEMESTERS)]
+
+
+def warm_timetables(cache, catalog, version, workers):
+    # 로컬 스케줄러 결과라 LLM 호출 없음
+    counts = {"warmed": 0, "cached": 0}
+    lock = threading.Lock()
+
+    def warm(profile):
+        key = cache_key("TIMETABLE_OPTIONS", "", profile, version, SCHEDULER_MODEL)
+        hit = cache.get(key) is not None
+        if not hit:
+            cache.put(key, json.dumps(build_timetables(catalog, profile), ensure_ascii=False),
+                      "TIMETABLE_OPTIONS", {"corpus": version})
+        with lock: counts["cached" if hit else "warmed"] += 1
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(warm, profiles()))
+    return counts
+
+
+def warm_qa(cache, corpus, version, questions, workers, rpm):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    key = secret("GOOGLE_API_KEY")
+    if not key:
+        print("❌ GOOGLE_API_KEY 가 없습니다 (환경변수 또는 .streamlit/secrets.toml). 질문 예열을 건너뜁니다.")
+        return None
+    tier = qa_tier()
+    llm = ChatGoogleGenerativeAI(temperature=0, google_api_key=key, **tier)
+    limiter = RateLimiter(rpm, burst=min(workers, 5))
+    store = PartitionStore(corpus, load_partition)
+    counts = {"warmed": 0, "cached": 0, "failed": 0}
+    lock = threading.Lock()
+
+    def warm(job):
+        profile, query = job
+        ck = cache_key("QA", query, profile, version, tier["model"])
+        if cache.get(ck) is not None:
+            with lock: counts["cached"] += 1
+            return
+        prompt = qa_prompt(query, profile, profile_partition(store, HANDBOOK, profile))
+        try:
+            cache.get_or_compute(ck, lambda: limiter.call(lambda: content_text(llm.invoke(prompt)), user="warm_cache"),
+                                 "QA", {"corpus": version})
+            with lock: counts["warmed"] += 1
+        except Exception as e:
+            with lock: counts["failed"] += 1
+            print(f"⚠️ {profile['major']} {profile['grade']} {profile['semester']} '{query}': {e}")
+
+    jobs = list(itertools.product(profiles(), questions))
+    print(f"   - 질문 {len(questions)}개 × 프로필 {len(jobs) // max(len(questions), 1)}개 = {len(jobs)}건 (분당 {rpm}회 이하)")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(warm, jobs))
+    return counts
+
+
+def warm_cache(workers=WORKERS, questions=None, skip_qa=False, rpm=REQUESTS_PER_MINUTE):
+    started = time.time()
+    print("🔥 응답 캐시 예열을 시작합니다...")
+    corpus = load_corpus() if os.path.exists("data") else None
+    catalog = load_catalog(corpus=corpus)
+    version = data_version(corpus, catalog)
+    # 앱과 같은 파일 (LLM_CACHE_PATH 로 바꿨으면 그 파일)
+    path = secret("LLM_CACHE_PATH") or CACHE_PATH
+    cache = ResponseCache(path)
+    print(f"   - 캐시: {path}, 데이터 버전 {version}")
+    removed = cache.purge_stale(version)
+    if removed: print(f"   - 이전 데이터 버전의 응답 {removed}개 삭제")
+
+    counts = warm_timetables(cache, catalog, version, workers)
+    print(f"   ✔ 시간표 후보: 새로 {counts['warmed']}개, 이미 캐시됨 {counts['cached']}개")
+
+    if not skip_qa and corpus is not None:
+        counts = warm_qa(cache, corpus, version, questions or COMMON_QUESTIONS, workers, rpm)
+        if counts:
+            print(f"   ✔ 자주 묻는 질문: 새로 {counts['warmed']}개, 이미 캐시됨 {counts['cached']}개, 실패 {counts['failed']}개")
+
+    print(f"\n✅ 예열 완료 ({time.time() - started:.1f}s) — {cache.stats()['entries']}개 항목")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="기본 프로필 응답 캐시 예열")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="동시 작업 수")
+    parser.add_argument("--questions", help="질문 목록 파일 (한 줄에 하나, 기본: 자주 묻는 질문)")
+    parser.add_argument("--skip-qa", action="store_true", help="LLM 호출 없이 시간표 후보만 예열")
+    parser.add_argument("--rpm", type=int, default=REQUESTS_PER_MINUTE, help="분당 LLM 요청 수 상한")
+    args = parser.parse_args()
+    questions = None
+    if args.questions:
+        with open(args.questions, encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+    warm_cache(args.workers, questions, args.skip_qa, args.rpm)